@@ -0,0 +1,89 @@
+"""
+Short-circuit rate, latency and agreement of the cascaded encoder.
+
+Loads the built index (``CASCADE_ENABLED=1 python build.py`` first) and runs
+every query through the full transformer path and through the cascade. It
+reports the fraction of queries the static stage decided on its own, the
+latency of both paths and how often the cascade's answer matches the full
+model's. A sweep over accept distances helps calibrate the uncertainty band.
+
+Usage (from apps/api):
+    CASCADE_ENABLED=1 python -m benchmarks.bench_cascade --queries queries.txt
+"""
+
+import argparse
+import statistics
+import time
+
+from engine import FAQEngine
+from loadgen import load_questions
+from settings import settings
+
+
+def run(engine: FAQEngine, queries: list[str]) -> tuple[list[str | None], list[float]]:
+    answers, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        answers.append(engine._search_sync(query))
+        latencies.append(time.perf_counter() - start)
+    return answers, latencies
+
+
+def summarize(latencies: list[float]) -> str:
+    p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else 0.0
+    median = statistics.median(latencies)
+    return f"median {median * 1000:7.2f} ms  p99 {p99 * 1000:7.2f} ms"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cascaded encoder evaluation")
+    parser.add_argument("--queries", default="faq.json")
+    args = parser.parse_args()
+
+    settings.cascade_enabled = True
+    engine = FAQEngine()
+    engine.load_resources()
+    cascade = engine.cascade
+    if not engine.is_ready or cascade is None:
+        raise SystemExit("Engine or static stage failed to load; rebuild the index.")
+
+    queries = load_questions(args.queries)
+    engine.cascade = None
+    full_answers, full_latencies = run(engine, queries)
+    engine.cascade = cascade
+    cascade_answers, cascade_latencies = run(engine, queries)
+
+    agreement = sum(
+        a == b for a, b in zip(full_answers, cascade_answers, strict=True)
+    ) / len(queries)
+    print(f"{len(queries)} queries")
+    print(f"  full model: {summarize(full_latencies)}")
+    print(f"  cascade:    {summarize(cascade_latencies)}")
+    print(f"  short-circuited: {cascade.short_circuit_ratio:.1%} {cascade.counts}")
+    print(f"  agreement with full model: {agreement:.1%}")
+
+    # Calibration sweep: re-decide with other bands, no transformer needed
+    print("Accept-distance sweep (margin, reject distance unchanged):")
+    for accept in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6):
+        cascade.accept_distance = accept
+        decided = agree = 0
+        for query, full in zip(queries, full_answers, strict=True):
+            decision = cascade.decide(query)
+            if decision.outcome == "uncertain":
+                continue
+            decided += 1
+            answer = (
+                engine.answer_for(decision.index)
+                if decision.outcome == "accept"
+                else None
+            )
+            agree += answer == full
+        print(
+            f"  accept <= {accept:.1f}: short-circuit {decided / len(queries):6.1%}, "
+            f"agreement on short-circuited {agree / max(decided, 1):6.1%}"
+        )
+    cascade.accept_distance = settings.cascade_accept_distance
+
+
+if __name__ == "__main__":
+    main()
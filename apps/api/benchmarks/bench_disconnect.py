@@ -0,0 +1,109 @@
+"""
+Search work wasted on clients that disconnect, under overload.
+
+Drives a running API with the open-loop load generator at ``--rate``, with
+clients that give up after ``--client-timeout`` seconds and close their
+connection, as a closed tab or a proxy timeout does. The search counters
+on ``/metrics`` are read before and after. The report shows how many
+searches were skipped before they started, how many ran for a client that
+had already left, and the CPU time spent on those. It also estimates what
+the same load would have cost if abandoned searches were not cancelled.
+
+Run it against one process (``uvicorn main:app``), since ``/metrics``
+counts per worker. Ask about as many distinct questions as you expect in
+production (``--questions``); identical concurrent questions share a search.
+
+Usage (from apps/api, with the API on port 8000):
+    python -m benchmarks.bench_disconnect --rate 200 --duration 20 \\
+        --client-timeout 0.25
+"""
+
+import argparse
+import asyncio
+import itertools
+
+import httpx
+
+from loadgen import load_questions, run_load
+
+COUNTERS = (
+    "search_started",
+    "search_cancelled",
+    "search_discarded",
+    "search_seconds",
+    "search_discarded_seconds",
+)
+
+
+_users = itertools.count(1)
+
+
+async def as_distinct_user(request: httpx.Request) -> None:
+    """Give each request its own client address, past the per-IP rate limit."""
+    n = next(_users)
+    request.headers["x-forwarded-for"] = f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+async def counters(client: httpx.AsyncClient) -> dict[str, float]:
+    response = await client.get("/metrics", timeout=10.0)
+    metrics = response.json()
+    return {name: float(metrics[name]) for name in COUNTERS}
+
+
+async def _run(args: argparse.Namespace) -> None:
+    questions = load_questions(args.questions)
+    async with httpx.AsyncClient(base_url=args.url) as control:
+        before = await counters(control)
+        limits = httpx.Limits(max_connections=args.max_connections)
+        async with httpx.AsyncClient(
+            base_url=args.url,
+            timeout=args.client_timeout,
+            limits=limits,
+            event_hooks={"request": [as_distinct_user]},
+        ) as client:
+            result = await run_load(client, questions, args.rate, args.duration)
+        await asyncio.sleep(args.settle)  # Let searches still running finish
+        after = await counters(control)
+
+    delta = {name: after[name] - before[name] for name in COUNTERS}
+    started = delta["search_started"]
+    cancelled = delta["search_cancelled"]
+    discarded = delta["search_discarded"]
+    seconds = delta["search_seconds"]
+    wasted = delta["search_discarded_seconds"]
+    per_search = seconds / started if started else 0.0
+    # Without cancellation every abandoned search would have run to the end
+    uncancelled = wasted + cancelled * per_search
+    uncancelled_total = seconds + cancelled * per_search
+
+    print(
+        f"{result.sent} requests at {args.rate:.0f}/s, "
+        f"{result.transport_errors} abandoned by clients after "
+        f"{args.client_timeout * 1000:.0f} ms, "
+        f"{result.status_counts.get(200, 0)} answered"
+    )
+    print(f"searches run:               {started:8.0f}  ({seconds:7.2f} s)")
+    print(f"  skipped before starting:  {cancelled:8.0f}")
+    print(f"  run for a departed client:{discarded:8.0f}  ({wasted:7.2f} s)")
+    print(
+        f"wasted search time:         {wasted / seconds if seconds else 0.0:8.1%}"
+        f"  (without cancellation about {uncancelled:.2f} s, "
+        f"{uncancelled / uncancelled_total if uncancelled_total else 0.0:.1%})"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Work wasted on disconnects")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--questions", default="faq.json")
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--client-timeout", type=float, default=0.25)
+    parser.add_argument("--max-connections", type=int, default=1000)
+    parser.add_argument("--settle", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Encoding throughput with token-budget capping and length bucketing.
+
+Queries are drawn from a realistic length distribution: mostly short FAQ-like
+questions with a long tail up to ``max_question_length`` characters (pasted
+error messages, long descriptions). Three strategies are compared:
+
+- default:  ``model.encode`` with the model's own max sequence length
+- capped:   same, truncated to ``settings.max_seq_length`` tokens
+- bucketed: capped and encoded in token-length buckets
+
+Single-query latency for short and long queries is reported as well, since
+``/chat`` encodes one query at a time.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_encoding [--queries 2000]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections.abc import Callable
+
+from sentence_transformers import SentenceTransformer
+
+from encoding import encode_length_bucketed
+from settings import settings
+
+FILLER = (
+    "I tried that already but it still shows the same error when I open the "
+    "page on my phone and my account was charged twice last month so please "
+    "check what happened with the order and the refund"
+).split()
+
+
+def make_queries(n: int, seed: int = 0) -> list[str]:
+    """Sample queries: ~90% short questions, ~10% long lognormal tail."""
+    rng = random.Random(seed)
+    with open("faq.json") as f:
+        questions = [item["question"] for item in json.load(f)]
+    queries = []
+    for _ in range(n):
+        query = rng.choice(questions)
+        if rng.random() < 0.1:
+            words = int(min(rng.lognormvariate(4.0, 0.6), 180))
+            query += " " + " ".join(rng.choice(FILLER) for _ in range(words))
+        queries.append(query[: settings.max_question_length])
+    return queries
+
+
+def timed(fn: Callable[..., object], *args: object) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Encoding strategies")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    queries = make_queries(args.queries)
+    model = SentenceTransformer(settings.model_name, device="cpu")
+    default_length = model.max_seq_length
+    batch_size = settings.encode_batch_size
+
+    def encode_default(texts: list[str]) -> None:
+        model.max_seq_length = default_length
+        model.encode(texts, batch_size=batch_size)
+
+    def encode_capped(texts: list[str]) -> None:
+        model.max_seq_length = settings.max_seq_length
+        model.encode(texts, batch_size=batch_size)
+
+    def encode_bucketed(texts: list[str]) -> None:
+        model.max_seq_length = settings.max_seq_length
+        encode_length_bucketed(model, texts, batch_size=batch_size)
+
+    encode_default(queries[:64])  # warm up
+
+    print(f"Batch of {len(queries)} queries (batch size {batch_size}):")
+    baseline = None
+    for name, fn in (
+        ("default", encode_default),
+        (f"capped@{settings.max_seq_length}", encode_capped),
+        ("bucketed", encode_bucketed),
+    ):
+        elapsed = timed(fn, queries)
+        baseline = baseline or elapsed
+        print(
+            f"  {name:<12} {len(queries) / elapsed:8.1f} q/s  "
+            f"speedup {baseline / elapsed:4.2f}x"
+        )
+
+    long_query = max(queries, key=len)
+    print(f"Single query latency (long query: {len(long_query)} chars):")
+    for name, length in (
+        ("default", default_length),
+        ("capped", settings.max_seq_length),
+    ):
+        model.max_seq_length = length
+        samples = [timed(model.encode, [long_query]) for _ in range(50)]
+        print(f"  {name:<12} median {statistics.median(samples) * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
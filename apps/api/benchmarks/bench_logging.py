@@ -0,0 +1,143 @@
+"""
+Request-logging overhead on the calling (event loop) thread.
+
+Compares the previous setup (two JSON lines per request, formatted and written
+synchronously) with the queue-based setup (one line per request, formatted and
+written by the listener thread), with and without success sampling.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_logging [--requests 50000]
+"""
+
+import argparse
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from datetime import datetime
+from typing import Any
+
+from logging_config import DeferredFormatQueueHandler, JSONFormatter, RequestLogSampler
+
+
+class LegacyJSONFormatter(logging.Formatter):
+    """The formatter as it was before the queue-based logging change."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_entry: dict[str, Any] = {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+        }
+        for key, value in record.__dict__.items():
+            if key not in {
+                "name",
+                "msg",
+                "args",
+                "levelname",
+                "levelno",
+                "pathname",
+                "filename",
+                "module",
+                "lineno",
+                "funcName",
+                "created",
+                "msecs",
+                "relativeCreated",
+                "thread",
+                "threadName",
+                "processName",
+                "process",
+                "getMessage",
+                "exc_info",
+                "exc_text",
+                "stack_info",
+                "extra",
+            }:
+                log_entry[key] = value
+        return json.dumps(log_entry)
+
+
+def _logger(handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"bench.{id(handler)}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def bench_before(stream: Any, n: int) -> float:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(LegacyJSONFormatter())
+    logger = _logger(handler)
+    url = "http://localhost:8000/chat"
+    start = time.perf_counter()
+    for _ in range(n):
+        logger.info(
+            "Request started",
+            extra={"method": "POST", "url": str(url), "client_host": "127.0.0.1"},
+        )
+        logger.info(
+            "Request completed",
+            extra={
+                "method": "POST",
+                "url": str(url),
+                "status_code": 200,
+                "process_time": 0.001,
+            },
+        )
+    return time.perf_counter() - start
+
+
+def bench_after(stream: Any, n: int, sample_rate: float) -> float:
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONFormatter())
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logger = _logger(DeferredFormatQueueHandler(log_queue))
+    sampler = RequestLogSampler(sample_rate, {})
+    listener.start()
+    start = time.perf_counter()
+    for _ in range(n):
+        if sampler.should_log("/chat", 200):
+            logger.info(
+                "Request completed",
+                extra={
+                    "method": "POST",
+                    "path": "/chat",
+                    "status_code": 200,
+                    "process_time": 0.001,
+                    "client_host": "127.0.0.1",
+                },
+            )
+    elapsed = time.perf_counter() - start
+    listener.stop()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Request logging overhead")
+    parser.add_argument("--requests", type=int, default=50_000)
+    args = parser.parse_args()
+    n = args.requests
+
+    with open(os.devnull, "w") as devnull:
+        results = {
+            "before (sync, 2 lines)": bench_before(devnull, n),
+            "after (queue, 1 line)": bench_after(devnull, n, 1.0),
+            "after (queue, 10% sampled)": bench_after(devnull, n, 0.1),
+        }
+
+    print(f"{'setup':<28} {'us/request':>12}")
+    for name, elapsed in results.items():
+        print(f"{name:<28} {elapsed / n * 1e6:12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Accuracy, no-answer rate, latency and memory of candidate embedding models.
+
+Takes a labeled query file and a list of sentence-transformer models that
+are already in the local cache (or local directories); nothing is
+downloaded. For each model, build.py runs unchanged in a scratch directory
+with ``MODEL_NAME`` set to it, so reduction, index type and the other build
+settings apply as in production. A fresh process then loads the engine from
+that directory and reports:
+
+- top-1 accuracy: the nearest answer is the labeled one
+- no-answer rate of in-scope queries at a calibrated threshold. Distance
+  scales differ between models, so each gets the threshold at which
+  ``--false-answer-rate`` of the out-of-scope queries would be answered.
+  Needs out-of-scope queries in the file.
+- median and p99 encode latency of one query, as the API encodes them
+- size of the index files and RSS after loading and after the queries
+
+Each line of the query file is ``{"question": "...", "answer_id": 3}``, the
+answer id being the entry's position in faq.json, or ``"answer_id": null``
+for a question the FAQ should not answer. Models on the Pareto front (no
+other model is at least as accurate, as fast and as small) are starred.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_models labeled.jsonl \\
+        --models all-MiniLM-L6-v2 paraphrase-MiniLM-L3-v2 all-mpnet-base-v2
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, TypeVar
+
+import numpy as np
+
+from settings import settings
+
+INDEX_FILES = ("faiss_index_path", "rerank_vectors_path", "answer_ids_path")
+
+T = TypeVar("T")
+
+
+@dataclass
+class LabeledQuery:
+    question: str
+    answer_id: int | None  # None: out of scope
+
+
+@dataclass
+class ModelResult:
+    model: str
+    dimension: int
+    accuracy: float
+    threshold: float | None
+    no_answer_rate: float | None
+    encode_p50_ms: float
+    encode_p99_ms: float
+    index_bytes: int
+    load_rss_mb: float
+    peak_rss_mb: float
+
+
+def load_labeled(path: str) -> list[LabeledQuery]:
+    queries = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                queries.append(LabeledQuery(record["question"], record["answer_id"]))
+    return queries
+
+
+def calibrate_threshold(
+    negative_distances: np.ndarray, false_answer_rate: float
+) -> float | None:
+    """Distance under which ``false_answer_rate`` of out-of-scope queries fall."""
+    if not len(negative_distances):
+        return None
+    return float(np.quantile(negative_distances, false_answer_rate))
+
+
+def pareto_front(results: list[ModelResult]) -> set[str]:
+    """Models no other model beats on accuracy, p50 latency and RSS at once."""
+
+    def dominates(a: ModelResult, b: ModelResult) -> bool:
+        at_least = (
+            a.accuracy >= b.accuracy
+            and a.encode_p50_ms <= b.encode_p50_ms
+            and a.load_rss_mb <= b.load_rss_mb
+        )
+        better = (
+            a.accuracy > b.accuracy
+            or a.encode_p50_ms < b.encode_p50_ms
+            or a.load_rss_mb < b.load_rss_mb
+        )
+        return at_least and better
+
+    return {r.model for r in results if not any(dominates(o, r) for o in results)}
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def build(directory: str, model: str) -> None:
+    """Run build.py for ``model`` in ``directory`` (in a child process)."""
+    import build as build_script
+
+    settings.model_name = model
+    output = io.StringIO()
+    with contextlib.chdir(directory), contextlib.redirect_stdout(output):
+        build_script.main()
+        if not Path(settings.index_manifest_path).exists():
+            raise RuntimeError(f"Build with {model} failed:\n{output.getvalue()}")
+
+
+def evaluate(
+    directory: str,
+    model: str,
+    queries: list[LabeledQuery],
+    false_answer_rate: float,
+) -> ModelResult:
+    """Load the built engine in a fresh process and score it."""
+    from engine import FAQEngine
+
+    settings.model_name = model
+    with contextlib.chdir(directory):
+        engine = FAQEngine()
+        engine.load_resources()
+        if not engine.is_ready or engine.index is None:
+            raise RuntimeError(f"Engine failed to load the {model} build")
+        load_rss = rss_mb()
+        index_bytes = sum(
+            os.path.getsize(path)
+            for name in INDEX_FILES
+            if os.path.exists(path := getattr(settings, name))
+        )
+
+    questions = [q.question for q in queries]
+    engine.embed(questions[:8])  # Warm up
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        engine.embed([question])
+        latencies.append(time.perf_counter() - start)
+
+    found, distances = engine.search_many(questions, settings.encode_batch_size)
+    labels = np.array(
+        [-1 if q.answer_id is None else q.answer_id for q in queries], dtype=np.int64
+    )
+    in_scope = labels >= 0
+    threshold = calibrate_threshold(distances[~in_scope], false_answer_rate)
+    no_answer_rate = None
+    if threshold is not None and in_scope.any():
+        no_answer_rate = float(np.mean(distances[in_scope] > threshold))
+    assert engine.manifest is not None
+    return ModelResult(
+        model=model,
+        dimension=engine.manifest.dimension,
+        accuracy=float(np.mean(found[in_scope] == labels[in_scope])),
+        threshold=threshold,
+        no_answer_rate=no_answer_rate,
+        encode_p50_ms=statistics.median(latencies) * 1000,
+        encode_p99_ms=float(np.quantile(latencies, 0.99)) * 1000,
+        index_bytes=index_bytes,
+        load_rss_mb=load_rss,
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+
+
+def in_fresh_process(function: Callable[..., T], *args: Any) -> T:
+    """Run ``function`` in a new interpreter, so memory is measured alone."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(function, args)
+
+
+def format_report(results: list[ModelResult]) -> str:
+    front = pareto_front(results)
+    lines = [
+        f"{'':1} {'model':<32} {'dim':>5} {'top-1':>7} {'thresh':>7} {'no-ans':>7} "
+        f"{'p50 ms':>7} {'p99 ms':>7} {'index KB':>9} {'RSS MB':>7} {'peak MB':>8}"
+    ]
+    for r in sorted(results, key=lambda r: r.encode_p50_ms):
+        threshold = "-" if r.threshold is None else f"{r.threshold:.3f}"
+        no_answer = "-" if r.no_answer_rate is None else f"{r.no_answer_rate:.1%}"
+        lines.append(
+            f"{'*' if r.model in front else '':1} {r.model[-32:]:<32} "
+            f"{r.dimension:5d} {r.accuracy:7.1%} {threshold:>7} {no_answer:>7} "
+            f"{r.encode_p50_ms:7.2f} {r.encode_p99_ms:7.2f} "
+            f"{r.index_bytes / 1024:9.1f} {r.load_rss_mb:7.0f} {r.peak_rss_mb:8.0f}"
+        )
+    lines.append("* Pareto front: not beaten on top-1, p50 latency and RSS at once")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Embedding model comparison")
+    parser.add_argument("labeled", help="JSONL of questions and answer ids")
+    parser.add_argument("--models", nargs="+", required=True)
+    parser.add_argument("--faq", default="faq.json")
+    parser.add_argument("--false-answer-rate", type=float, default=0.05)
+    parser.add_argument("--output", help="Write the results as JSON here too")
+    args = parser.parse_args()
+
+    queries = load_labeled(args.labeled)
+    negatives = sum(q.answer_id is None for q in queries)
+    print(f"{len(queries)} labeled queries, {negatives} out of scope")
+    # Only models already on disk; children inherit the environment
+    os.environ["HF_HUB_OFFLINE"] = "1"
+
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        for i, model in enumerate(args.models):
+            directory = Path(scratch) / str(i)
+            directory.mkdir()
+            shutil.copy(args.faq, directory / "faq.json")
+            print(f"Building and evaluating {model}...", flush=True)
+            in_fresh_process(build, str(directory), model)
+            results.append(
+                in_fresh_process(
+                    evaluate, str(directory), model, queries, args.false_answer_rate
+                )
+            )
+
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([asdict(r) for r in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Write latency of online FAQ updates and search latency while they run.
+
+Loads the built index, attaches an updater with a journal in a temporary
+directory (the build artifacts are never touched) and measures:
+
+- add/update/delete latency, including encoding and the fsynced journal append
+- search latency alone, then with a writer thread updating continuously
+
+Usage (from apps/api, after ``python build.py``):
+    python -m benchmarks.bench_online_updates --queries queries.txt
+"""
+
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from engine import FAQEngine
+from faq import FAQEntry
+from faq_updates import FAQUpdater, Journal
+from loadgen import load_questions
+
+
+def summarize(name: str, latencies: list[float]) -> str:
+    p99 = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else 0.0
+    return (
+        f"  {name:<22} median {statistics.median(latencies) * 1000:7.2f} ms  "
+        f"p99 {p99 * 1000:7.2f} ms  (n={len(latencies)})"
+    )
+
+
+def timed(latencies: list[float], func, *args) -> None:  # type: ignore[no-untyped-def]
+    start = time.perf_counter()
+    func(*args)
+    latencies.append(time.perf_counter() - start)
+
+
+def search_latencies(engine: FAQEngine, queries: list[str], n: int) -> list[float]:
+    latencies: list[float] = []
+    for i in range(n):
+        timed(latencies, engine._search_sync, queries[i % len(queries)])
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Online FAQ update latency")
+    parser.add_argument("--queries", default="faq.json")
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--searches", type=int, default=1000)
+    parser.add_argument("--no-fsync", action="store_true")
+    args = parser.parse_args()
+
+    engine = FAQEngine()
+    engine.load_resources()
+    if not engine.is_ready:
+        raise SystemExit("Engine failed to load; build the index first.")
+    queries = load_questions(args.queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Journal(str(Path(tmp) / "faq.journal"), fsync=not args.no_fsync)
+        updater = FAQUpdater(engine, journal)
+        assert engine.index is not None
+        print(f"{engine.index.ntotal} vectors, fsync={not args.no_fsync}")
+
+        adds: list[float] = []
+        updates: list[float] = []
+        deletes: list[float] = []
+        for i in range(args.writes):
+            entry = FAQEntry(question=f"Benchmark question {i}?", answer=f"Answer {i}")
+            start = time.perf_counter()
+            answer_id = updater.add(entry)
+            adds.append(time.perf_counter() - start)
+            entry = FAQEntry(question=f"Updated question {i}?", answer=f"Answer {i}")
+            timed(updates, updater.update, answer_id, entry)
+            timed(deletes, updater.delete, answer_id)
+        print("Writes:")
+        print(summarize("add", adds))
+        print(summarize("update", updates))
+        print(summarize("delete", deletes))
+
+        idle = search_latencies(engine, queries, args.searches)
+
+        stop = threading.Event()
+
+        def write_continuously() -> None:
+            i = 0
+            while not stop.is_set():
+                answer_id = updater.add(
+                    FAQEntry(question=f"Concurrent question {i}?", answer="Answer")
+                )
+                updater.delete(answer_id)
+                i += 1
+
+        writer = threading.Thread(target=write_continuously)
+        writer.start()
+        try:
+            busy = search_latencies(engine, queries, args.searches)
+        finally:
+            stop.set()
+            writer.join()
+        journal.close()
+
+    print("Searches:")
+    print(summarize("no writes", idle))
+    print(summarize("during writes", busy))
+
+
+if __name__ == "__main__":
+    main()
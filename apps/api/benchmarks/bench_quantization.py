@@ -0,0 +1,102 @@
+"""
+Memory, latency and recall of quantized indexes with exact rerank.
+
+Runs on real embeddings (``--embeddings``, an .npy file written by build.py
+or any float32 matrix) or on synthetic clustered unit vectors shaped like
+MiniLM output. Queries are perturbed copies of indexed vectors; recall@1 is
+measured against the exact flat index.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_quantization [--entries 100000] [--dim 384]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import faiss
+import numpy as np
+
+from quantization import build_index, search_with_rerank
+
+
+def synthetic_embeddings(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Unit vectors grouped around n/50 topic centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = rng.normal(size=(max(n // 50, 1), dim)).astype(np.float32)
+    vectors = centroids[rng.integers(len(centroids), size=n)]
+    vectors += 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    normalized: np.ndarray = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return normalized
+
+
+def index_bytes(index: Any) -> int:
+    if isinstance(index, faiss.IndexBinary):
+        return len(faiss.serialize_index_binary(index))
+    return len(faiss.serialize_index(index))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Quantized index trade-offs")
+    parser.add_argument("--embeddings", default=None)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--candidates", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)
+    else:
+        vectors = synthetic_embeddings(args.entries, args.dim)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), size=args.queries, replace=False)
+    queries = vectors[picks] + 0.05 * rng.normal(size=(args.queries, vectors.shape[1]))
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+    exact = build_index(vectors, "flat")
+    _, truth = exact.search(queries, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "vectors.npy"
+        np.save(path, vectors)
+        mapped = np.load(path, mmap_mode="r")
+
+        print(
+            f"{len(vectors)} entries x {vectors.shape[1]} dims, "
+            f"shortlist {args.candidates}"
+        )
+        print(
+            f"{'index':<8} {'bytes/entry':>12} {'search us':>10} "
+            f"{'recall@1':>9} {'no-rerank recall@1':>19}"
+        )
+        for index_type in ("flat", "sq8", "sq4", "binary"):
+            index = build_index(vectors, index_type)
+            rerank = index_type != "flat"
+            latencies = []
+            found = np.empty(len(queries), dtype=np.int64)
+            coarse_found = np.empty(len(queries), dtype=np.int64)
+            for i, query in enumerate(queries):
+                q = query[None, :]
+                start = time.perf_counter()
+                if rerank:
+                    _, ids = search_with_rerank(index, mapped, q, 1, args.candidates)
+                else:
+                    _, ids = index.search(q, 1)
+                latencies.append(time.perf_counter() - start)
+                found[i] = ids[0, 0]
+                coarse_q = np.packbits(q > 0, axis=1) if index_type == "binary" else q
+                coarse_found[i] = index.search(coarse_q, 1)[1][0, 0]
+            print(
+                f"{index_type:<8} {index_bytes(index) / len(vectors):12.1f} "
+                f"{statistics.median(latencies) * 1e6:10.1f} "
+                f"{np.mean(found == truth[:, 0]):9.2%} "
+                f"{np.mean(coarse_found == truth[:, 0]):19.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Index size, search latency and top-1 agreement of reduced-dimension indexes.
+
+The corpus and queries are encoded once with the configured model; each
+reduction (PCA and truncation at several dimensions) is then fitted through
+the same code as ``build.py`` and compared with the full-dimension index.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_reduction --corpus faq.json --queries queries.txt \\
+        --dims 256 128 64 32
+"""
+
+import argparse
+import statistics
+import time
+
+import faiss
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from encoding import encode_length_bucketed
+from loadgen import load_questions
+from reduction import apply_reduction, fit_reduction
+from settings import settings
+
+
+def build_index(vectors: np.ndarray) -> faiss.Index:
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def measure(index: faiss.Index, queries: np.ndarray) -> tuple[np.ndarray, float]:
+    """Top-1 ids and median single-query search latency (seconds)."""
+    top1 = np.empty(len(queries), dtype=np.int64)
+    latencies = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], 1)
+        latencies.append(time.perf_counter() - start)
+        top1[i] = ids[0, 0]
+    return top1, statistics.median(latencies)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reduced-dimension indexes")
+    parser.add_argument("--corpus", default="faq.json")
+    parser.add_argument("--queries", default="faq.json")
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 128, 64, 32])
+    args = parser.parse_args()
+
+    model = SentenceTransformer(settings.model_name, device="cpu")
+    model.max_seq_length = settings.max_seq_length
+    corpus = encode_length_bucketed(model, load_questions(args.corpus))
+    queries = encode_length_bucketed(model, load_questions(args.queries))
+
+    full_index = build_index(corpus)
+    full_top1, full_latency = measure(full_index, queries)
+    full_size = len(faiss.serialize_index(full_index))
+
+    print(
+        f"{'method':<9} {'dim':>5} {'index KB':>10} "
+        f"{'search us':>10} {'top-1 agree':>12}"
+    )
+    print(
+        f"{'full':<9} {corpus.shape[1]:5d} {full_size / 1024:10.1f} "
+        f"{full_latency * 1e6:10.1f} {1.0:12.2%}"
+    )
+    for method in ("pca", "truncate"):
+        for dim in args.dims:
+            try:
+                transform = fit_reduction(corpus, method, dim)
+            except ValueError as e:
+                print(f"{method:<9} {dim:5d} skipped: {e}")
+                continue
+            normalize = method == "truncate"
+            index = build_index(apply_reduction(transform, corpus, normalize))
+            reduced_queries = apply_reduction(transform, queries, normalize)
+            top1, latency = measure(index, reduced_queries)
+            size = len(faiss.serialize_index(index))
+            agreement = float(np.mean(top1 == full_top1))
+            print(
+                f"{method:<9} {dim:5d} {size / 1024:10.1f} "
+                f"{latency * 1e6:10.1f} {agreement:12.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Per-request CPU cost of building and serializing the /chat response.
+
+"model" is the previous path: build the nested Pydantic models with a uuid4
+id, let FastAPI re-validate them against ``response_model`` and serialize.
+"raw" splices the id, timestamp and pre-encoded answer into a byte template.
+Both are measured in isolation and through a FastAPI route over ASGI.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_response [--iterations 20000]
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI, Response
+
+from response import (
+    ChatCompletionResponse,
+    RawJSONResponse,
+    build_chat_completion_response,
+    encode_content,
+    render_chat_completion,
+)
+
+ANSWER = "Refunds are processed within 7 business days."
+ENCODED_ANSWER = encode_content(ANSWER)  # As the engine stores it
+
+
+def build_model_response() -> ChatCompletionResponse:
+    response = build_chat_completion_response(content=ANSWER)
+    response.id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    return response
+
+
+def bench_serialization(iterations: int) -> dict[str, float]:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        model = build_model_response()
+        validated = ChatCompletionResponse.model_validate(model.model_dump())
+        validated.model_dump_json().encode()
+    model_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render_chat_completion(ENCODED_ANSWER)
+    raw_time = time.perf_counter() - start
+
+    return {"model": model_time, "raw": raw_time}
+
+
+async def bench_route(iterations: int) -> dict[str, float]:
+    app = FastAPI()
+
+    @app.post("/model", response_model=ChatCompletionResponse)
+    async def model_route() -> ChatCompletionResponse:
+        return build_model_response()
+
+    @app.post("/raw", response_model=ChatCompletionResponse)
+    async def raw_route() -> Response:
+        return RawJSONResponse(render_chat_completion(ENCODED_ANSWER))
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://b") as client:
+        for name in ("model", "raw"):
+            await client.post(f"/{name}")  # warm up
+            start = time.process_time()
+            for _ in range(iterations):
+                await client.post(f"/{name}")
+            results[name] = time.process_time() - start
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Response construction cost")
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    serialization = bench_serialization(n)
+    route = asyncio.run(bench_route(n // 10))
+
+    print(f"{'path':<8} {'build+serialize us':>20} {'route CPU us':>14}")
+    for name in ("model", "raw"):
+        print(
+            f"{name:<8} {serialization[name] / n * 1e6:20.2f} "
+            f"{route[name] / (n // 10) * 1e6:14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
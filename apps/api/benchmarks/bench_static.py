@@ -0,0 +1,126 @@
+"""
+Transfer size and per-request CPU of serving the web build.
+
+Compares three ways to serve the same directory: the previous
+``StaticFiles(html=True)`` mount, the same mount behind Starlette's
+``GZipMiddleware`` (compressing per request), and
+``PrecompressedStaticFiles`` serving the build-time .br/.gz files. Each
+app is called directly over ASGI, without a server, so the numbers are the
+serving path alone. One "page load" fetches ``index.html`` and every file
+under ``assets/`` the way a browser does (``Accept-Encoding: gzip, br``).
+Run ``node apps/web/scripts/precompress.js <dist>`` on the directory first.
+
+Usage (from apps/api):
+    python -m benchmarks.bench_static --directory ../web/dist
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.staticfiles import StaticFiles
+from starlette.types import ASGIApp, Message
+
+from settings import settings
+from static_files import ENCODINGS, PrecompressedStaticFiles
+
+ACCEPT_ENCODING = b"gzip, deflate, br"
+
+
+async def fetch(app: ASGIApp, path: str) -> int:
+    """Bytes of body sent for a GET of ``path``."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", ACCEPT_ENCODING)],
+        "client": ("127.0.0.1", 1),
+        "server": ("bench", 80),
+    }
+    sent = 0
+    requested = False
+    never = asyncio.Event()
+
+    async def receive() -> Message:
+        # The request, then nothing: the client stays connected
+        nonlocal requested
+        if requested:
+            await never.wait()
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: Message) -> None:
+        nonlocal sent
+        if message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sent
+
+
+async def page_load(app: ASGIApp, paths: list[str]) -> int:
+    return sum([await fetch(app, path) for path in paths])
+
+
+async def bench(app: ASGIApp, paths: list[str], loads: int) -> tuple[int, float, float]:
+    """(bytes per page load, CPU us per request, wall us per request)."""
+    size = await page_load(app, paths)  # Warm up
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(loads):
+        await page_load(app, paths)
+    requests = loads * len(paths)
+    return (
+        size,
+        (time.process_time() - cpu) / requests * 1e6,
+        (time.perf_counter() - wall) / requests * 1e6,
+    )
+
+
+def mounted(app: ASGIApp) -> Starlette:
+    starlette = Starlette()
+    starlette.mount("/", app)
+    return starlette
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Static frontend serving")
+    parser.add_argument("--directory", default=settings.web_dist_path)
+    parser.add_argument("--loads", type=int, default=200)
+    args = parser.parse_args()
+
+    root = Path(args.directory)
+    suffixes = tuple(ENCODINGS.values())
+    assets = sorted(
+        p
+        for p in (root / "assets").iterdir()
+        if p.is_file() and p.suffix not in suffixes
+    )
+    paths = ["/"] + [f"/assets/{p.name}" for p in assets]
+
+    static = StaticFiles(directory=args.directory, html=True)
+    gzipped = Starlette()
+    gzipped.mount("/", static)
+    apps: dict[str, ASGIApp] = {
+        "StaticFiles": mounted(static),
+        "StaticFiles+GZip": GZipMiddleware(gzipped),
+        "Precompressed": mounted(PrecompressedStaticFiles(args.directory)),
+    }
+
+    print(f"{len(paths)} requests per page load")
+    print(f"{'serving':<18} {'KB/load':>9} {'CPU us/req':>11} {'wall us/req':>12}")
+    for name, app in apps.items():
+        size, cpu, wall = asyncio.run(bench(app, paths, args.loads))
+        print(f"{name:<18} {size / 1024:9.1f} {cpu:11.1f} {wall:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
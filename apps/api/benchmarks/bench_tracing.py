@@ -0,0 +1,98 @@
+"""
+Request-path overhead of tracing at 0%, 1% and 100% sampling.
+
+"spans" times the span bookkeeping alone: a root span with the same eight
+children a /chat request records, and no work inside. "pipeline" times
+``ChatService.process_chat_request_raw`` against the built index, under a
+root span, with requests run one after another. Spans are exported to a
+file in a temporary directory by the background thread, as in production.
+
+Usage (from apps/api, after ``python build.py``):
+    python -m benchmarks.bench_tracing --queries faq.json
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import tracing
+from chat_service import ChatService
+from engine import FAQEngine
+from loadgen import load_questions
+from response import ChatCompletionMessage
+
+STAGES = [
+    "ChatService.process_chat_request",
+    "executor.wait",
+    "encode",
+    "tokenize",
+    "faiss.search",
+    "serialize",
+]
+
+
+def configure(rate: float | None, directory: str) -> None:
+    """No tracing at all for ``None``, else export to a file at ``rate``."""
+    tracing.shutdown_tracing()
+    if rate is not None:
+        path = str(Path(directory) / f"traces-{rate}.jsonl")
+        tracing.setup_tracing(tracing.FileSpanExporter(path), rate)
+
+
+def bench_spans(iterations: int) -> float:
+    """Microseconds per request for the span bookkeeping alone."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with tracing.root_span("POST /chat"):
+            for stage in STAGES:
+                with tracing.span(stage):
+                    pass
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def bench_pipeline(service: ChatService, queries: list[str]) -> list[float]:
+    latencies = []
+    for query in queries:
+        messages = [ChatCompletionMessage(role="user", content=query)]
+        start = time.perf_counter()
+        with tracing.root_span("POST /chat"):
+            await service.process_chat_request_raw(messages)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Tracing overhead")
+    parser.add_argument("--queries", default="faq.json")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=50000)
+    args = parser.parse_args()
+
+    engine = FAQEngine()
+    engine.load_resources()
+    if not engine.is_ready:
+        raise SystemExit("Engine failed to load; build the index first.")
+    service = ChatService(engine)
+    questions = load_questions(args.queries)
+    # Distinct strings so coalescing never shares a search between requests
+    queries = [f"{questions[i % len(questions)]} {i}" for i in range(args.requests)]
+
+    print(f"{'sampling':<10} {'spans us/req':>13} {'median ms':>10} {'mean ms':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, rate in [("off", None), ("1%", 0.01), ("100%", 1.0)]:
+            configure(rate, tmp)
+            spans_us = bench_spans(args.iterations)
+            latencies = asyncio.run(bench_pipeline(service, queries))
+            print(
+                f"{label:<10} {spans_us:13.2f} "
+                f"{statistics.median(latencies) * 1000:10.3f} "
+                f"{statistics.mean(latencies) * 1000:9.3f}"
+            )
+        tracing.shutdown_tracing()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Per-message latency and server CPU: WebSocket session vs ``POST /chat``.
+
+Runs sessions of ``--messages`` questions against a running server, once
+over a single WebSocket per session and once as HTTP requests on a pooled
+keep-alive client (the best case for HTTP). Each HTTP session sends its own
+X-Forwarded-For so the per-IP rate limit applies as it would to separate
+users. With ``--pid`` the server's CPU time is read from /proc before and
+after each mode (Linux only).
+
+Usage (from apps/api, server started separately):
+    uvicorn main:app --port 8000 &
+    python -m benchmarks.bench_websocket --url http://localhost:8000 --pid $!
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+from websockets.asyncio.client import connect
+
+from loadgen import load_questions
+
+
+def server_cpu_seconds(pid: int | None) -> float:
+    """User + system CPU time of ``pid`` (0.0 when not measured)."""
+    if pid is None:
+        return 0.0
+    with open(f"/proc/{pid}/stat") as f:
+        # Fields after the parenthesised command name; utime/stime are 14, 15
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def chat_body(question: str) -> str:
+    return json.dumps({"messages": [{"role": "user", "content": question}]})
+
+
+async def http_session(url: str, questions: list[str]) -> list[float]:
+    latencies = []
+    client_ip = f"10.0.{random.randrange(256)}.{random.randrange(256)}"
+    headers = {"content-type": "application/json", "x-forwarded-for": client_ip}
+    async with httpx.AsyncClient(base_url=url, headers=headers) as client:
+        for question in questions:
+            start = time.perf_counter()
+            response = await client.post("/chat", content=chat_body(question))
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def websocket_session(url: str, questions: list[str]) -> list[float]:
+    latencies = []
+    ws_url = url.replace("http", "ws", 1) + "/chat/ws"
+    async with connect(ws_url) as ws:
+        for question in questions:
+            start = time.perf_counter()
+            await ws.send(chat_body(question))
+            reply = json.loads(await ws.recv())
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def measure(
+    session: Callable[[str, list[str]], Awaitable[list[float]]],
+    args: argparse.Namespace,
+    questions: list[str],
+) -> tuple[list[float], float]:
+    """Per-message latencies and server CPU seconds per message."""
+    latencies: list[float] = []
+    cpu_before = server_cpu_seconds(args.pid)
+    for i in range(args.sessions):
+        offset = i * args.messages
+        batch = [questions[(offset + j) % len(questions)] for j in range(args.messages)]
+        latencies.extend(await session(args.url, batch))
+    cpu = server_cpu_seconds(args.pid) - cpu_before
+    return latencies, cpu / len(latencies)
+
+
+def summarize(name: str, latencies: list[float], cpu: float, pid: int | None) -> str:
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    line = (
+        f"{name:<10} median {statistics.median(latencies) * 1000:7.2f} ms  "
+        f"p99 {p99 * 1000:7.2f} ms"
+    )
+    if pid is not None:
+        line += f"  server CPU {cpu * 1000:6.2f} ms/message"
+    return line
+
+
+async def run(args: argparse.Namespace) -> None:
+    questions = load_questions(args.questions)
+    # Warm up both paths (connection setup, caches) before measuring
+    await http_session(args.url, questions[:5])
+    await websocket_session(args.url, questions[:5])
+
+    print(f"{args.sessions} sessions x {args.messages} messages")
+    for name, session in (("http", http_session), ("websocket", websocket_session)):
+        latencies, cpu = await measure(session, args, questions)
+        print(summarize(name, latencies, cpu, args.pid))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="WebSocket vs HTTP chat sessions")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--questions", default="faq.json")
+    parser.add_argument("--sessions", type=int, default=25)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--pid", type=int, default=None, help="Server process id")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
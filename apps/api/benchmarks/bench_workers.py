@@ -0,0 +1,162 @@
+"""
+Memory and throughput: pre-forked ``server.py`` vs ``uvicorn --workers``.
+
+For each worker count, starts the server in a subprocess (from the current
+directory, which must hold the built index), waits until every process has
+settled, then records the memory of the whole process tree and runs a
+closed-loop ``POST /chat`` load. RSS counts shared pages once per process;
+PSS splits them between the processes sharing them, so its sum is the real
+footprint. Linux only (reads /proc).
+
+Usage (from apps/api, after ``python build.py``):
+    python -m benchmarks.bench_workers --workers 1 2 4 8
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from loadgen import load_questions
+
+SERVER = Path(__file__).resolve().parent.parent / "server.py"
+
+
+def descendants(pid: int) -> list[int]:
+    """``pid`` and every process below it."""
+    parents: dict[int, list[int]] = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        parents.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+    tree, queue = [], [pid]
+    while queue:
+        current = queue.pop()
+        tree.append(current)
+        queue.extend(parents.get(current, []))
+    return tree
+
+
+def memory_kb(pids: list[int]) -> tuple[int, int]:
+    """Summed (RSS, PSS) of ``pids`` in kB."""
+    rss = pss = 0
+    for pid in pids:
+        try:
+            rollup = Path(f"/proc/{pid}/smaps_rollup").read_text()
+        except OSError:
+            continue
+        for line in rollup.splitlines():
+            name, _, value = line.partition(":")
+            if name == "Rss":
+                rss += int(value.split()[0])
+            elif name == "Pss":
+                pss += int(value.split()[0])
+    return rss, pss
+
+
+def start_server(mode: str, workers: int, port: int) -> subprocess.Popen[bytes]:
+    if mode == "prefork":
+        command = [sys.executable, str(SERVER), "--workers", str(workers)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app"]
+        command += ["--workers", str(workers)]
+    command += ["--port", str(port)]
+    env = {**os.environ, "PYTHONPATH": str(SERVER.parent)}
+    return subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_until_settled(
+    process: subprocess.Popen[bytes], url: str, workers: int, timeout: float = 300
+) -> None:
+    """Ready answers and a process tree whose memory stopped growing."""
+    deadline = time.monotonic() + timeout
+    previous = -1
+    while time.monotonic() < deadline:
+        time.sleep(2)
+        if process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            ready = httpx.get(f"{url}/ready").status_code == 200
+        except httpx.HTTPError:
+            ready = False
+        tree = descendants(process.pid)
+        _, pss = memory_kb(tree)
+        if ready and len(tree) >= workers and abs(pss - previous) < 0.01 * pss:
+            return
+        previous = pss
+    raise RuntimeError("Server did not settle in time")
+
+
+async def closed_loop(
+    url: str, questions: list[str], concurrency: int, duration: float
+) -> float:
+    """Successful requests per second with ``concurrency`` clients."""
+    completed = 0
+    deadline = time.monotonic() + duration
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        nonlocal completed
+        while time.monotonic() < deadline:
+            body = {"messages": [{"role": "user", "content": random.choice(questions)}]}
+            # Spread requests over client IPs so the per-IP rate limit stays out
+            # of the measurement
+            ip = f"10.{random.randrange(256)}.{random.randrange(256)}.1"
+            response = await client.post(
+                "/chat", json=body, headers={"x-forwarded-for": ip}
+            )
+            completed += response.status_code == 200
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        start = time.monotonic()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        return completed / (time.monotonic() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-fork vs uvicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--questions", default="faq.json")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--port", type=int, default=8300)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    url = f"http://127.0.0.1:{args.port}"
+    print(
+        f"{'mode':<8} {'workers':>7} {'RSS MB':>8} {'PSS MB':>8} {'req/s':>8}",
+        flush=True,
+    )
+    for workers in args.workers:
+        for mode in ("prefork", "uvicorn"):
+            process = start_server(mode, workers, args.port)
+            try:
+                wait_until_settled(process, url, workers)
+                rss, pss = memory_kb(descendants(process.pid))
+                throughput = asyncio.run(
+                    closed_loop(url, questions, args.concurrency, args.duration)
+                )
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait()
+            print(
+                f"{mode:<8} {workers:7d} {rss / 1024:8.0f} {pss / 1024:8.0f} "
+                f"{throughput:8.1f}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
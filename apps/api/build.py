@@ -2,43 +2,136 @@ import json
 
 import faiss
 import numpy as np
+from pydantic import ValidationError
 from sentence_transformers import SentenceTransformer
 
+from encoding import encode_length_bucketed
+from faq import flatten, load_faq
+from index_manifest import IndexManifest, compute_build_id, save_manifest
+from quantization import build_index, write_index
+from reduction import apply_reduction, fit_reduction
 from settings import settings
+from sharding import build_shard_index, partition
+from static_encoder import StaticEncoder, distill_static_embeddings
 
 
 def main() -> None:
     print(f"Loading model: {settings.model_name}")
     model = SentenceTransformer(settings.model_name)
+    model.max_seq_length = settings.max_seq_length
 
     print("Loading FAQ data...")
     try:
-        with open("faq.json") as f:
-            faq = json.load(f)
+        entries = load_faq("faq.json")
     except FileNotFoundError:
         print("Error: faq.json not found.")
         return
+    except ValidationError as e:
+        print(f"Error: invalid faq.json: {e}")
+        return
 
-    questions = [q["question"] for q in faq]
-    answers = [q["answer"] for q in faq]
+    # One vector per question variant; answers are stored once
+    questions, answer_ids, answers = flatten(entries)
+    print(f"{len(answers)} answers, {len(questions)} questions")
 
     print("Generating embeddings...")
-    embeddings = model.encode(questions)
+    embeddings = encode_length_bucketed(
+        model, questions, batch_size=settings.encode_batch_size
+    )
 
-    # Faiss index
-    print("Building FAISS index...")
-    index = faiss.IndexFlatL2(embeddings.shape[1])
     embeddings = np.array(embeddings, dtype=np.float32)
-    index.add(embeddings)
+    model_dimension = embeddings.shape[1]
+
+    # Optional dimensionality reduction, stored as a transform file
+    transform_path = None
+    normalize = settings.reduction_method == "truncate"
+    if settings.reduced_dimension:
+        print(
+            f"Reducing embeddings to {settings.reduced_dimension} dimensions "
+            f"({settings.reduction_method})..."
+        )
+        try:
+            transform = fit_reduction(
+                embeddings, settings.reduction_method, settings.reduced_dimension
+            )
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        embeddings = apply_reduction(transform, embeddings, normalize)
+        transform_path = settings.faiss_transform_path
+        print(f"Saving transform to {transform_path}...")
+        faiss.write_VectorTransform(transform, transform_path)
+
+    # Faiss index
+    print(f"Building FAISS index ({settings.index_type})...")
+    try:
+        index = build_index(embeddings, settings.index_type)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
 
     print(f"Saving index to {settings.faiss_index_path}...")
-    faiss.write_index(index, settings.faiss_index_path)
+    write_index(index, settings.faiss_index_path)
+
+    # Quantized indexes rerank their shortlist against the float vectors
+    rerank_vectors_path = None
+    if settings.index_type != "flat":
+        rerank_vectors_path = settings.rerank_vectors_path
+        print(f"Saving rerank vectors to {rerank_vectors_path}...")
+        np.save(rerank_vectors_path, embeddings)
+
+    # Shard artifacts for a scatter-gather deployment
+    shard_paths = []
+    if settings.num_shards > 1:
+        for shard, ids in enumerate(partition(len(embeddings), settings.num_shards)):
+            shard_path = f"index.shard{shard}.faiss"
+            print(f"Saving shard {shard} ({len(ids)} entries) to {shard_path}...")
+            faiss.write_index(build_shard_index(embeddings[ids], ids), shard_path)
+            shard_paths.append(shard_path)
+
+    # Static token embeddings for the cheap first stage of a cascaded search
+    static_embeddings_path = static_index_path = None
+    if settings.cascade_enabled:
+        print("Distilling static token embeddings...")
+        table = distill_static_embeddings(model)
+        static_embeddings_path = settings.static_embeddings_path
+        static_index_path = settings.static_index_path
+        print(f"Saving static embeddings to {static_embeddings_path}...")
+        np.save(static_embeddings_path, table)
+        static_index = faiss.IndexFlatL2(table.shape[1])
+        static_index.add(StaticEncoder(model.tokenizer, table).encode(questions))
+        print(f"Saving static index to {static_index_path}...")
+        faiss.write_index(static_index, static_index_path)
 
     # Save answers (for retrieval)
     print(f"Saving answers to {settings.answers_json_path}...")
     with open(settings.answers_json_path, "w") as f:
         json.dump(answers, f)
 
+    answer_ids_path = None
+    if len(questions) != len(answers):
+        answer_ids_path = settings.answer_ids_path
+        print(f"Saving answer id map to {answer_ids_path}...")
+        np.save(answer_ids_path, answer_ids)
+
+    manifest = IndexManifest(
+        build_id=compute_build_id(embeddings, answer_ids, answers),
+        model_name=settings.model_name,
+        model_dimension=model_dimension,
+        dimension=embeddings.shape[1],
+        reduction=settings.reduction_method if transform_path else "none",
+        transform_path=transform_path,
+        normalize=normalize and transform_path is not None,
+        index_type=settings.index_type,
+        rerank_vectors_path=rerank_vectors_path,
+        static_embeddings_path=static_embeddings_path,
+        static_index_path=static_index_path,
+        shard_paths=shard_paths,
+        answer_ids_path=answer_ids_path,
+    )
+    print(f"Saving manifest to {settings.index_manifest_path}...")
+    save_manifest(manifest, settings.index_manifest_path)
+
     print("Done!")
 
 
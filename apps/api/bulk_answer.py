@@ -0,0 +1,420 @@
+"""
+Answer a JSONL file of questions offline, straight through ``FAQEngine``.
+
+For batch jobs such as nightly ticket triage, which would otherwise send
+millions of requests to the API. Questions are read in batches of
+``--batch-size`` rows and each batch is searched at once, encoded in
+token-length buckets. With ``--processes N`` the engine is loaded once and
+N forked workers share it copy-on-write, as in server.py. Results are
+written in input order.
+
+torch's and OpenMP's thread pools do not survive a fork, so with several
+processes the parent runs no model or FAISS work before forking: thread
+autotuning is skipped, and each worker sets its own thread counts in the
+pool initializer and warms up on its first batch.
+
+Each input line is a JSON object with the question under ``--field``
+(default ``question``), or a bare JSON string. Values under ``--id-field``
+are copied to JSON lines output. Unreadable rows are not searched and come
+out unanswered.
+
+After every batch the output is flushed and a checkpoint next to it
+(``<output>.checkpoint.json``) records how far the input and output got.
+``--resume`` truncates the output back to the checkpoint and carries on
+from there, as long as the index build is the same.
+
+Output formats:
+- ``jsonl``: one object per row with ``row``, ``id``, ``answered``,
+  ``answer_id`` (nearest, even when too far), ``distance`` and ``answer``.
+- ``columns``: a directory of raw little-endian arrays, ``answer_id.i32``,
+  ``distance.f32`` and ``answered.u8``, one value per row, readable with
+  ``np.fromfile`` or ``np.memmap``, described by ``columns.json``.
+
+Usage (from apps/api, after ``python build.py``):
+    python bulk_answer.py tickets.jsonl answers.jsonl --processes 4
+    python bulk_answer.py tickets.jsonl answers/ --format columns --resume
+"""
+
+import argparse
+import gc
+import json
+import math
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Protocol
+
+import numpy as np
+from pydantic import BaseModel
+
+from cpu_tuning import apply_thread_config
+from engine import FAQEngine
+from settings import settings
+
+# Column name -> (file suffix, dtype)
+COLUMNS = {
+    "answer_id": ("i32", "<i4"),
+    "distance": ("f32", "<f4"),
+    "answered": ("u8", "u1"),
+}
+PROGRESS_INTERVAL = 5.0
+
+# Set before the workers fork; they inherit it
+_engine: FAQEngine | None = None
+
+
+@dataclass
+class Batch:
+    first_row: int
+    end_offset: int  # Input byte offset just past the batch
+    ids: list[Any] = field(default_factory=list)
+    questions: list[str | None] = field(default_factory=list)  # None: unreadable
+
+
+class Checkpoint(BaseModel):
+    build_id: str | None
+    input_offset: int = 0
+    rows: int = 0
+    output_bytes: int = 0  # JSON lines only
+
+
+def parse_question(
+    line: bytes, field: str, id_field: str | None
+) -> tuple[Any, str | None]:
+    """(id, question) of an input line; question None if there is none."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None, None
+    if isinstance(record, str):
+        return None, record if record.strip() else None
+    if not isinstance(record, dict):
+        return None, None
+    question = record.get(field)
+    ident = record.get(id_field) if id_field else None
+    if not isinstance(question, str) or not question.strip():
+        return ident, None
+    return ident, question
+
+
+def read_batches(
+    path: str,
+    batch_size: int,
+    field: str = "question",
+    id_field: str | None = None,
+    offset: int = 0,
+    first_row: int = 0,
+) -> Iterator[Batch]:
+    """Batches of non-blank lines from byte ``offset`` on."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        batch = Batch(first_row, offset)
+        for line in f:
+            offset += len(line)
+            if not line.strip():
+                continue
+            ident, question = parse_question(line, field, id_field)
+            batch.ids.append(ident)
+            batch.questions.append(question)
+            if len(batch.questions) >= batch_size:
+                batch.end_offset = offset
+                yield batch
+                batch = Batch(batch.first_row + len(batch.questions), offset)
+        if batch.questions:
+            batch.end_offset = offset
+            yield batch
+
+
+def answer_batch(questions: list[str | None]) -> tuple[np.ndarray, np.ndarray]:
+    """Nearest answer ids and distances; (-1, inf) for unreadable rows."""
+    assert _engine is not None
+    answer_ids = np.full(len(questions), -1, dtype=np.int32)
+    distances = np.full(len(questions), np.inf, dtype=np.float32)
+    rows = [i for i, question in enumerate(questions) if question is not None]
+    if rows:
+        found_ids, found_distances = _engine.search_many(
+            [questions[i] for i in rows],  # type: ignore[misc]
+            settings.encode_batch_size,
+        )
+        answer_ids[rows] = found_ids
+        distances[rows] = found_distances
+    return answer_ids, distances
+
+
+def init_worker() -> None:
+    """Runs in each forked worker before its first batch."""
+    assert _engine is not None
+    if _engine.thread_config is not None:
+        apply_thread_config(_engine.thread_config)
+
+
+def answer_all(
+    batches: Iterator[Batch], processes: int
+) -> Iterator[tuple[Batch, tuple[np.ndarray, np.ndarray]]]:
+    """Results in input order, with at most two batches per process queued."""
+    if processes <= 1:
+        for batch in batches:
+            yield batch, answer_batch(batch.questions)
+        return
+
+    context = multiprocessing.get_context("fork")
+    with context.Pool(processes, initializer=init_worker) as pool:
+        pending: deque[tuple[Batch, Any]] = deque()
+        for batch in batches:
+            pending.append((batch, pool.apply_async(answer_batch, (batch.questions,))))
+            if len(pending) >= 2 * processes:
+                done, result = pending.popleft()
+                yield done, result.get()
+        while pending:
+            done, result = pending.popleft()
+            yield done, result.get()
+
+
+class Writer(Protocol):
+    def write(
+        self, batch: Batch, answer_ids: np.ndarray, distances: np.ndarray
+    ) -> None: ...
+
+    def flush(self) -> int:
+        """Make written rows durable; returns the output position."""
+        ...
+
+    def close(self, rows: int) -> None: ...
+
+
+def open_at(path: Path, size: int | None) -> BinaryIO:
+    """``path`` cut off and positioned at ``size``, or a new file for None."""
+    if size is None:
+        return open(path, "wb")
+    try:
+        file = open(path, "r+b")
+    except FileNotFoundError:
+        raise SystemExit(
+            f"Cannot resume: {path} is missing; run without --resume to start over"
+        ) from None
+    if os.fstat(file.fileno()).st_size < size:
+        file.close()
+        raise SystemExit(
+            f"Cannot resume: {path} is shorter than its checkpoint; "
+            "run without --resume to start over"
+        )
+    file.truncate(size)
+    file.seek(size)
+    return file
+
+
+class JsonlWriter:
+    def __init__(
+        self, path: Path, answers: list[str | None], checkpoint: Checkpoint | None
+    ) -> None:
+        self.answers = answers
+        self.file = open_at(path, checkpoint.output_bytes if checkpoint else None)
+
+    def write(
+        self, batch: Batch, answer_ids: np.ndarray, distances: np.ndarray
+    ) -> None:
+        answered = distances <= settings.similarity_threshold
+        lines = []
+        for i, (answer_id, distance) in enumerate(
+            zip(answer_ids.tolist(), distances.tolist(), strict=True)
+        ):
+            row = {
+                "row": batch.first_row + i,
+                "id": batch.ids[i],
+                "answered": bool(answered[i]),
+                "answer_id": answer_id if answer_id >= 0 else None,
+                "distance": None if math.isinf(distance) else distance,
+                "answer": self.answers[answer_id] if answered[i] else None,
+            }
+            lines.append(json.dumps(row) + "\n")
+        self.file.write("".join(lines).encode())
+
+    def flush(self) -> int:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self, rows: int) -> None:
+        self.file.close()
+
+
+class ColumnWriter:
+    def __init__(
+        self, directory: Path, build_id: str | None, checkpoint: Checkpoint | None
+    ) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self.build_id = build_id
+        self.files = {}
+        for name, (suffix, dtype) in COLUMNS.items():
+            size = checkpoint.rows * np.dtype(dtype).itemsize if checkpoint else None
+            self.files[name] = open_at(directory / f"{name}.{suffix}", size)
+
+    def write(
+        self, batch: Batch, answer_ids: np.ndarray, distances: np.ndarray
+    ) -> None:
+        columns = {
+            "answer_id": answer_ids,
+            "distance": distances,
+            "answered": distances <= settings.similarity_threshold,
+        }
+        for name, (_, dtype) in COLUMNS.items():
+            self.files[name].write(columns[name].astype(dtype).tobytes())
+
+    def flush(self) -> int:
+        for file in self.files.values():
+            file.flush()
+            os.fsync(file.fileno())
+        return 0
+
+    def close(self, rows: int) -> None:
+        for file in self.files.values():
+            file.close()
+        description = {
+            "rows": rows,
+            "build_id": self.build_id,
+            "similarity_threshold": settings.similarity_threshold,
+            "columns": {
+                name: {"file": f"{name}.{suffix}", "dtype": dtype}
+                for name, (suffix, dtype) in COLUMNS.items()
+            },
+        }
+        (self.directory / "columns.json").write_text(json.dumps(description, indent=2))
+
+
+def checkpoint_path(output: str) -> Path:
+    return Path(output.rstrip("/") + ".checkpoint.json")
+
+
+def save_checkpoint(path: Path, checkpoint: Checkpoint) -> None:
+    temporary = path.with_name(path.name + ".tmp")
+    temporary.write_text(checkpoint.model_dump_json())
+    os.replace(temporary, path)
+
+
+def bulk_answer(
+    engine: FAQEngine,
+    input_path: str,
+    output: str,
+    output_format: str = "jsonl",
+    batch_size: int = 2048,
+    processes: int = 1,
+    resume: bool = False,
+    field: str = "question",
+    id_field: str | None = None,
+) -> tuple[int, int, int]:
+    """
+    Answer every row from the checkpoint on; returns the rows processed and
+    answered in this run, and the rows done in total.
+    """
+    global _engine
+    assert engine.answers is not None
+    build_id = engine.manifest.build_id if engine.manifest else None
+    progress_path = checkpoint_path(output)
+    checkpoint = None
+    if resume and progress_path.exists():
+        checkpoint = Checkpoint.model_validate_json(progress_path.read_text())
+        if checkpoint.build_id != build_id:
+            raise SystemExit(
+                f"Checkpoint is for build {checkpoint.build_id}, not {build_id}; "
+                "run without --resume to start over"
+            )
+
+    writer: Writer
+    if output_format == "columns":
+        writer = ColumnWriter(Path(output), build_id, checkpoint)
+    else:
+        writer = JsonlWriter(Path(output), engine.answers, checkpoint)
+
+    # Workers inherit the engine; frozen objects are never touched by their
+    # collections, so the pages holding them stay shared
+    _engine = engine
+    gc.collect()
+    gc.freeze()
+
+    rows = checkpoint.rows if checkpoint else 0
+    batches = read_batches(
+        input_path,
+        batch_size,
+        field,
+        id_field,
+        checkpoint.input_offset if checkpoint else 0,
+        rows,
+    )
+    start = last_report = time.perf_counter()
+    done = answered = 0
+    try:
+        for batch, (answer_ids, distances) in answer_all(batches, processes):
+            writer.write(batch, answer_ids, distances)
+            rows = batch.first_row + len(batch.questions)
+            done += len(batch.questions)
+            answered += int((distances <= settings.similarity_threshold).sum())
+            save_checkpoint(
+                progress_path,
+                Checkpoint(
+                    build_id=build_id,
+                    input_offset=batch.end_offset,
+                    rows=rows,
+                    output_bytes=writer.flush(),
+                ),
+            )
+            now = time.perf_counter()
+            if now - last_report >= PROGRESS_INTERVAL:
+                rate = done / (now - start)
+                print(f"{rows} rows, {rate:.0f} rows/s", file=sys.stderr, flush=True)
+                last_report = now
+    finally:
+        writer.close(rows)
+        gc.unfreeze()
+    progress_path.unlink(missing_ok=True)
+    return done, answered, rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions")
+    parser.add_argument("input", help="JSONL file of questions")
+    parser.add_argument("output", help="Output file (jsonl) or directory (columns)")
+    parser.add_argument("--format", choices=["jsonl", "columns"], default="jsonl")
+    parser.add_argument("--batch-size", type=int, default=2048)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--field", default="question", help="Key of the question")
+    parser.add_argument("--id-field", help="Key copied to the output with each row")
+    args = parser.parse_args()
+
+    # Split the CPUs between the processes, as between server workers
+    settings.workers = args.processes
+    if args.processes > 1:
+        # Autotuning runs searches, and thread pools must not exist at the fork
+        settings.thread_autotune = False
+    engine = FAQEngine()
+    engine.load_resources()
+    if not engine.is_ready or engine.index is None:
+        raise SystemExit("Engine failed to load; build a local index first.")
+
+    start = time.perf_counter()
+    done, answered, rows = bulk_answer(
+        engine,
+        args.input,
+        args.output,
+        args.format,
+        args.batch_size,
+        args.processes,
+        args.resume,
+        args.field,
+        args.id_field,
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"Processed {done} rows ({rows} in total), {answered} answered, "
+        f"in {elapsed:.1f}s: {done / elapsed if elapsed else 0.0:.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,29 @@
-from engine import FAQEngine
-from exceptions import InvalidInputError, ServiceNotReadyError
+import time
+
+import tracing
+from engine import FAQEngine, SearchResult
+from exceptions import EntryNotFoundError, InvalidInputError, ServiceNotReadyError
+from query_capture import QueryCapture
 from response import (
     ChatCompletionMessage,
     ChatCompletionResponse,
     build_chat_completion_response,
+    encode_content,
+    render_chat_completion,
 )
 
 
 class ChatService:
     """Service class for handling FAQ chat operations using the FAQEngine."""
 
-    def __init__(self, engine: FAQEngine):
+    def __init__(self, engine: FAQEngine, capture: QueryCapture | None = None):
         """
         Initialize chat service with a RAG engine.
+
+        ``capture``, when set, samples searched questions for replay.py.
         """
         self.engine = engine
+        self.capture = capture
 
     async def process_chat_request(
         self, messages: list[ChatCompletionMessage]
@@ -33,19 +42,93 @@ class ChatService:
                 InvalidInputError: If validation fails.
                 ModelError: If model fails.
         """
+        with tracing.span("ChatService.process_chat_request"):
+            result = await self._find_answer(messages)
+            with tracing.span("serialize"):
+                return build_chat_completion_response(content=result.answer)
+
+    async def process_chat_request_raw(
+        self, messages: list[ChatCompletionMessage]
+    ) -> bytes:
+        """
+        Process a chat request and return the serialized JSON response body.
+
+        Byte-for-byte equivalent to serializing ``process_chat_request``'s
+        result, without building and validating the response models.
+        """
+        with tracing.span("ChatService.process_chat_request"):
+            result = await self._find_answer(messages)
+            with tracing.span("serialize"):
+                return render_chat_completion(self._encoded_answer(result))
+
+    async def answer_question(self, question: str) -> SearchResult:
+        """
+        Search for a single question, as sent to GET /answers.
+
+        Raises:
+                ServiceNotReadyError: If service is not ready.
+                InvalidInputError: If the question is blank.
+        """
+        self._check_ready()
+        if not question.strip():
+            raise InvalidInputError("No valid user question found")
+        return await self._search(question)
+
+    def get_answer(self, answer_id: int) -> str:
+        """
+        Answer with id ``answer_id``.
+
+        Raises:
+                ServiceNotReadyError: If service is not ready.
+                EntryNotFoundError: If there is no such answer.
+        """
+        self._check_ready()
+        answer = self.engine.answer_for(answer_id)
+        if answer is None:
+            raise EntryNotFoundError(f"No FAQ entry with id {answer_id}")
+        return answer
+
+    def _encoded_answer(self, result: SearchResult) -> bytes:
+        """JSON fragment of ``result.answer``, encoded when the answer loaded."""
+        encoded = self.engine.encoded_answers
+        if result.answer is not None and 0 <= result.answer_id < len(encoded):
+            return encoded[result.answer_id]
+        return encode_content(result.answer)
+
+    def _check_ready(self) -> None:
         if not self.engine.is_ready:
             raise ServiceNotReadyError(
                 "Service is still initializing. Please try again in a moment."
             )
 
+    async def _find_answer(self, messages: list[ChatCompletionMessage]) -> SearchResult:
+        """Search for the last user question."""
+        self._check_ready()
+
         question = self._extract_user_question(messages)
 
         # The service delegates the "how" to the engine
         # Any ModelErrors from engine will propagate up to be handled by exception
         # handlers
-        answer = await self.engine.asearch(question)
+        return await self._search(question)
+
+    async def _search(self, question: str) -> SearchResult:
+        """Search result for ``question``, sampled into the capture if any."""
+        if self.capture is None:
+            return await self.engine.asearch_result(question)
 
-        return build_chat_completion_response(content=answer)
+        arrived = time.time()
+        start = time.perf_counter()
+        result = await self.engine.asearch_result(question)
+        manifest = self.engine.manifest
+        self.capture.record(
+            question,
+            result,
+            arrived,
+            time.perf_counter() - start,
+            manifest.build_id if manifest is not None else None,
+        )
+        return result
 
     def _extract_user_question(self, messages: list[ChatCompletionMessage]) -> str:
         """
@@ -0,0 +1,195 @@
+"""
+Cluster the questions the FAQ could not answer, to see which entries are missing.
+
+Reads questions that got no answer, from query captures (records with
+``"answered": false``) or from plain text files with one question per line.
+Identical questions are counted once and embedded once, in token-length
+buckets, into the index's vector space. They are then clustered with FAISS
+k-means, weighted by how often each was asked. Everything after loading
+works on whole arrays: assignment, cluster sizes, spread and representative
+selection are NumPy/FAISS operations, with no Python loop over the queries.
+
+Clusters are ranked by the number of questions in them. Each one is listed
+with its most asked questions and the existing FAQ answer nearest to its
+centroid, where a large distance means a missing entry.
+
+Usage (from apps/api, after ``python build.py``):
+    python cluster_unanswered.py captures/queries.jsonl* --clusters 200
+    python cluster_unanswered.py unanswered.txt --output clusters.json
+"""
+
+import argparse
+import json
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from engine import FAQEngine, normalize_query
+
+
+@dataclass(frozen=True)
+class QueryCluster:
+    size: int  # Questions asked, duplicates included
+    unique: int
+    spread: float  # Mean squared L2 distance to the centroid
+    representatives: list[str]  # Most asked first
+    nearest_answer_id: int
+    nearest_distance: float
+    nearest_answer: str | None
+
+
+def load_unanswered(paths: list[str]) -> list[str]:
+    """No-answer questions from capture files (.jsonl) or text files."""
+    queries = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            if ".jsonl" in Path(path).name:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        if not record["answered"]:
+                            queries.append(record["query"])
+            else:
+                queries.extend(line.strip() for line in f)
+    return [query for query in queries if query]
+
+
+def count_unique(queries: list[str]) -> tuple[list[str], np.ndarray]:
+    """Distinct questions (whitespace folded) and how often each was asked."""
+    counts = Counter(normalize_query(query) for query in queries)
+    return list(counts), np.fromiter(counts.values(), dtype=np.float32)
+
+
+def cluster(
+    embeddings: np.ndarray, counts: np.ndarray, k: int, niter: int = 20, seed: int = 0
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Weighted k-means: (centroids, label per row, squared distance to it)."""
+    k = max(1, min(k, len(embeddings)))
+    kmeans = faiss.Kmeans(embeddings.shape[1], k, niter=niter, seed=seed)
+    kmeans.train(embeddings, weights=counts)
+    distances, labels = kmeans.index.search(embeddings, 1)
+    centroids = np.asarray(kmeans.centroids)
+    return centroids, labels[:, 0], distances[:, 0]
+
+
+def rank_clusters(
+    labels: np.ndarray,
+    distances: np.ndarray,
+    counts: np.ndarray,
+    k: int,
+    representatives: int = 5,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Non-empty clusters, largest first, as (ids, sizes, unique, spread, reps).
+
+    ``reps`` has one row per ranked cluster holding the row indexes of its
+    most asked questions, ties going to those closest to the centroid,
+    padded with -1.
+    """
+    sizes = np.bincount(labels, weights=counts, minlength=k)
+    unique = np.bincount(labels, minlength=k)
+    spread = np.bincount(labels, weights=distances * counts, minlength=k)
+    spread = np.divide(spread, sizes, out=np.zeros_like(spread), where=sizes > 0)
+
+    ids = np.argsort(-sizes, kind="stable")
+    ids = ids[sizes[ids] > 0]
+
+    # Rows grouped by cluster, most asked first within a group
+    order = np.lexsort((distances, -counts, labels))
+    starts = np.searchsorted(labels[order], ids)
+    offsets = np.arange(representatives)
+    positions = starts[:, None] + offsets[None, :]
+    valid = offsets[None, :] < unique[ids][:, None]
+    reps = np.where(valid, order[np.minimum(positions, len(order) - 1)], -1)
+    return ids, sizes[ids], unique[ids], spread[ids], reps
+
+
+def analyze(
+    engine: FAQEngine,
+    queries: list[str],
+    k: int,
+    representatives: int = 5,
+    batch_size: int = 256,
+    niter: int = 20,
+) -> list[QueryCluster]:
+    texts, counts = count_unique(queries)
+    if not texts:
+        return []
+    embeddings = engine.embed_many(texts, batch_size)
+    centroids, labels, distances = cluster(embeddings, counts, k, niter)
+    ids, sizes, unique, spread, reps = rank_clusters(
+        labels, distances, counts, len(centroids), representatives
+    )
+    # The existing FAQ entry nearest each centroid
+    answer_ids, answer_distances = engine.nearest_answers(centroids[ids])
+    return [
+        QueryCluster(
+            size=int(sizes[i]),
+            unique=int(unique[i]),
+            spread=float(spread[i]),
+            representatives=[texts[row] for row in reps[i] if row >= 0],
+            nearest_answer_id=int(answer_ids[i]),
+            nearest_distance=float(answer_distances[i]),
+            nearest_answer=engine.answer_for(int(answer_ids[i])),
+        )
+        for i in range(len(ids))
+    ]
+
+
+def format_report(clusters: list[QueryCluster], total: int, top: int = 20) -> str:
+    lines = [f"{total} unanswered questions in {len(clusters)} clusters"]
+    for rank, found in enumerate(clusters[:top], start=1):
+        share = found.size / total if total else 0.0
+        nearest = " ".join((found.nearest_answer or "").split())[:60]
+        lines.append(
+            f"#{rank} {found.size} questions ({share:.1%}), {found.unique} distinct, "
+            f"spread {found.spread:.3f}"
+        )
+        for representative in found.representatives:
+            lines.append(f"    {representative!r}")
+        lines.append(
+            f"  nearest FAQ #{found.nearest_answer_id} "
+            f"(distance {found.nearest_distance:.3f}): {nearest!r}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cluster unanswered questions")
+    parser.add_argument("inputs", nargs="+", help="Capture (.jsonl) or text files")
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--representatives", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--niter", type=int, default=20)
+    parser.add_argument("--top", type=int, default=20, help="Clusters to print")
+    parser.add_argument("--output", help="Write every cluster as JSON")
+    args = parser.parse_args()
+
+    engine = FAQEngine()
+    engine.load_resources()
+    if not engine.is_ready or engine.index is None:
+        raise SystemExit("Engine failed to load; build the index first.")
+
+    start = time.perf_counter()
+    queries = load_unanswered(args.inputs)
+    clusters = analyze(
+        engine,
+        queries,
+        args.clusters,
+        args.representatives,
+        args.batch_size,
+        args.niter,
+    )
+    print(format_report(clusters, len(queries), args.top))
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([asdict(found) for found in clusters], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
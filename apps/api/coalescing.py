@@ -0,0 +1,69 @@
+"""
+Single-flight coalescing of identical concurrent calls.
+
+When many callers ask for the same key at once, only the first one starts
+the computation and the others await its result. Every caller awaits the
+shared task through ``asyncio.shield``, so cancelling one of them (a client
+that went away) leaves the computation running for the rest. Once the last
+caller is cancelled, nobody is left for the result and the computation is
+cancelled too.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight(Generic[T]):
+    """A shared computation and the number of callers awaiting it."""
+
+    def __init__(self, task: asyncio.Future[T]) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight(Generic[T]):
+    """In-flight calls keyed by ``key``; counts how many were shared."""
+
+    def __init__(self) -> None:
+        self._inflight: dict[Hashable, _Flight[T]] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0  # Computations cancelled when every caller left
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """Result of ``func()``, shared with concurrent calls for ``key``."""
+        self.calls += 1
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(func()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                self._forget(key, flight.task)  # Later callers start afresh
+                flight.task.cancel()
+                self.abandoned += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+    @property
+    def ratio(self) -> float:
+        """Share of calls that joined a computation already in flight."""
+        return self.coalesced / self.calls if self.calls else 0.0
+
+    def _forget(self, key: Hashable, task: asyncio.Future[T]) -> None:
+        flight = self._inflight.get(key)
+        if flight is not None and flight.task is task:
+            del self._inflight[key]
+        if task.done() and not task.cancelled():
+            # Every caller may have been cancelled; don't log it as unretrieved
+            task.exception()
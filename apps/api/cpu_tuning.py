@@ -0,0 +1,138 @@
+"""
+CPU-aware thread configuration for the search path.
+
+A search encodes one short query (torch intra-op threads), looks it up in
+FAISS (OpenMP threads) and runs on the engine's executor, so the number of
+searches in flight times the threads each one uses should match the CPUs
+this process may actually use. ``os.cpu_count()`` reports the host's cores;
+containers are usually limited by affinity or a cgroup CPU quota instead.
+
+The default derivation favours throughput: one thread per search and one
+search per CPU. ``autotune`` tries other splits on synthetic queries and
+keeps the fastest.
+"""
+
+import logging
+import math
+import os
+import random
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import faiss
+import torch
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+@dataclass(frozen=True)
+class ThreadConfig:
+    torch_threads: int
+    faiss_threads: int
+    executor_workers: int
+
+
+def cgroup_cpu_limit(root: Path = CGROUP_ROOT) -> float | None:
+    """CPUs allowed by the cgroup CPU quota (v2 or v1), None if unlimited."""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        quota, period = (root / "cpu.max").read_text().split()
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota_us = int((root / "cpu" / "cpu.cfs_quota_us").read_text())
+        period_us = int((root / "cpu" / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    return quota_us / period_us if quota_us > 0 and period_us > 0 else None
+
+
+def available_cpus(root: Path = CGROUP_ROOT) -> int:
+    """CPUs this process can use: affinity mask capped by the cgroup quota."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit(root)
+    if limit is not None:
+        cpus = min(cpus, math.ceil(limit))
+    return max(1, cpus)
+
+
+def cpu_budget(cpus: int, workers: int = 1) -> int:
+    """CPUs for each of ``workers`` server processes sharing ``cpus``."""
+    return max(1, cpus // max(1, workers))
+
+
+def derive_thread_config(budget: int) -> ThreadConfig:
+    """Default split of ``budget`` CPUs: one single-threaded search per CPU."""
+    return ThreadConfig(torch_threads=1, faiss_threads=1, executor_workers=budget)
+
+
+def candidate_configs(budget: int) -> list[ThreadConfig]:
+    """Splits of ``budget`` CPUs between concurrent searches and threads each."""
+    candidates = []
+    threads = 1
+    while threads <= budget:
+        candidates.append(
+            ThreadConfig(
+                torch_threads=threads,
+                faiss_threads=threads,
+                executor_workers=max(1, budget // threads),
+            )
+        )
+        threads *= 2
+    return candidates
+
+
+def apply_thread_config(config: ThreadConfig) -> None:
+    """Set process-wide torch and FAISS thread counts."""
+    torch.set_num_threads(config.torch_threads)
+    faiss.omp_set_num_threads(config.faiss_threads)
+
+
+def synthetic_queries(texts: Iterable[str], n: int, seed: int = 0) -> list[str]:
+    """``n`` queries of 4-12 words drawn from the vocabulary of ``texts``."""
+    words = [word for text in texts for word in text.split()]
+    if not words:
+        words = ["how", "do", "i", "reset", "my", "password", "account", "billing"]
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(words, k=rng.randint(4, 12))) for _ in range(n)]
+
+
+def measure_throughput(
+    search: Callable[[str], object], queries: list[str], config: ThreadConfig
+) -> float:
+    """Queries per second running ``queries`` concurrently under ``config``."""
+    apply_thread_config(config)
+    with ThreadPoolExecutor(max_workers=config.executor_workers) as executor:
+        # Warm up the thread pools before timing
+        list(executor.map(search, queries[: config.executor_workers]))
+        start = time.perf_counter()
+        list(executor.map(search, queries))
+        elapsed = time.perf_counter() - start
+    return len(queries) / elapsed if elapsed > 0 else math.inf
+
+
+def autotune(
+    search: Callable[[str], object],
+    queries: list[str],
+    candidates: list[ThreadConfig],
+) -> ThreadConfig:
+    """Fastest of ``candidates``, applied before returning."""
+    results = []
+    for config in candidates:
+        throughput = measure_throughput(search, queries, config)
+        logger.info(f"Autotune {config}: {throughput:.1f} queries/s")
+        results.append((throughput, config))
+    best = max(results, key=lambda result: result[0])[1]
+    apply_thread_config(best)
+    return best
@@ -0,0 +1,50 @@
+"""
+Length-aware batch encoding for sentence-transformer models.
+
+A batch is padded to its longest input, so encoding a mix of short and long
+texts in arbitrary order wastes most of the forward pass on padding. Texts
+are sorted by token length, encoded in batches of similar length and returned
+in their original order.
+"""
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+
+def token_lengths(model: SentenceTransformer, texts: list[str]) -> np.ndarray:
+    """Token count of each text, capped at the model's max sequence length."""
+    encoded = model.tokenizer(
+        texts,
+        truncation=True,
+        max_length=model.max_seq_length,
+        return_attention_mask=False,
+        return_token_type_ids=False,
+    )
+    return np.fromiter((len(ids) for ids in encoded["input_ids"]), dtype=np.int64)
+
+
+def encode_length_bucketed(
+    model: SentenceTransformer, texts: list[str], batch_size: int = 64
+) -> np.ndarray:
+    """
+    Encode ``texts`` in token-length buckets and return float32 embeddings
+    in input order.
+    """
+    if not texts:
+        dimension = model.get_sentence_embedding_dimension() or 0
+        return np.empty((0, dimension), dtype=np.float32)
+
+    order = np.argsort(token_lengths(model, texts), kind="stable")
+    embeddings: np.ndarray | None = None
+    for start in range(0, len(texts), batch_size):
+        bucket = order[start : start + batch_size]
+        batch = model.encode(
+            [texts[i] for i in bucket],
+            batch_size=len(bucket),
+            convert_to_numpy=True,
+        )
+        if embeddings is None:
+            embeddings = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+        embeddings[bucket] = batch
+    assert embeddings is not None
+    return embeddings
@@ -1,7 +1,13 @@
 import asyncio
 import json
 import logging
+import math
 import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Any, cast
 
 import faiss
@@ -9,11 +15,117 @@ import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
 
+import profiling
+import tracing
+from coalescing import SingleFlight
+from cpu_tuning import (
+    ThreadConfig,
+    apply_thread_config,
+    autotune,
+    available_cpus,
+    candidate_configs,
+    cpu_budget,
+    derive_thread_config,
+    synthetic_queries,
+)
+from encoding import encode_length_bucketed
+from faq import dedup_by_answer, load_answer_ids
+from faq_updates import FAQUpdater, Journal, RWLock
+from index_manifest import IndexManifest, load_manifest
+from quantization import read_index, search_with_rerank
+from reduction import apply_reduction
+from response import encode_content
+from result_cache import TieredCache, cache_key, create_result_cache
 from settings import settings
+from sharding import ShardClient
+from static_encoder import StaticCascade, StaticEncoder
 
 logger = logging.getLogger(__name__)
 
 
+def normalize_query(query: str) -> str:
+    """
+    Coalescing key for ``query``.
+
+    Only whitespace is folded: the tokenizer splits on it anyway, while case
+    can change the embedding of a cased model.
+    """
+    return " ".join(query.split())
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    """
+    Outcome of one search.
+
+    ``answer_id`` and ``distance`` describe the nearest answer even when it is
+    too far to be returned (``answer`` is None); -1 and inf if there was none.
+    ``static`` marks a decision of the cascade's static stage: its distance is
+    measured between static embeddings and is not comparable with the model's.
+    """
+
+    answer: str | None
+    answer_id: int = -1
+    distance: float = math.inf
+    static: bool = False
+
+
+@dataclass
+class SearchWork:
+    """Executor searches, and the work spent on those nobody waited for."""
+
+    started: int = 0
+    cancelled: int = 0  # Abandoned while queued; never ran
+    discarded: int = 0  # Abandoned once running; ran to the end for nothing
+    seconds: float = 0.0
+    discarded_seconds: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class SearchJob:
+    """
+    One search queued on the executor that its caller may abandon.
+
+    Abandoned before a thread picks it up, it is skipped. A running search
+    cannot be interrupted: it finishes, and its time is counted as discarded
+    work while the event loop drops the result.
+    """
+
+    def __init__(self, search: Callable[[str], SearchResult], work: SearchWork) -> None:
+        self.search = search
+        self.work = work
+        self.running = False
+        self.abandoned = False
+        self.elapsed: float | None = None
+
+    def run(self, query: str) -> SearchResult | None:
+        with self.work.lock:
+            if self.abandoned:
+                return None
+            self.running = True
+            self.work.started += 1
+        start = time.perf_counter()
+        try:
+            return self.search(query)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.work.lock:
+                self.elapsed = elapsed
+                self.work.seconds += elapsed
+                if self.abandoned:
+                    self.work.discarded_seconds += elapsed
+
+    def abandon(self) -> None:
+        with self.work.lock:
+            self.abandoned = True
+            if not self.running:
+                self.work.cancelled += 1
+                return
+            self.work.discarded += 1
+            if self.elapsed is not None:  # Done, but the caller left first
+                self.work.discarded_seconds += self.elapsed
+
+
 class FAQEngine:
     """
     Encapsulates the RAG (Retrieval-Augmented Generation) logic.
@@ -23,7 +135,30 @@ class FAQEngine:
     def __init__(self) -> None:
         self.model: SentenceTransformer | None = None
         self.index: faiss.Index | None = None
-        self.answers: list[str] | None = None
+        # Deleted entries (online updates) leave a None slot
+        self.answers: list[str | None] | None = None
+        # JSON fragment of each answer, aligned with ``answers``
+        self.encoded_answers: list[bytes] = []
+        # Vector id -> answer id when entries have several question variants
+        self.answer_ids: np.ndarray | None = None
+        self.max_variants = 1
+        self.manifest: IndexManifest | None = None
+        self.transform: faiss.VectorTransform | None = None
+        self.rerank_vectors: np.ndarray | None = None
+        self.cascade: StaticCascade | None = None
+        self.shard_client: ShardClient | None = None
+        self.updater: FAQUpdater | None = None
+        # Results shared with other requests, workers and replicas
+        self.result_cache: TieredCache | None = None
+        # Cache writes in flight, held so they finish after the reply is sent
+        self.cache_writes: set[asyncio.Task[None]] = set()
+        # Searches share it; online updates take it exclusively
+        self.lock = RWLock()
+        # Identical concurrent queries share one search
+        self.inflight: SingleFlight[SearchResult] = SingleFlight()
+        self.work = SearchWork()
+        self.thread_config: ThreadConfig | None = None
+        self.executor: ThreadPoolExecutor | None = None
         self._ready = False
 
     def load_resources(self) -> None:
@@ -31,8 +166,14 @@ class FAQEngine:
         try:
             logger.info("Loading ML model and FAQ data...")
 
-            # Optimization for CPU
-            torch.set_num_threads(1)
+            # Threads per search and concurrent searches for the CPUs we have
+            budget = cpu_budget(
+                settings.cpu_count or available_cpus(), settings.workers
+            )
+            self.thread_config = derive_thread_config(budget)
+            apply_thread_config(self.thread_config)
+            # One short query per call: the tokenizer's own pool only adds
+            # overhead, and it does not survive the pre-fork server's fork
             os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
             self.model = SentenceTransformer(
@@ -41,11 +182,66 @@ class FAQEngine:
                 model_kwargs={"dtype": torch.float32},
             )
             self.model.eval()
+            self.model.max_seq_length = settings.max_seq_length
+            # encode() tokenizes through this method (``tokenize`` before v6)
+            stage = "preprocess" if hasattr(self.model, "preprocess") else "tokenize"
+            setattr(
+                self.model,
+                stage,
+                tracing.traced("tokenize", getattr(self.model, stage)),
+            )
+
+            # Optional build metadata: index type, a dimensionality reduction
+            # to apply to query embeddings, float vectors for reranking
+            self.manifest = load_manifest(settings.index_manifest_path)
+            index_type = self.manifest.index_type if self.manifest else "flat"
+            index_path = settings.faiss_index_path
+            answers_path = settings.answers_json_path
+            if self.manifest is not None:
+                index_path = self.manifest.index_path or index_path
+                answers_path = self.manifest.answers_path or answers_path
+            if settings.shard_urls:
+                # Router: shard nodes hold the index, only the model is local
+                self.shard_client = ShardClient(
+                    settings.shard_urls, settings.shard_timeout_seconds
+                )
+            else:
+                self.index = read_index(index_path, index_type)
+            if self.manifest is not None and self.manifest.transform_path:
+                self.transform = faiss.read_VectorTransform(
+                    self.manifest.transform_path
+                )
+            if self.manifest is not None and self.manifest.rerank_vectors_path:
+                # Memory-mapped: only shortlisted rows are ever paged in
+                self.rerank_vectors = np.load(
+                    self.manifest.rerank_vectors_path, mmap_mode="r"
+                )
+            if self.manifest is not None and self.manifest.answer_ids_path:
+                self.answer_ids, self.max_variants = load_answer_ids(
+                    self.manifest.answer_ids_path
+                )
+            if settings.cascade_enabled:
+                self.cascade = self._load_cascade(self.model)
+
+            with open(answers_path) as f:
+                self.answers = cast(list[str | None], json.load(f))
+
+            # Pre-serialize every answer's JSON fragment for the response path
+            self.encoded_answers = [encode_content(a) for a in self.answers]
 
-            self.index = faiss.read_index(settings.faiss_index_path)
+            if settings.admin_token or os.path.exists(settings.faq_journal_path):
+                self.updater = self._load_updater()
 
-            with open(settings.answers_json_path) as f:
-                self.answers = cast(list[str], json.load(f))
+            # Created before server.py forks, so workers share its memory
+            self.result_cache = create_result_cache()
+
+            if settings.thread_autotune and self.index is not None:
+                self.thread_config = self._autotune_threads(budget)
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.thread_config.executor_workers,
+                thread_name_prefix="faq-search",
+            )
+            logger.info(f"Search threads ({budget} CPUs): {self.thread_config}")
 
             self._ready = True
             logger.info("Engine loaded successfully.")
@@ -55,44 +251,263 @@ class FAQEngine:
             # We don't raise here to allow the app to start,
             # but liveness probes should fail or requests will 503.
 
+    def _load_cascade(self, model: SentenceTransformer) -> StaticCascade | None:
+        """Set up the static first stage if the index was built with one."""
+        if (
+            self.manifest is None
+            or not self.manifest.static_embeddings_path
+            or not self.manifest.static_index_path
+        ):
+            logger.warning("Cascade enabled but the index has no static stage.")
+            return None
+        encoder = StaticEncoder(
+            model.tokenizer, np.load(self.manifest.static_embeddings_path)
+        )
+        return StaticCascade(
+            encoder,
+            faiss.read_index(self.manifest.static_index_path),
+            accept_distance=settings.cascade_accept_distance,
+            min_margin=settings.cascade_min_margin,
+            reject_distance=settings.cascade_reject_distance,
+            answer_ids=self.answer_ids,
+            max_variants=self.max_variants,
+        )
+
+    def _autotune_threads(self, budget: int) -> ThreadConfig:
+        """Time the candidate thread splits on synthetic queries."""
+        assert self.answers is not None
+        queries = synthetic_queries(
+            (answer for answer in self.answers if answer),
+            settings.thread_autotune_queries,
+        )
+        return autotune(self._search_sync, queries, candidate_configs(budget))
+
+    def _load_updater(self) -> FAQUpdater | None:
+        """Make the index mutable and replay the journal of online changes."""
+        index_type = self.manifest.index_type if self.manifest else "flat"
+        if self.shard_client is not None or index_type != "flat":
+            logger.error(
+                "Online FAQ updates need a local flat index; journal not applied."
+            )
+            return None
+        journal = Journal(settings.faq_journal_path, fsync=settings.journal_fsync)
+        updater = FAQUpdater(self, journal)
+        replayed = updater.replay()
+        if replayed:
+            logger.info(f"Replayed {replayed} journaled FAQ changes.")
+        return updater
+
     @property
     def is_ready(self) -> bool:
         return self._ready
 
+    @property
+    def version(self) -> str | None:
+        """
+        Names the answers being served: the index build id, plus the number
+        of online changes applied since. None for builds without a manifest.
+        """
+        if self.manifest is None:
+            return None
+        if self.updater is None or not self.updater.applied:
+            return self.manifest.build_id
+        return f"{self.manifest.build_id}+{self.updater.applied}"
+
     async def asearch(self, query: str) -> str | None:
         """
         Async wrapper for the blocking search operation.
         """
+        return (await self.asearch_result(query)).answer
+
+    async def asearch_result(self, query: str) -> SearchResult:
+        """
+        Answer to ``query`` along with the nearest answer id and its distance.
+
+        Concurrent calls for the same normalized query await a single search,
+        which the result cache may answer.
+        """
         if not self.is_ready:
             raise RuntimeError("Engine is not ready")
 
+        key = normalize_query(query)
+        return await self.inflight.do(key, lambda: self._asearch_cached(query, key))
+
+    async def _asearch_cached(self, query: str, normalized: str) -> SearchResult:
+        version = self.version
+        if self.result_cache is None or version is None:
+            return await self._asearch(query)
+
+        key = cache_key(version, normalized)
+        cached = await self.result_cache.get(key)
+        if cached is not None:
+            answer_id, distance, static = cached
+            if static:  # Accepted by the static stage, under its own threshold
+                return SearchResult(
+                    self.answer_for(answer_id), answer_id, distance, True
+                )
+            return self._result_for(distance, answer_id)
+        result = await self._asearch(query)
+        if result.answer_id >= 0:
+            value = (result.answer_id, result.distance, result.static)
+            write = asyncio.create_task(self.result_cache.put(key, value))
+            self.cache_writes.add(write)
+            write.add_done_callback(self._cache_write_done)
+        return result
+
+    def _cache_write_done(self, write: asyncio.Task[None]) -> None:
+        self.cache_writes.discard(write)
+        if not write.cancelled() and write.exception() is not None:
+            logger.warning(f"Result cache write failed: {write.exception()!r}")
+
+    async def _asearch(self, query: str) -> SearchResult:
         loop = asyncio.get_running_loop()
-        # Run CPU-bound search in a thread pool
-        return await loop.run_in_executor(None, self._search_sync, query)
+        if self.shard_client is not None:
+            return await self._search_sharded(query)
+
+        # Run CPU-bound search in a thread pool; skipped if abandoned first
+        job = SearchJob(self._search_result_sync, self.work)
+        search = tracing.bind_to_trace(profiling.bind_to_session(job.run))
+        try:
+            result = await loop.run_in_executor(self.executor, search, query)
+        except asyncio.CancelledError:
+            job.abandon()
+            raise
+        assert result is not None
+        return result
+
+    async def _search_sharded(self, query: str) -> SearchResult:
+        """Encode locally, then scatter the vector to the shard nodes."""
+        assert self.shard_client is not None
+        loop = asyncio.get_running_loop()
+        embed = tracing.bind_to_trace(profiling.bind_to_session(self.embed))
+        embedding = await loop.run_in_executor(self.executor, embed, [query])
+        distances, ids = await self.shard_client.search(embedding, self._vector_k)
+        distances, answer_ids = self._top_answers(distances, ids)
+        return self._result_for(distances[0][0], answer_ids[0][0])
+
+    async def aclose(self) -> None:
+        """Release network and file resources held by the engine."""
+        if self.shard_client is not None:
+            await self.shard_client.aclose()
+        if self.updater is not None:
+            self.updater.journal.close()
+        if self.result_cache is not None:
+            await asyncio.gather(*self.cache_writes, return_exceptions=True)
+            await self.result_cache.aclose()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Encode texts into the vector space of the index."""
+        assert self.model is not None
+        with tracing.span("encode"):
+            embeddings = np.asarray(self.model.encode(texts), dtype=np.float32)
+        if self.transform is not None:
+            normalize = self.manifest is not None and self.manifest.normalize
+            embeddings = apply_reduction(self.transform, embeddings, normalize)
+        return embeddings
+
+    def embed_many(self, texts: list[str], batch_size: int) -> np.ndarray:
+        """``embed`` for large offline batches, encoded in token-length buckets."""
+        assert self.model is not None
+        embeddings = encode_length_bucketed(self.model, texts, batch_size)
+        if self.transform is not None:
+            normalize = self.manifest is not None and self.manifest.normalize
+            embeddings = apply_reduction(self.transform, embeddings, normalize)
+        return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+    def search_many(
+        self, queries: list[str], batch_size: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest answer id and distance of each query, for offline batches.
+
+        Always searches with the transformer; the cascade's static stage is
+        for latency, not throughput. A distance above the similarity
+        threshold means the query would not have been answered.
+        """
+        assert self.index is not None, "Batch search needs a local index"
+        return self.nearest_answers(self.embed_many(queries, batch_size))
+
+    def nearest_answers(self, embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Nearest answer id and distance of each embedding in the index space."""
+        assert self.index is not None, "Vector search needs a local index"
+        with self.lock.read():
+            distances, ids = self._search_vectors(embeddings, self._vector_k)
+            distances, answer_ids = self._top_answers(distances, ids)
+        return answer_ids[:, 0], distances[:, 0]
+
+    def _search_vectors(
+        self, embeddings: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Nearest neighbours of ``embeddings`` as (distances, ids)."""
+        # Cast for type safety with FAISS
+        index = cast(Any, self.index)
+        if self.rerank_vectors is None:
+            return cast(tuple[np.ndarray, np.ndarray], index.search(embeddings, k=k))
+        return search_with_rerank(
+            index, self.rerank_vectors, embeddings, k, settings.rerank_candidates
+        )
+
+    @property
+    def _vector_k(self) -> int:
+        """Vectors to fetch so that ``top_k_results`` distinct answers fit."""
+        return settings.top_k_results * self.max_variants
+
+    def _top_answers(
+        self, distances: np.ndarray, ids: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Vector hits -> (distances, answer ids), one hit per answer."""
+        return dedup_by_answer(distances, ids, self.answer_ids, settings.top_k_results)
+
+    def answer_for(self, idx: int) -> str | None:
+        """Answer with answer id ``idx``, if it exists."""
+        if self.answers is not None and 0 <= idx < len(self.answers):
+            return self.answers[idx]
+        return None
+
+    def _result_for(self, distance: float, answer_id: int) -> SearchResult:
+        """Nearest hit -> result; no answer beyond the similarity threshold."""
+        # Note: Using L2 distance, so lower is better/more similar
+        if distance > settings.similarity_threshold:
+            return SearchResult(None, int(answer_id), float(distance))
+        return SearchResult(self.answer_for(answer_id), int(answer_id), float(distance))
 
     def _search_sync(self, query: str) -> str | None:
         """Blocking internal search implementation."""
+        return self._search_result_sync(query).answer
+
+    def _search_result_sync(self, query: str) -> SearchResult:
+        """Blocking search returning the nearest answer id and distance too."""
         # Type guards
         if self.model is None or self.index is None or self.answers is None:
-            return None
+            return SearchResult(None)
 
         try:
-            embedding = self.model.encode([query])
+            # Cheap static stage first; the transformer only when unsure
+            if self.cascade is not None:
+                with self.lock.read(), tracing.span("cascade") as span:
+                    decision = self.cascade.decide(query)
+                    if span is not None:
+                        span.set_attribute("outcome", decision.outcome)
+                    if decision.outcome == "accept":
+                        answer = self.answer_for(decision.index)
+                        return SearchResult(
+                            answer, decision.index, decision.distance, static=True
+                        )
+                if decision.outcome == "reject":
+                    return SearchResult(
+                        None, decision.index, decision.distance, static=True
+                    )
 
-            # Cast for type safety with FAISS
-            index = cast(Any, self.index)
-            distances, indices = index.search(
-                np.array(embedding), k=settings.top_k_results
-            )
-
-            # Note: Using L2 distance, so lower is better/more similar
-            if distances[0][0] > settings.similarity_threshold:
-                return None
+            embedding = self.embed([query])
+            # Online updates mutate the index and answers under the write lock
+            with self.lock.read():
+                with tracing.span("faiss.search"):
+                    distances, ids = self._search_vectors(embedding, self._vector_k)
+                    distances, answer_ids = self._top_answers(distances, ids)
 
-            idx = indices[0][0]
-            if 0 <= idx < len(self.answers):
-                return self.answers[idx]
-            return None
+                return self._result_for(distances[0][0], answer_ids[0][0])
 
         except Exception as e:
             logger.error(f"Search failed: {e}")
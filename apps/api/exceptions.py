@@ -25,3 +25,15 @@ class InvalidInputError(ServiceError):
     """Raised when input validation fails in the business logic."""
 
     pass
+
+
+class EntryNotFoundError(ServiceError):
+    """Raised when an FAQ update or delete targets an entry that does not exist."""
+
+    pass
+
+
+class ClientDisconnectedError(ServiceError):
+    """Raised when the client went away before its answer was ready."""
+
+    pass
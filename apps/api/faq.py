@@ -0,0 +1,105 @@
+"""
+FAQ source data and the vector-id to answer-id mapping.
+
+An entry in ``faq.json`` has one answer and one or more question variants:
+
+    {"question": "How do I reset my password?", "answer": "..."}
+    {"questions": ["How do I reset my password?", "I forgot my password"],
+     "answer": "..."}
+
+Every variant gets its own vector in the index, while ``answers.json`` keeps
+each answer once. A compact int32 array maps vector ids to answer ids.
+"""
+
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel, TypeAdapter, model_validator
+
+
+class FAQEntry(BaseModel):
+    """One answer with the question variants that should match it."""
+
+    question: str | None = None
+    questions: list[str] = []
+    answer: str
+
+    @model_validator(mode="after")
+    def _require_question(self) -> "FAQEntry":
+        if not self.variants:
+            raise ValueError("FAQ entry needs a question or questions")
+        return self
+
+    @property
+    def variants(self) -> list[str]:
+        """All questions for this entry, ``question`` first."""
+        variants = [self.question] if self.question else []
+        return variants + [q for q in self.questions if q and q != self.question]
+
+
+_entries_adapter = TypeAdapter(list[FAQEntry])
+
+
+def load_faq(path: str) -> list[FAQEntry]:
+    """Load and validate ``faq.json``."""
+    return _entries_adapter.validate_json(Path(path).read_bytes())
+
+
+def flatten(entries: list[FAQEntry]) -> tuple[list[str], np.ndarray, list[str]]:
+    """
+    Split entries into index rows.
+
+    Returns the question variants (one per vector), the answer id of each
+    variant and the answers, each stored once.
+    """
+    questions: list[str] = []
+    answer_ids: list[int] = []
+    for answer_id, entry in enumerate(entries):
+        questions.extend(entry.variants)
+        answer_ids.extend([answer_id] * len(entry.variants))
+    answers = [entry.answer for entry in entries]
+    return questions, np.asarray(answer_ids, dtype=np.int32), answers
+
+
+def dedup_by_answer(
+    distances: np.ndarray,
+    ids: np.ndarray,
+    answer_ids: np.ndarray | None,
+    k: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Turn sorted per-vector hits into the top-``k`` distinct answers.
+
+    ``distances`` and ``ids`` are search results sorted by distance, one row
+    per query. Returns (distances, answer ids), keeping each answer's
+    closest variant and padding with (inf, -1). Without a map, vector ids
+    are answer ids.
+    """
+    out_distances = np.full((len(ids), k), np.inf, dtype=np.float32)
+    out_ids = np.full((len(ids), k), -1, dtype=np.int64)
+    for row in range(len(ids)):
+        seen: set[int] = set()
+        for distance, vector_id in zip(distances[row], ids[row], strict=True):
+            if vector_id < 0:
+                continue
+            if answer_ids is not None:
+                if vector_id >= len(answer_ids):
+                    continue
+                answer_id = int(answer_ids[vector_id])
+            else:
+                answer_id = int(vector_id)
+            if answer_id in seen:
+                continue
+            out_distances[row, len(seen)] = distance
+            out_ids[row, len(seen)] = answer_id
+            seen.add(answer_id)
+            if len(seen) == k:
+                break
+    return out_distances, out_ids
+
+
+def load_answer_ids(path: str) -> tuple[np.ndarray, int]:
+    """Load the answer id map and the largest number of variants per answer."""
+    answer_ids = np.load(path)
+    max_variants = int(np.bincount(answer_ids).max()) if len(answer_ids) else 1
+    return answer_ids, max_variants
@@ -0,0 +1,444 @@
+"""
+Online FAQ insert/update/delete against the live engine.
+
+Every change is first appended to a write-ahead journal (one JSON record per
+line, fsynced), then applied to the in-memory index. The index is an
+``IndexIDMap2`` keyed by vector id, so deleting or replacing an entry only
+removes its vectors and never forces a rebuild. At startup the journal is
+replayed over the last snapshot; a periodic snapshot writes the current
+state to new files named after its build id, switches the manifest to them
+(the one rename that commits the snapshot) and truncates the journal.
+
+Records carry the full entry, so replaying a record twice (a crash between
+writing a snapshot and truncating the journal) gives the same state.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal, cast
+
+import faiss
+import numpy as np
+from pydantic import BaseModel
+
+from exceptions import EntryNotFoundError
+from faq import FAQEntry
+from index_manifest import IndexManifest, compute_build_id, save_manifest
+from response import NULL_CONTENT, encode_content
+from settings import settings
+
+if TYPE_CHECKING:
+    from engine import FAQEngine
+
+logger = logging.getLogger(__name__)
+
+
+class JournalRecord(BaseModel):
+    """One journaled change; ``entry`` is the full new state for upserts."""
+
+    op: Literal["upsert", "delete"]
+    answer_id: int
+    entry: FAQEntry | None = None
+    timestamp: float = 0.0
+
+
+class Journal:
+    """Append-only JSON-lines journal of FAQ changes."""
+
+    def __init__(self, path: str, fsync: bool = True) -> None:
+        self.path = Path(path)
+        self.fsync = fsync
+        self.records = 0
+        self._file = self.path.open("a", encoding="utf-8")
+
+    def append(self, record: JournalRecord) -> None:
+        self._file.write(record.model_dump_json() + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.records += 1
+
+    def replay(self) -> Iterator[JournalRecord]:
+        """Yield journaled records in order; a torn last line is skipped."""
+        with self.path.open(encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield JournalRecord.model_validate_json(line)
+                except ValueError:
+                    logger.warning(
+                        f"Skipping unreadable journal record at line {line_number}"
+                    )
+
+    def truncate(self) -> None:
+        self._file.truncate(0)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.records = 0
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class RWLock:
+    """
+    Readers-writer lock: searches share it, index mutations are exclusive.
+
+    Writers are preferred, so a steady stream of searches cannot starve an
+    update.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+def to_id_map(index: Any) -> Any:
+    """Copy a flat index into an ``IndexIDMap2`` keyed by vector position."""
+    if isinstance(index, faiss.IndexIDMap2):
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    id_map = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    id_map.add_with_ids(vectors, np.arange(index.ntotal, dtype=np.int64))
+    return id_map
+
+
+def compact_id_map(index: Any, live_ids: np.ndarray) -> Any:
+    """Copy of ``index`` holding ``live_ids`` renumbered as 0..n-1."""
+    vectors = index.reconstruct_batch(live_ids)
+    compacted = faiss.IndexIDMap2(faiss.IndexFlatL2(index.d))
+    compacted.add_with_ids(vectors, np.arange(len(live_ids), dtype=np.int64))
+    return compacted
+
+
+def _replace_file(path: str, write: Any, fsync: bool = False) -> None:
+    """Write via a temporary file and rename, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    if fsync:
+        _fsync_path(tmp_path)
+    os.replace(tmp_path, path)
+    if fsync:
+        _fsync_path(os.path.dirname(path) or ".")  # The rename itself
+
+
+def _fsync_path(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _versioned(path: str, build_id: str) -> str:
+    """``index.faiss`` -> ``index.<build_id>.faiss``."""
+    base, extension = os.path.splitext(path)
+    return f"{base}.{build_id}{extension}"
+
+
+def _snapshot_files(manifest: IndexManifest) -> set[str]:
+    return {
+        path
+        for path in (
+            manifest.index_path,
+            manifest.answers_path,
+            manifest.answer_ids_path,
+            manifest.static_index_path,
+        )
+        if path is not None
+    }
+
+
+class FAQUpdater:
+    """
+    Applies FAQ changes to a live ``FAQEngine``.
+
+    Writers are serialized by a mutex, so journal order is apply order; the
+    engine's readers-writer lock is only held exclusively while the index
+    and answer arrays are mutated, not while encoding or fsyncing.
+    """
+
+    def __init__(self, engine: "FAQEngine", journal: Journal) -> None:
+        assert engine.index is not None and engine.answers is not None
+        self.engine = engine
+        self.journal = journal
+        # Changes applied since the last snapshot, part of the engine version
+        self.applied = 0
+        self._write_mutex = threading.Lock()
+
+        engine.index = to_id_map(engine.index)
+        if engine.answer_ids is None:
+            engine.answer_ids = np.arange(engine.index.ntotal, dtype=np.int32)
+        if len(engine.encoded_answers) != len(engine.answers):
+            engine.encoded_answers = [encode_content(a) for a in engine.answers]
+        if engine.cascade is not None:
+            engine.cascade.index = to_id_map(engine.cascade.index)
+            engine.cascade.answer_ids = engine.answer_ids
+
+    def replay(self) -> int:
+        """Apply every journaled record; returns the number replayed."""
+        replayed = 0
+        with self._write_mutex:
+            for record in self.journal.replay():
+                self._apply(record)
+                replayed += 1
+        self.journal.records = replayed
+        return replayed
+
+    def add(self, entry: FAQEntry) -> int:
+        """Insert a new entry; returns its answer id."""
+        with self._write_mutex:
+            assert self.engine.answers is not None
+            answer_id = len(self.engine.answers)
+            self._commit(JournalRecord(op="upsert", answer_id=answer_id, entry=entry))
+        return answer_id
+
+    def update(self, answer_id: int, entry: FAQEntry) -> None:
+        """Replace the questions and answer of an existing entry."""
+        with self._write_mutex:
+            self._check_exists(answer_id)
+            self._commit(JournalRecord(op="upsert", answer_id=answer_id, entry=entry))
+
+    def delete(self, answer_id: int) -> None:
+        with self._write_mutex:
+            self._check_exists(answer_id)
+            self._commit(JournalRecord(op="delete", answer_id=answer_id))
+
+    def _check_exists(self, answer_id: int) -> None:
+        if self.engine.answer_for(answer_id) is None:
+            raise EntryNotFoundError(f"No FAQ entry with id {answer_id}")
+
+    def _commit(self, record: JournalRecord) -> None:
+        """Journal, then apply; the caller holds the write mutex."""
+        record.timestamp = time.time()
+        vectors = self._encode(record)
+        self.journal.append(record)
+        self._apply(record, vectors)
+
+    def _encode(self, record: JournalRecord) -> tuple[np.ndarray, np.ndarray | None]:
+        """Transformer (and static, if cascaded) vectors for an upsert."""
+        if record.entry is None:
+            return np.empty((0, 0), dtype=np.float32), None
+        questions = record.entry.variants
+        embeddings = self.engine.embed(questions)
+        static = None
+        if self.engine.cascade is not None:
+            static = self.engine.cascade.encoder.encode(questions)
+        return embeddings, static
+
+    def _apply(
+        self,
+        record: JournalRecord,
+        vectors: tuple[np.ndarray, np.ndarray | None] | None = None,
+    ) -> None:
+        engine = self.engine
+        if vectors is None:
+            vectors = self._encode(record)
+        embeddings, static = vectors
+        encoded = encode_content(record.entry.answer if record.entry else None)
+
+        with engine.lock.write():
+            assert engine.answers is not None and engine.answer_ids is not None
+            old_ids = np.flatnonzero(engine.answer_ids == record.answer_id)
+            index: Any = engine.index
+            index.remove_ids(old_ids.astype(np.int64))
+            if engine.cascade is not None:
+                engine.cascade.index.remove_ids(old_ids.astype(np.int64))
+
+            while len(engine.answers) <= record.answer_id:
+                engine.answers.append(None)
+                engine.encoded_answers.append(NULL_CONTENT)
+            engine.encoded_answers[record.answer_id] = encoded
+
+            if record.entry is None:
+                engine.answers[record.answer_id] = None
+                self.applied += 1
+                return
+
+            start = len(engine.answer_ids)
+            new_ids = np.arange(start, start + len(embeddings), dtype=np.int64)
+            index.add_with_ids(embeddings, new_ids)
+            if engine.cascade is not None and static is not None:
+                engine.cascade.index.add_with_ids(static, new_ids)
+            engine.answer_ids = np.concatenate(
+                [
+                    engine.answer_ids,
+                    np.full(len(new_ids), record.answer_id, dtype=np.int32),
+                ]
+            )
+            engine.max_variants = max(engine.max_variants, len(new_ids))
+            if engine.cascade is not None:
+                # The static index shares vector ids with the main one
+                engine.cascade.answer_ids = engine.answer_ids
+                engine.cascade.max_variants = engine.max_variants
+            engine.answers[record.answer_id] = record.entry.answer
+            self.applied += 1
+
+    def snapshot(self) -> None:
+        """
+        Write the live state as a new snapshot and truncate the journal.
+
+        The snapshot's files get new names, and the manifest is replaced last
+        to point at them. A crash before that leaves the previous snapshot and
+        the full journal in place. A crash after it only replays the journal
+        over a state that already contains it, which changes nothing.
+        """
+        engine = self.engine
+        with self._write_mutex:
+            with engine.lock.read():
+                assert engine.answers is not None and engine.answer_ids is not None
+                # Drop vector ids freed by updates and deletes
+                live_ids = faiss.vector_to_array(cast(Any, engine.index).id_map)
+                index = compact_id_map(engine.index, live_ids)
+                answer_ids = engine.answer_ids[live_ids]
+                static_index = None
+                if engine.cascade is not None:
+                    static_index = compact_id_map(engine.cascade.index, live_ids)
+                answers = list(engine.answers)
+
+            vectors = index.index.reconstruct_n(0, index.ntotal)
+            manifest = self._snapshot_manifest(
+                vectors, answer_ids, answers, has_static=static_index is not None
+            )
+            assert manifest.index_path and manifest.answers_path
+            assert manifest.answer_ids_path
+            fsync = self.journal.fsync
+            _replace_file(
+                manifest.index_path, lambda p: faiss.write_index(index, p), fsync
+            )
+            _replace_file(
+                manifest.answer_ids_path, lambda p: _save_npy(p, answer_ids), fsync
+            )
+            if static_index is not None and manifest.static_index_path:
+                _replace_file(
+                    manifest.static_index_path,
+                    lambda p: faiss.write_index(static_index, p),
+                    fsync,
+                )
+            _replace_file(
+                manifest.answers_path,
+                lambda p: Path(p).write_text(json.dumps(answers)),
+                fsync,
+            )
+            # The commit point: restarts load the new files from here on
+            _replace_file(
+                settings.index_manifest_path,
+                lambda p: save_manifest(manifest, p),
+                fsync,
+            )
+            self.journal.truncate()
+            previous = engine.manifest
+            # Manifest first: in between, the version names no real state
+            engine.manifest = manifest
+            self.applied = 0
+            if previous is not None:
+                self._remove_stale_files(previous, manifest)
+        logger.info(f"Wrote FAQ snapshot {manifest.build_id} ({len(answers)} answers)")
+
+    def _snapshot_manifest(
+        self,
+        vectors: np.ndarray,
+        answer_ids: np.ndarray,
+        answers: list[str | None],
+        has_static: bool,
+    ) -> IndexManifest:
+        build_id = compute_build_id(vectors, answer_ids, answers)
+        paths: dict[str, Any] = {
+            "build_id": build_id,
+            "index_path": _versioned(settings.faiss_index_path, build_id),
+            "answers_path": _versioned(settings.answers_json_path, build_id),
+            "answer_ids_path": _versioned(settings.answer_ids_path, build_id),
+            # Vector ids were renumbered; an older static index no longer fits
+            "static_index_path": (
+                _versioned(settings.static_index_path, build_id) if has_static else None
+            ),
+        }
+        if self.engine.manifest is not None:
+            return self.engine.manifest.model_copy(
+                update={
+                    **paths,
+                    # Shards are not updated online; they no longer match
+                    "shard_paths": [],
+                }
+            )
+        return IndexManifest(
+            model_name=settings.model_name,
+            model_dimension=vectors.shape[1],
+            dimension=vectors.shape[1],
+            **paths,
+        )
+
+    @staticmethod
+    def _remove_stale_files(previous: IndexManifest, current: IndexManifest) -> None:
+        """Delete the files of an earlier snapshot; build.py's own are kept."""
+        build_files = {
+            settings.faiss_index_path,
+            settings.answers_json_path,
+            settings.answer_ids_path,
+            settings.static_index_path,
+        }
+        for path in _snapshot_files(previous) - _snapshot_files(current) - build_files:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not remove old snapshot file {path}: {e}")
+
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    # np.save appends ".npy" to names without it; write through a file object
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+async def run_periodic_snapshots(engine: "FAQEngine", interval: float) -> None:
+    """Compact the journal into a snapshot every ``interval`` seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        updater = engine.updater
+        if updater is None or not updater.journal.records:
+            continue
+        try:
+            await loop.run_in_executor(None, updater.snapshot)
+        except Exception:
+            logger.exception("FAQ snapshot failed")
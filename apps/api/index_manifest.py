@@ -0,0 +1,81 @@
+"""
+Metadata describing a built FAISS index.
+
+``build.py`` writes the manifest next to the index; ``FAQEngine`` reads it to
+learn how query embeddings must be transformed before searching. Indexes
+built before the manifest existed have none, which means "plain float index,
+no transform".
+"""
+
+import hashlib
+import struct
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+from pydantic import BaseModel
+
+from quantization import IndexType
+
+
+class IndexManifest(BaseModel):
+    """Build metadata stored alongside the FAISS index."""
+
+    build_id: str
+    model_name: str
+    model_dimension: int
+    # Dimension of the vectors stored in the index (after any reduction)
+    dimension: int
+    reduction: Literal["none", "pca", "truncate"] = "none"
+    transform_path: str | None = None
+    # Re-normalize vectors after the transform (Matryoshka truncation)
+    normalize: bool = False
+    index_type: IndexType = "flat"
+    # Float vectors for the exact rerank of quantized indexes
+    rerank_vectors_path: str | None = None
+    # Static token embeddings and the index of the FAQ questions built from
+    # them, for the cascaded search
+    static_embeddings_path: str | None = None
+    static_index_path: str | None = None
+    # Shard artifacts (index.shard{i}.faiss) when built with num_shards > 1
+    shard_paths: list[str] = []
+    # Vector id -> answer id map when entries have several question variants
+    answer_ids_path: str | None = None
+    # Set by online snapshots, whose files are named after their build id;
+    # None means the FAISS_INDEX_PATH and ANSWERS_JSON_PATH settings
+    index_path: str | None = None
+    answers_path: str | None = None
+
+
+def compute_build_id(
+    embeddings: np.ndarray, answer_ids: np.ndarray, answers: Sequence[str | None]
+) -> str:
+    """
+    Content hash of an index build; identical inputs give identical ids.
+
+    Covers the vectors, which answer each vector maps to, and the answers.
+    Answers are length-prefixed, so moving text across an answer boundary
+    changes the id.
+    """
+    digest = hashlib.sha256(str(embeddings.shape).encode())
+    digest.update(np.ascontiguousarray(embeddings).tobytes())
+    digest.update(np.ascontiguousarray(answer_ids, dtype=np.int64).tobytes())
+    for answer in answers:
+        # Deleted entries keep their id as a None slot, length -1
+        data = answer.encode() if answer is not None else b""
+        digest.update(struct.pack("<q", len(data) if answer is not None else -1))
+        digest.update(data)
+    return digest.hexdigest()[:16]
+
+
+def load_manifest(path: str) -> IndexManifest | None:
+    """Read the manifest at ``path``, or return None if there is none."""
+    manifest_file = Path(path)
+    if not manifest_file.exists():
+        return None
+    return IndexManifest.model_validate_json(manifest_file.read_text())
+
+
+def save_manifest(manifest: IndexManifest, path: str) -> None:
+    Path(path).write_text(manifest.model_dump_json(indent=2))
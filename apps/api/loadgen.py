@@ -0,0 +1,262 @@
+"""
+Open-loop HTTP load generator for the /chat endpoint.
+
+Requests are issued on a fixed arrival schedule regardless of how quickly the
+server answers, and every latency is measured from the request's *intended*
+send time. A server that stalls therefore shows up as queueing delay in the
+tail instead of silently lowering the offered load (coordinated omission).
+
+Usage:
+    python loadgen.py --url http://localhost:8000 --rate 50 --duration 30 \\
+        --questions faq.json --slo-p50-ms 50 --slo-p99-ms 250
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram.
+
+    Values are stored in buckets whose width grows geometrically, so every
+    recorded value is reported with a bounded relative error (~1% by default)
+    while memory stays constant no matter how many samples are recorded.
+    """
+
+    def __init__(self, precision: float = 0.01) -> None:
+        self._log_base = math.log1p(precision)
+        self._buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        value = max(seconds, 1e-6)
+        bucket = int(math.log(value * 1e6) / self._log_base)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Return the latency (seconds) at percentile ``q`` (0-100)."""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                # Upper edge of the bucket, clamped to the observed range
+                value = math.exp((bucket + 1) * self._log_base) / 1e6
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+
+@dataclass
+class LoadResult:
+    """Aggregated outcome of a load run."""
+
+    target_rate: float
+    duration: float = 0.0
+    sent: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    status_counts: dict[int, int] = field(default_factory=dict)
+    transport_errors: int = 0
+
+    @property
+    def completed(self) -> int:
+        return sum(self.status_counts.values())
+
+    @property
+    def throughput(self) -> float:
+        """Successful (2xx) responses per second."""
+        ok = sum(n for code, n in self.status_counts.items() if 200 <= code < 300)
+        return ok / self.duration if self.duration else 0.0
+
+    def status_rate(self, code: int) -> float:
+        """Fraction of sent requests answered with ``code``."""
+        return self.status_counts.get(code, 0) / self.sent if self.sent else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of requests that failed (non-2xx or transport error)."""
+        if not self.sent:
+            return 0.0
+        failed = self.transport_errors + sum(
+            n for code, n in self.status_counts.items() if not 200 <= code < 300
+        )
+        return failed / self.sent
+
+
+@dataclass(frozen=True)
+class SLOResult:
+    name: str
+    target_ms: float
+    observed_ms: float
+
+    @property
+    def met(self) -> bool:
+        return self.observed_ms <= self.target_ms
+
+
+def load_questions(path: str) -> list[str]:
+    """
+    Load a question mix from a file.
+
+    Accepts a JSON list of strings, a JSON list of FAQ entries (``faq.json``
+    format, every question variant is used) or a plain text file with one
+    question per line.
+    """
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".json"):
+        data = json.loads(text)
+        questions = []
+        for item in data:
+            if isinstance(item, dict):
+                questions.append(item.get("question") or "")
+                questions.extend(item.get("questions", []))
+            else:
+                questions.append(str(item))
+    else:
+        questions = [line.strip() for line in text.splitlines()]
+    questions = [q for q in questions if q]
+    if not questions:
+        raise ValueError(f"No questions found in {path}")
+    return questions
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    questions: list[str],
+    rate: float,
+    duration: float,
+    path: str = "/chat",
+    seed: int = 0,
+) -> LoadResult:
+    """
+    Drive ``path`` at ``rate`` requests/second for ``duration`` seconds.
+
+    Request ``i`` is scheduled at ``start + i / rate``. Requests are fired as
+    independent tasks, so a slow response never delays the next arrival.
+    """
+    rng = random.Random(seed)
+    result = LoadResult(target_rate=rate)
+    total = int(rate * duration)
+    interval = 1.0 / rate
+
+    async def fire(intended: float, question: str) -> None:
+        payload = {"messages": [{"role": "user", "content": question}]}
+        try:
+            response = await client.post(path, json=payload)
+            code = response.status_code
+            result.status_counts[code] = result.status_counts.get(code, 0) + 1
+        except httpx.HTTPError:
+            result.transport_errors += 1
+        result.latency.record(time.perf_counter() - intended)
+
+    tasks: list[asyncio.Task[None]] = []
+    start = time.perf_counter()
+    for i in range(total):
+        intended = start + i * interval
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(intended, rng.choice(questions))))
+        result.sent += 1
+
+    await asyncio.gather(*tasks)
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def evaluate_slos(
+    result: LoadResult, p50_ms: float | None, p99_ms: float | None
+) -> list[SLOResult]:
+    """Compare observed percentiles against the configured targets."""
+    slos = []
+    for name, q, target in (("p50", 50.0, p50_ms), ("p99", 99.0, p99_ms)):
+        if target is not None:
+            observed = result.latency.percentile(q) * 1000
+            slos.append(SLOResult(name=name, target_ms=target, observed_ms=observed))
+    return slos
+
+
+def format_report(result: LoadResult, slos: list[SLOResult]) -> str:
+    lat = result.latency
+    lines = [
+        f"Target rate:   {result.target_rate:.1f} req/s",
+        f"Achieved:      {result.throughput:.1f} ok/s "
+        f"({result.sent} sent, {result.completed} completed "
+        f"in {result.duration:.2f}s)",
+        f"Errors:        {result.error_rate:.2%} "
+        f"(429: {result.status_rate(429):.2%}, "
+        f"503: {result.status_rate(503):.2%}, "
+        f"transport: {result.transport_errors})",
+        "Latency (ms, corrected for coordinated omission):",
+    ]
+    for q in (50, 90, 99, 99.9):
+        lines.append(f"  p{q:<5} {lat.percentile(q) * 1000:9.2f}")
+    lines.append(f"  max    {lat.max * 1000 if lat.count else 0.0:9.2f}")
+    lines.append(f"  mean   {lat.mean * 1000:9.2f}")
+    for slo in slos:
+        verdict = "MET" if slo.met else "MISSED"
+        lines.append(
+            f"SLO {slo.name} <= {slo.target_ms:.1f}ms: {verdict} "
+            f"(observed {slo.observed_ms:.2f}ms)"
+        )
+    return "\n".join(lines)
+
+
+async def _run(args: argparse.Namespace) -> int:
+    questions = load_questions(args.questions)
+    limits = httpx.Limits(
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_connections,
+    )
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as client:
+        result = await run_load(
+            client, questions, args.rate, args.duration, seed=args.seed
+        )
+
+    slos = evaluate_slos(result, args.slo_p50_ms, args.slo_p99_ms)
+    print(format_report(result, slos))
+    return 0 if all(slo.met for slo in slos) else 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Open-loop load generator")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--questions", default="faq.json")
+    parser.add_argument("--rate", type=float, default=20.0, help="Requests/second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--slo-p50-ms", type=float, default=None)
+    parser.add_argument("--slo-p99-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    sys.exit(asyncio.run(_run(args)))
+
+
+if __name__ == "__main__":
+    main()
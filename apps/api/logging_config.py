@@ -2,20 +2,64 @@
 Logging configuration for structured JSON logging in production.
 """
 
+import atexit
 import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
 import sys
-from datetime import datetime
+import time
 from typing import Any
 
+# LogRecord attributes that are not user-supplied "extra" fields
+_RESERVED_ATTRS = frozenset(
+    {
+        "name",
+        "msg",
+        "args",
+        "levelname",
+        "levelno",
+        "pathname",
+        "filename",
+        "module",
+        "lineno",
+        "funcName",
+        "created",
+        "msecs",
+        "relativeCreated",
+        "thread",
+        "threadName",
+        "processName",
+        "process",
+        "taskName",
+        "getMessage",
+        "message",
+        "exc_info",
+        "exc_text",
+        "stack_info",
+        "extra",
+    }
+)
+
+# Compact output, and extra fields that are not JSON types are logged as text.
+# Kept at module level because json.dumps only reuses its cached encoder when
+# called with default options. This is not a faster serializer than json.dumps.
+_encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+
+_listener: logging.handlers.QueueListener | None = None
+
 
 class JSONFormatter(logging.Formatter):
     """Custom JSON formatter for structured logging."""
 
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON."""
+        created = record.created
         log_entry: dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(created))
+            + f".{int(created % 1 * 1_000_000):06d}Z",
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -34,37 +78,58 @@ class JSONFormatter(logging.Formatter):
 
         # Add any additional attributes
         for key, value in record.__dict__.items():
-            if key not in {
-                "name",
-                "msg",
-                "args",
-                "levelname",
-                "levelno",
-                "pathname",
-                "filename",
-                "module",
-                "lineno",
-                "funcName",
-                "created",
-                "msecs",
-                "relativeCreated",
-                "thread",
-                "threadName",
-                "processName",
-                "process",
-                "getMessage",
-                "exc_info",
-                "exc_text",
-                "stack_info",
-                "extra",
-            }:
+            if key not in _RESERVED_ATTRS:
                 log_entry[key] = value
 
-        return json.dumps(log_entry)
+        return _encoder.encode(log_entry)
+
+
+class DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock ``prepare`` formats the record on the calling thread (the event
+    loop) and flattens exception info into the message text. Here only the
+    message arguments are resolved eagerly, since they may be mutated after
+    the call returns; JSON serialization and traceback rendering happen in
+    the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = ()
+        return record
+
+
+class RequestLogSampler:
+    """
+    Decides whether a completed request is logged.
+
+    Failed requests (status >= 400) are always logged; successful ones are
+    sampled with a per-path rate, falling back to ``default_rate``.
+    """
+
+    def __init__(self, default_rate: float, path_rates: dict[str, float]) -> None:
+        self.default_rate = default_rate
+        self.path_rates = path_rates
+
+    def should_log(self, path: str, status_code: int) -> bool:
+        if status_code >= 400:
+            return True
+        rate = self.path_rates.get(path, self.default_rate)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
 
 
 def setup_logging() -> None:
-    """Configure structured logging for the application."""
+    """
+    Configure structured logging for the application.
+
+    Records are handed to a queue on the calling thread and written to stdout
+    by a background listener thread, so slow or blocking stdout never stalls
+    the event loop.
+    """
+    global _listener
+
     # Set up root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
@@ -78,17 +143,23 @@ def setup_logging() -> None:
     console_handler.setLevel(logging.INFO)
 
     # Use JSON formatter in production, simple formatter in development
-    import os
-
     if os.getenv("ENVIRONMENT") == "production":
-        formatter = JSONFormatter()
+        formatter: logging.Formatter = JSONFormatter()
     else:
         formatter = logging.Formatter(
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
         )
 
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+
+    # Hand records to a background thread that owns the console handler
+    shutdown_logging()
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    root_logger.addHandler(DeferredFormatQueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(
+        log_queue, console_handler, respect_handler_level=True
+    )
+    _listener.start()
 
     # Set specific logger levels
     logging.getLogger("uvicorn").setLevel(logging.INFO)
@@ -96,3 +167,25 @@ def setup_logging() -> None:
     logging.getLogger("sentence_transformers").setLevel(logging.WARNING)
     logging.getLogger("faiss").setLevel(logging.WARNING)
     logging.getLogger("torch").setLevel(logging.WARNING)
+
+
+def _restart_listener_in_child() -> None:
+    """Threads do not survive fork: give a forked worker its own listener."""
+    global _listener
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(
+            _listener.queue, *_listener.handlers, respect_handler_level=True
+        )
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Stop the listener thread, flushing any queued records."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+os.register_at_fork(after_in_child=_restart_listener_in_child)
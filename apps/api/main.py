@@ -1,27 +1,76 @@
 import asyncio
 import logging
+import secrets
 import time
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable
 from contextlib import asynccontextmanager
-from typing import Annotated
-
-from fastapi import Depends, FastAPI, Request
+from typing import Annotated, TypeVar, cast
+from urllib.parse import urlsplit
+
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from pydantic import ValidationError
 
+import tracing
 from chat_service import ChatService
 from engine import FAQEngine
-from exceptions import InvalidInputError, ModelError, ServiceNotReadyError
-from logging_config import setup_logging
-from middleware import RateLimitMiddleware, SecurityMiddleware
-from response import ChatCompletionRequest, ChatCompletionResponse
+from exceptions import (
+    ClientDisconnectedError,
+    EntryNotFoundError,
+    InvalidInputError,
+    ModelError,
+    ServiceNotReadyError,
+)
+from faq import FAQEntry
+from faq_updates import FAQUpdater, run_periodic_snapshots
+from logging_config import RequestLogSampler, setup_logging
+from middleware import (
+    BodySizeLimitMiddleware,
+    ClientRateLimiter,
+    ConnectionLimiter,
+    ProfilingMiddleware,
+    RateLimitMiddleware,
+    SecurityMiddleware,
+    TracingMiddleware,
+    get_client_ip,
+)
+from query_capture import QueryCapture, worker_capture_path
+from response import (
+    AnswerResponse,
+    ChatCompletionRequest,
+    ChatCompletionResponse,
+    RawJSONResponse,
+    etag_matches,
+)
 from settings import settings
+from static_files import PrecompressedStaticFiles
 
 # Configure logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+if settings.tracing_enabled:
+    tracing.setup_tracing(
+        tracing.load_exporter(settings.trace_exporter, settings.trace_export_path),
+        settings.trace_sample_rate,
+    )
+
+
+# Set by server.py, which loads the engine once before forking workers
+preloaded_engine: FAQEngine | None = None
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
@@ -29,56 +78,117 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     Manage the lifecycle of the application resources.
     Initializes the FAQ Engine on startup and cleans up on shutdown.
     """
-    # Initialize and load the engine
-    engine = FAQEngine()
-    engine.load_resources()
+    # Initialize and load the engine, unless a pre-fork parent already did
+    if preloaded_engine is not None:
+        engine = preloaded_engine
+    else:
+        engine = FAQEngine()
+        engine.load_resources()
 
     # Store engine in app state for dependency injection
     app.state.engine = engine
 
+    # Sampled queries for replay.py, written by a background task
+    capture = None
+    capture_writer = None
+    if settings.capture_enabled:
+        capture = QueryCapture(
+            worker_capture_path(settings.capture_path, settings.worker_index),
+            settings.capture_sample_rate,
+            settings.capture_max_bytes,
+            settings.capture_backups,
+        )
+        capture_writer = asyncio.create_task(capture.run())
+    app.state.query_capture = capture
+
+    # Compact the journal of online FAQ changes into snapshots
+    snapshots = None
+    if settings.admin_token:
+        snapshots = asyncio.create_task(
+            run_periodic_snapshots(engine, settings.snapshot_interval_seconds)
+        )
+
     yield
 
-    # Cleanup (if any needed in future)
-    pass
+    if snapshots is not None:
+        snapshots.cancel()
+    if capture is not None and capture_writer is not None:
+        capture.stop()
+        await capture_writer
+    await engine.aclose()
 
 
 app = FastAPI(lifespan=lifespan)
 
+# Innermost, so its 413s get security headers, logging and CORS like any other
+# response; nothing above it reads the body
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=settings.max_request_body_bytes)
+
 # Add security middleware
 app.add_middleware(SecurityMiddleware)
 
-# Add rate limiting (100 requests per minute per IP)
-app.add_middleware(RateLimitMiddleware, calls=100, period=60)
+# Add rate limiting (100 requests per minute per IP, WebSocket messages included)
+rate_limiter = ClientRateLimiter(calls=100, period=60)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+websocket_connections = ConnectionLimiter(settings.ws_max_connections_per_client)
+
+
+# Opt-in request profiling (not installed at all unless enabled)
+if settings.profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=settings.profiling_output_dir,
+        sample_rate=settings.profiling_sample_rate,
+        header=settings.profiling_header,
+        header_token=settings.admin_token,
+        interval=settings.profiling_interval_ms / 1000,
+        max_profiles=settings.profiling_max_profiles,
+    )
 
 
 # Request logging middleware
+request_log_sampler = RequestLogSampler(
+    settings.log_sample_rate, settings.log_sample_rates
+)
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
-
-    # Log incoming request
-    logger.info(
-        "Request started",
-        extra={
-            "method": request.method,
-            "url": str(request.url),
-            "client_host": request.client.host if request.client else None,
-        },
-    )
+    start_time = time.perf_counter()
+    path = request.url.path
 
-    response = await call_next(request)
+    try:
+        response = await call_next(request)
+    except Exception:
+        logger.exception(
+            "Request failed",
+            extra={
+                "method": request.method,
+                "path": path,
+                "process_time": time.perf_counter() - start_time,
+            },
+        )
+        raise
 
-    # Log response
-    process_time = time.time() - start_time
-    logger.info(
-        "Request completed",
-        extra={
+    # One combined line per request; successes are sampled per route
+    status_code = response.status_code
+    if request_log_sampler.should_log(path, status_code):
+        extra = {
             "method": request.method,
-            "url": str(request.url),
-            "status_code": response.status_code,
-            "process_time": process_time,
-        },
-    )
+            "path": path,
+            "status_code": status_code,
+            "process_time": time.perf_counter() - start_time,
+            "client_host": request.client.host if request.client else None,
+        }
+        # Lets a slow request in the logs be looked up in the traces
+        span = tracing.current_span()
+        if span is not None:
+            extra["trace_id"] = span.trace_id
+        logger.log(
+            logging.ERROR if status_code >= 500 else logging.INFO,
+            "Request completed",
+            extra=extra,
+        )
 
     return response
 
@@ -92,6 +202,10 @@ app.add_middleware(
     allow_headers=settings.cors_allow_headers,
 )
 
+# Outermost, so the root span covers the whole middleware chain
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+
 
 @app.exception_handler(ServiceNotReadyError)
 async def service_not_ready_handler(
@@ -121,12 +235,33 @@ async def invalid_input_handler(
     )
 
 
+@app.exception_handler(ClientDisconnectedError)
+async def client_disconnected_handler(
+    request: Request, exc: ClientDisconnectedError
+) -> Response:
+    # Nobody reads it; the status marks the request in the access log
+    return Response(status_code=499)
+
+
+@app.exception_handler(EntryNotFoundError)
+async def entry_not_found_handler(
+    request: Request, exc: EntryNotFoundError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=404,
+        content={"detail": str(exc)},
+    )
+
+
 def get_chat_service(request: Request) -> ChatService:
     """
     Dependency provider for ChatService.
     Injects the shared FAQEngine instance from app state.
     """
-    return ChatService(engine=request.app.state.engine)
+    return ChatService(
+        engine=request.app.state.engine,
+        capture=getattr(request.app.state, "query_capture", None),
+    )
 
 
 @app.get("/health")
@@ -154,33 +289,351 @@ async def readiness_check(request: Request) -> JSONResponse:
 
 
 @app.get("/metrics")
-async def metrics() -> dict[str, str]:
+async def metrics(request: Request) -> dict[str, str | int | float]:
     """Basic metrics endpoint."""
-    return {"status": "ok", "service": "faq-chat", "version": "0.1.0"}
+    content: dict[str, str | int | float] = {
+        "status": "ok",
+        "service": "faq-chat",
+        "version": "0.1.0",
+    }
+    engine = getattr(request.app.state, "engine", None)
+    if engine is not None:
+        content["search_calls"] = engine.inflight.calls
+        content["search_coalesced"] = engine.inflight.coalesced
+        content["search_coalescing_ratio"] = engine.inflight.ratio
+        content["search_abandoned"] = engine.inflight.abandoned
+        # Work for clients that disconnected: skipped, or run for nothing
+        work = engine.work
+        content["search_started"] = work.started
+        content["search_cancelled"] = work.cancelled
+        content["search_discarded"] = work.discarded
+        content["search_seconds"] = round(work.seconds, 6)
+        content["search_discarded_seconds"] = round(work.discarded_seconds, 6)
+        if engine.result_cache is not None:
+            for tier, stats in engine.result_cache.stats.items():
+                content[f"result_cache_{tier}_hits"] = stats.hits
+                content[f"result_cache_{tier}_misses"] = stats.misses
+                content[f"result_cache_{tier}_hit_ratio"] = stats.ratio
+    return content
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """Return once the client disconnects; the body must have been read."""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Result of ``work``, cancelled if the client disconnects first.
+
+    Searches still queued for the executor are then skipped, and a running
+    one's result is dropped (``SearchJob``).
+    """
+    task = asyncio.ensure_future(work)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        disconnect.cancel()
+    if not task.done():
+        task.cancel()
+        raise ClientDisconnectedError("Client disconnected")
+    return task.result()
 
 
 @app.post("/chat", response_model=ChatCompletionResponse)
 async def chat(
     request: ChatCompletionRequest,
+    http_request: Request,
     service: Annotated[ChatService, Depends(get_chat_service)],
-) -> ChatCompletionResponse:
+) -> Response:
     """
     Handle chat completion requests.
 
     Processes user messages and returns FAQ answers using semantic similarity search.
+    The body is serialized by the service, so FastAPI skips re-validating it
+    against ``response_model`` (kept for the OpenAPI schema). Work for a
+    client that disconnects is cancelled.
     """
-    # Add a delay in development mode
-    if settings.debug:
-        await asyncio.sleep(settings.dev_delay_seconds)
 
-    # Delegate business logic to service layer
-    return await service.process_chat_request(request.messages)
+    async def answer() -> bytes:
+        # Add a delay in development mode
+        if settings.debug:
+            await asyncio.sleep(settings.dev_delay_seconds)
+
+        # Delegate business logic to service layer
+        return await service.process_chat_request_raw(request.messages)
+
+    body = await cancel_on_disconnect(http_request, answer())
+    return RawJSONResponse(body)
 
 
-# Serve built frontend from /app/web_dist (copied in Docker image)
+def answer_etag(engine: FAQEngine) -> str | None:
+    """ETag of GET /answers responses: the version of the answers served."""
+    version = engine.version
+    return f'"{version}"' if version else None
+
+
+def not_modified(request: Request, etag: str | None) -> Response | None:
+    """A 304 if the client already holds the current version, else None."""
+    if etag is None or not etag_matches(request.headers.get("if-none-match"), etag):
+        return None
+    return Response(
+        status_code=304,
+        headers={"etag": etag, "cache-control": settings.answer_cache_control},
+    )
+
+
+def cacheable_answer(
+    body: AnswerResponse, etag: str | None, engine: FAQEngine
+) -> Response:
+    """
+    ``body`` with caching headers, if the answers did not change while it was
+    looked up; otherwise it must not be stored under either version.
+    """
+    if etag is None or answer_etag(engine) != etag:
+        headers = {"cache-control": "no-store"}
+    else:
+        headers = {"etag": etag, "cache-control": settings.answer_cache_control}
+    return RawJSONResponse(body.model_dump_json().encode(), headers=headers)
+
+
+@app.get("/answers", response_model=AnswerResponse)
+async def get_answer(
+    request: Request,
+    q: Annotated[str, Query(min_length=1, max_length=settings.max_question_length)],
+    service: Annotated[ChatService, Depends(get_chat_service)],
+) -> Response:
+    """
+    Answer a single question over GET, so browsers, CDNs and proxies can
+    cache it. The ETag follows the index version, and a matching
+    ``If-None-Match`` is answered with a 304 without searching.
+    """
+    etag = answer_etag(service.engine)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    result = await service.answer_question(q)
+    answered = result.answer is not None
+    body = AnswerResponse(
+        answer_id=result.answer_id if answered else None, answer=result.answer
+    )
+    return cacheable_answer(body, etag, service.engine)
+
+
+@app.get("/answers/{answer_id}", response_model=AnswerResponse)
+async def get_answer_by_id(
+    request: Request,
+    answer_id: int,
+    service: Annotated[ChatService, Depends(get_chat_service)],
+) -> Response:
+    """Look up an answer by id, cacheable like GET /answers."""
+    etag = answer_etag(service.engine)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    body = AnswerResponse(answer_id=answer_id, answer=service.get_answer(answer_id))
+    return cacheable_answer(body, etag, service.engine)
+
+
+def get_faq_updater(request: Request) -> FAQUpdater:
+    """
+    Dependency provider for the admin endpoints.
+
+    The endpoints do not exist unless ``ADMIN_TOKEN`` is set, and every call
+    must send it as ``Authorization: Bearer <token>``.
+    """
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), settings.admin_token.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    updater = request.app.state.engine.updater
+    if updater is None:
+        raise HTTPException(
+            status_code=409, detail="Online updates are not available for this index"
+        )
+    return cast(FAQUpdater, updater)
+
+
+@app.post("/admin/faq", status_code=201)
+async def add_faq_entry(
+    entry: FAQEntry, updater: Annotated[FAQUpdater, Depends(get_faq_updater)]
+) -> dict[str, int]:
+    """Add an FAQ entry to the live index; returns its id."""
+    loop = asyncio.get_running_loop()
+    answer_id = await loop.run_in_executor(None, updater.add, entry)
+    return {"id": answer_id}
+
+
+@app.put("/admin/faq/{answer_id}")
+async def update_faq_entry(
+    answer_id: int,
+    entry: FAQEntry,
+    updater: Annotated[FAQUpdater, Depends(get_faq_updater)],
+) -> dict[str, int]:
+    """Replace the questions and answer of an FAQ entry."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, updater.update, answer_id, entry)
+    return {"id": answer_id}
+
+
+@app.delete("/admin/faq/{answer_id}", status_code=204)
+async def delete_faq_entry(
+    answer_id: int, updater: Annotated[FAQUpdater, Depends(get_faq_updater)]
+) -> Response:
+    """Remove an FAQ entry from the live index."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, updater.delete, answer_id)
+    return Response(status_code=204)
+
+
+@app.post("/admin/snapshot")
+async def snapshot_faq(
+    updater: Annotated[FAQUpdater, Depends(get_faq_updater)],
+) -> dict[str, str]:
+    """Compact the journal into a fresh index snapshot now."""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, updater.snapshot)
+    assert updater.engine.manifest is not None
+    return {"build_id": updater.engine.manifest.build_id}
+
+
+class WebSocketFrameError(Exception):
+    """A frame that is answered with an error frame instead of a completion."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def websocket_origin_allowed(websocket: WebSocket) -> bool:
+    """
+    CORS does not apply to WebSockets, so check the Origin header here.
+
+    Non-browser clients send no Origin and are allowed, as on the HTTP path.
+    """
+    origin = websocket.headers.get("origin")
+    if origin is None or "*" in settings.cors_origins:
+        return True
+    if origin in settings.cors_origins:
+        return True
+    # Same-origin: the bundled frontend served by this app
+    return urlsplit(origin).netloc == websocket.headers.get("host")
+
+
+@app.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket) -> None:
+    """
+    Interactive chat session over a single WebSocket connection.
+
+    Each text frame carries a ``/chat`` request body and is answered with the
+    same ``chat.completion`` JSON, in order. Errors are sent as
+    ``{"error": {"status": ..., "detail": ...}}`` frames and keep the session
+    open. The HTTP middleware stack does not run for WebSockets, so the
+    handshake and every message are counted here against the client IP's
+    HTTP rate limit, and each IP may hold only a few sessions at once.
+    """
+    if not websocket_origin_allowed(websocket):
+        await websocket.close(code=1008)
+        return
+    client_ip = get_client_ip(websocket)
+    if not rate_limiter.allow(client_ip):
+        await websocket.close(code=1013, reason="Rate limit exceeded")
+        return
+    if not websocket_connections.acquire(client_ip):
+        await websocket.close(code=1013, reason="Too many connections")
+        return
+
+    try:
+        await chat_session(websocket, client_ip)
+    finally:
+        websocket_connections.release(client_ip)
+
+
+async def chat_session(websocket: WebSocket, client_ip: str) -> None:
+    """Accept the session and answer its frames until the client leaves."""
+    await websocket.accept()
+    service = ChatService(
+        engine=websocket.app.state.engine,
+        capture=getattr(websocket.app.state, "query_capture", None),
+    )
+    start_time = time.perf_counter()
+    messages = 0
+    traceparent = websocket.headers.get("traceparent")
+
+    try:
+        while True:
+            frame = await websocket.receive_text()
+            messages += 1
+            try:
+                # One trace per message, all joining the handshake's trace
+                with tracing.root_span("websocket message", traceparent):
+                    body = await answer_websocket_frame(service, client_ip, frame)
+            except WebSocketFrameError as e:
+                await websocket.send_json(
+                    {"error": {"status": e.status, "detail": e.detail}}
+                )
+                continue
+            await websocket.send_text(body.decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        logger.info(
+            "WebSocket session closed",
+            extra={
+                "path": websocket.url.path,
+                "messages": messages,
+                "process_time": time.perf_counter() - start_time,
+                "client_host": websocket.client.host if websocket.client else None,
+            },
+        )
+
+
+async def answer_websocket_frame(
+    service: ChatService, client_ip: str, frame: str
+) -> bytes:
+    """Answer one frame with the same checks and errors as ``POST /chat``."""
+    if not rate_limiter.allow(client_ip):
+        raise WebSocketFrameError(429, "Rate limit exceeded")
+    # Servers started by server.py already refuse larger frames (ws_max_size)
+    if len(frame.encode()) > settings.ws_max_message_bytes:
+        raise WebSocketFrameError(413, "Message too large")
+    try:
+        request = ChatCompletionRequest.model_validate_json(frame)
+    except ValidationError as e:
+        raise WebSocketFrameError(422, "Invalid chat request") from e
+
+    if settings.debug:
+        await asyncio.sleep(settings.dev_delay_seconds)
+
+    try:
+        return await service.process_chat_request_raw(request.messages)
+    except InvalidInputError as e:
+        raise WebSocketFrameError(400, str(e)) from e
+    except ServiceNotReadyError as e:
+        raise WebSocketFrameError(503, str(e)) from e
+    except ModelError as e:
+        logger.error(f"WebSocket search failed: {e}")
+        raise WebSocketFrameError(
+            500, "An internal model error occurred. Please try again later."
+        ) from e
+
+
+# Serve built frontend from /app/web_dist (copied in Docker image), using the
+# .br/.gz files written at build time
 try:
     app.mount(
-        "/", StaticFiles(directory=settings.web_dist_path, html=True), name="static"
+        "/", PrecompressedStaticFiles(directory=settings.web_dist_path), name="static"
     )
 except Exception:
     # In dev or if assets missing, skip mounting
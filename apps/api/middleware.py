@@ -2,24 +2,29 @@
 Custom middleware for input validation and security.
 """
 
-import asyncio
 import os
+import random
+import secrets
 import time
-from collections.abc import Callable
+from collections import Counter
 
 from fastapi import HTTPException, Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import profiling
+import tracing
 
 
 class SecurityMiddleware(BaseHTTPMiddleware):
     """Middleware for security headers and input validation."""
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Apply security checks and headers."""
-
-        # Input validation for POST requests
-        if request.method == "POST":
-            await self._validate_input(request)
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        """Apply security headers; body sizes are BodySizeLimitMiddleware's job."""
 
         # Process the request
         response = await call_next(request)
@@ -29,22 +34,6 @@ class SecurityMiddleware(BaseHTTPMiddleware):
 
         return response
 
-    async def _validate_input(self, request: Request) -> None:
-        """Validate input for potential security issues."""
-        content_type = request.headers.get("content-type", "")
-        if "application/json" not in content_type:
-            return  # Let FastAPI handle content-type validation
-
-        # Check content length
-        content_length = request.headers.get("content-length")
-        if content_length:
-            try:
-                if int(content_length) > 10000:  # 10KB limit
-                    return  # Let FastAPI handle large payload validation
-            except ValueError:
-                # Invalid content-length header, let FastAPI handle it
-                return
-
     def _add_security_headers(self, response: Response) -> None:
         """Add security headers to response."""
         response.headers["X-Content-Type-Options"] = "nosniff"
@@ -72,65 +61,123 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         )
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Simple in-memory rate limiting middleware."""
+class RequestBodyTooLarge(HTTPException):
+    """Raised from ``receive`` once a request body exceeds its budget."""
 
-    def __init__(self, app, calls: int = 100, period: int = 60):
-        super().__init__(app)
+    def __init__(self) -> None:
+        super().__init__(status_code=413, detail="Request body too large")
+
+
+class BodySizeLimitMiddleware:
+    """
+    Rejects request bodies over ``max_bytes`` with 413 while they stream in.
+
+    A declared Content-Length over the limit is rejected before any of the
+    body is read. Bodies without one (chunked) are counted as ``receive``
+    hands them over, and the read that crosses the limit raises
+    ``RequestBodyTooLarge``, so an oversized body is never buffered or
+    parsed whole. A pure ASGI middleware, because BaseHTTPMiddleware cannot
+    wrap ``receive`` for the app below it.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int) -> None:
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if not value.isdigit():
+                    await self._reject(
+                        scope, receive, send, 400, "Invalid Content-Length"
+                    )
+                    return
+                if int(value) > self.max_bytes:
+                    await self._reject(
+                        scope, receive, send, 413, "Request body too large"
+                    )
+                    return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise RequestBodyTooLarge()
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestBodyTooLarge as e:
+            # Usually FastAPI turns it into a 413 itself; this covers readers
+            # that let it escape
+            if response_started:
+                raise
+            await self._reject(scope, receive, send, 413, e.detail)
+
+    async def _reject(
+        self, scope: Scope, receive: Receive, send: Send, status: int, detail: str
+    ) -> None:
+        # The client may still be sending; closing ends the upload
+        response = JSONResponse(
+            {"detail": detail}, status_code=status, headers={"connection": "close"}
+        )
+        await response(scope, receive, send)
+
+
+class ClientRateLimiter:
+    """
+    Sliding-window request budget per client IP.
+
+    Shared by ``RateLimitMiddleware`` and the WebSocket endpoint, whose
+    handshake and messages never pass through the HTTP middleware, so a
+    client has one budget however many connections it opens.
+    """
+
+    def __init__(self, calls: int = 100, period: int = 60) -> None:
         self.calls = calls  # Max calls per period
         self.period = period  # Period in seconds
         self.clients: dict[str, list[float]] = {}  # Simple in-memory storage
         self.last_cleanup = time.time()
-        self._lock = asyncio.Lock()
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        """Apply rate limiting based on client IP."""
-        client_ip = self._get_client_ip(request)
-        current_time = time.time()
-
-        async with self._lock:
-            # Clean up old entries periodically
-            if current_time - self.last_cleanup > 300:  # Every 5 minutes
-                self._cleanup_old_entries(current_time)
-                self.last_cleanup = current_time
-
-            # Check rate limit
-            if client_ip in self.clients:
-                requests = self.clients[client_ip]
-
-                # Count recent requests before appending
-                recent_requests = [
-                    req_time
-                    for req_time in requests
-                    if current_time - req_time <= self.period
-                ]
-
-                if len(recent_requests) >= self.calls:
-                    raise HTTPException(status_code=429, detail="Rate limit exceeded")
-
-                recent_requests.append(current_time)
-                self.clients[client_ip] = recent_requests
-            else:
-                self.clients[client_ip] = [current_time]
-
-        return await call_next(request)
+    def allow(self, client_ip: str, now: float | None = None) -> bool:
+        """Record a call and return whether it is within the limit."""
+        current_time = time.time() if now is None else now
 
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP from request."""
-        # Check for forwarded headers first
-        forwarded_for = request.headers.get("X-Forwarded-For")
-        if forwarded_for:
-            try:
-                return forwarded_for.split(",")[0].strip()
-            except (AttributeError, IndexError):
-                pass  # Fall back to other methods
+        # Clean up old entries periodically
+        if current_time - self.last_cleanup > 300:  # Every 5 minutes
+            self._cleanup_old_entries(current_time)
+            self.last_cleanup = current_time
 
-        real_ip = request.headers.get("X-Real-IP")
-        if real_ip:
-            return real_ip
+        if client_ip not in self.clients:
+            self.clients[client_ip] = [current_time]
+            return True
 
-        # Fall back to client IP
-        return request.client.host if request.client else "unknown"
+        # Count recent requests before appending
+        recent_requests = [
+            req_time
+            for req_time in self.clients[client_ip]
+            if current_time - req_time <= self.period
+        ]
+        self.clients[client_ip] = recent_requests
+        if len(recent_requests) >= self.calls:
+            return False
+        recent_requests.append(current_time)
+        return True
 
     def _cleanup_old_entries(self, current_time: float) -> None:
         """Remove old entries from the rate limiting storage."""
@@ -147,3 +194,153 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
                 del self.clients[client_ip]
             else:
                 self.clients[client_ip] = recent_requests
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """Simple in-memory rate limiting middleware."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        calls: int = 100,
+        period: int = 60,
+        limiter: ClientRateLimiter | None = None,
+    ) -> None:
+        super().__init__(app)
+        self.limiter = limiter or ClientRateLimiter(calls, period)
+
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        """Apply rate limiting based on client IP."""
+        if not self.limiter.allow(get_client_ip(request)):
+            # Raised here, an HTTPException would surface as a 500
+            return JSONResponse(
+                status_code=429, content={"detail": "Rate limit exceeded"}
+            )
+        return await call_next(request)
+
+
+def get_client_ip(connection: HTTPConnection) -> str:
+    """Extract the client IP of a request or WebSocket."""
+    # Check for forwarded headers first
+    forwarded_for = connection.headers.get("X-Forwarded-For")
+    if forwarded_for:
+        try:
+            return forwarded_for.split(",")[0].strip()
+        except (AttributeError, IndexError):
+            pass  # Fall back to other methods
+
+    real_ip = connection.headers.get("X-Real-IP")
+    if real_ip:
+        return real_ip
+
+    # Fall back to client IP
+    return connection.client.host if connection.client else "unknown"
+
+
+class ConnectionLimiter:
+    """Counts open connections per client IP, at most ``max_connections``."""
+
+    def __init__(self, max_connections: int) -> None:
+        self.max_connections = max_connections
+        self.open: Counter[str] = Counter()
+
+    def acquire(self, client_ip: str) -> bool:
+        """Count a new connection; False if the client is at its limit."""
+        if self.open[client_ip] >= self.max_connections:
+            return False
+        self.open[client_ip] += 1
+        return True
+
+    def release(self, client_ip: str) -> None:
+        self.open[client_ip] -= 1
+        if self.open[client_ip] <= 0:
+            del self.open[client_ip]
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Sampling profiler for individual requests.
+
+    A request is profiled when it is picked by random sampling, or when it
+    carries the trigger header together with ``Authorization: Bearer
+    <header_token>``; without a token the header is ignored. Only one request
+    is profiled at a time so the sampler cannot pile up threads under load,
+    and only the newest ``max_profiles`` profiles are kept on disk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        output_dir: str,
+        sample_rate: float = 0.0,
+        header: str = "x-profile",
+        header_token: str | None = None,
+        interval: float = 0.001,
+        max_profiles: int = 100,
+    ) -> None:
+        super().__init__(app)
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.header = header
+        self.header_token = header_token
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._busy = False
+
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        """Profile the request if it was selected."""
+        if self._busy or not self._should_profile(request):
+            return await call_next(request)
+
+        self._busy = True
+        session = profiling.ProfileSession(
+            profiling.new_session_name(request.method, request.url.path),
+            self.output_dir,
+            self.interval,
+            self.max_profiles,
+        )
+        token = profiling.activate(session)
+        session.start()
+        try:
+            response = await call_next(request)
+        finally:
+            session.stop()
+            profiling.deactivate(token)
+            self._busy = False
+
+        response.headers["X-Profile-Id"] = session.name
+        return response
+
+    def _should_profile(self, request: Request) -> bool:
+        if request.headers.get(self.header) == "1" and self._authorized(request):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _authorized(self, request: Request) -> bool:
+        if not self.header_token:
+            return False
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        return scheme.lower() == "bearer" and secrets.compare_digest(
+            token.encode(), self.header_token.encode()
+        )
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """Root trace span per request, continuing an incoming ``traceparent``."""
+
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        with tracing.root_span(
+            f"{request.method} {request.url.path}",
+            request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.path": request.url.path},
+        ) as span:
+            response = await call_next(request)
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+            return response
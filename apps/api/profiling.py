@@ -0,0 +1,224 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+A ProfileSession samples the Python stacks of the threads serving one request
+(the event loop thread plus any executor thread running engine work) from a
+background thread, then writes the samples as collapsed stacks (the input
+format of flamegraph.pl and speedscope) and a self-contained SVG flamegraph.
+"""
+
+import html
+import itertools
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from collections.abc import Callable
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FrameType
+from typing import ParamSpec, TypeVar
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_current_session: ContextVar["ProfileSession | None"] = ContextVar(
+    "profile_session", default=None
+)
+_session_ids = itertools.count()
+
+
+class ProfileSession:
+    """Samples the stacks of the threads attached to it until stopped."""
+
+    def __init__(
+        self,
+        name: str,
+        output_dir: str,
+        interval: float = 0.001,
+        max_profiles: int | None = None,
+    ) -> None:
+        self.name = name
+        self.output_dir = Path(output_dir)
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self.samples: Counter[str] = Counter()
+        self._threads: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._run, name=f"profiler-{name}", daemon=True
+        )
+
+    def start(self) -> None:
+        """Attach the calling thread and start sampling."""
+        self.attach_current_thread()
+        self._sampler.start()
+
+    def stop(self) -> None:
+        """Stop sampling; output files are written by the sampler thread."""
+        self._stop.set()
+
+    def join(self, timeout: float | None = None) -> None:
+        self._sampler.join(timeout)
+
+    def attach_current_thread(self) -> None:
+        with self._lock:
+            self._threads[threading.get_ident()] = threading.current_thread().name
+
+    def detach_current_thread(self) -> None:
+        with self._lock:
+            self._threads.pop(threading.get_ident(), None)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads.items())
+            for ident, thread_name in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[_collapse(thread_name, frame)] += 1
+        try:
+            self._write()
+        except OSError as e:
+            logger.error(f"Failed to write profile {self.name}: {e}")
+
+    def _write(self) -> None:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stem = self.output_dir / self.name
+        with open(stem.with_suffix(".folded"), "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        stem.with_suffix(".svg").write_text(render_flamegraph(self.samples, self.name))
+        if self.max_profiles is not None:
+            prune_profiles(self.output_dir, self.max_profiles)
+
+
+def prune_profiles(output_dir: Path, keep: int) -> None:
+    """Delete all but the ``keep`` most recently written profiles."""
+    written = []
+    for path in output_dir.glob("*.folded"):
+        try:
+            written.append((path.stat().st_mtime, path))
+        except FileNotFoundError:  # Pruned by another worker
+            continue
+    written.sort(reverse=True)
+    for _, path in written[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".svg").unlink(missing_ok=True)
+
+
+def _collapse(thread_name: str, frame: FrameType | None) -> str:
+    """Render a frame chain root-first in collapsed-stack notation."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        parts.append(f"{code.co_qualname} ({filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+def current_session() -> ProfileSession | None:
+    return _current_session.get()
+
+
+def activate(session: ProfileSession) -> Token["ProfileSession | None"]:
+    """Make ``session`` the profile session of the current context."""
+    return _current_session.set(session)
+
+
+def deactivate(token: Token["ProfileSession | None"]) -> None:
+    _current_session.reset(token)
+
+
+def bind_to_session(func: Callable[P, R]) -> Callable[P, R]:
+    """
+    Attach the thread that ends up running ``func`` to the active session.
+
+    Used for work handed to an executor, whose threads are otherwise invisible
+    to the session. Returns ``func`` unchanged when no session is active.
+    """
+    session = _current_session.get()
+    if session is None:
+        return func
+
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        session.attach_current_thread()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            session.detach_current_thread()
+
+    return wrapper
+
+
+def new_session_name(method: str, path: str) -> str:
+    """Build a unique, filesystem-safe name for a request's profile files."""
+    slug = path.strip("/").replace("/", "_") or "root"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return f"{stamp}-{method.lower()}-{slug}-{os.getpid()}-{next(_session_ids)}"
+
+
+@dataclass
+class _Node:
+    count: int = 0
+    children: dict[str, "_Node"] = field(default_factory=dict)
+
+    def depth(self) -> int:
+        return 1 + max((c.depth() for c in self.children.values()), default=0)
+
+
+def render_flamegraph(samples: Counter[str], title: str, width: int = 1200) -> str:
+    """Render collapsed stacks as a static SVG flamegraph."""
+    root = _Node()
+    for stack, count in samples.items():
+        node = root
+        node.count += count
+        for name in stack.split(";"):
+            node = node.children.setdefault(name, _Node())
+            node.count += count
+
+    total = root.count or 1
+    row = 16
+    height = root.depth() * row + 24
+    rects: list[str] = []
+
+    def layout(node: _Node, x: float, depth: int) -> None:
+        y = height - (depth + 1) * row
+        for name, child in sorted(node.children.items()):
+            w = width * child.count / total
+            if w >= 0.5:
+                label = html.escape(name)
+                text = label if w > 7 * len(name) else ""
+                rects.append(
+                    f"<g><title>{label} ({child.count} samples, "
+                    f"{100 * child.count / total:.1f}%)</title>"
+                    f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" '
+                    f'fill="{_color(name)}"/>'
+                    f'<text x="{x + 3:.1f}" y="{y + row - 4}">{text}</text></g>'
+                )
+                layout(child, x, depth + 1)
+            x += w
+
+    layout(root, 0.0, 0)
+    body = "\n".join(rects)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+        f'height="{height}" font-family="monospace" font-size="11">\n'
+        f'<text x="4" y="14">{html.escape(title)} ({root.count} samples)</text>\n'
+        f"{body}\n</svg>\n"
+    )
+
+
+def _color(name: str) -> str:
+    h = zlib.crc32(name.encode())
+    return f"rgb({205 + h % 50},{80 + (h >> 8) % 120},{40 + (h >> 16) % 40})"
@@ -0,0 +1,96 @@
+"""
+Quantized FAISS indexes with exact reranking.
+
+Quantized indexes (8/4-bit scalar quantization or 1-bit binary codes) keep
+the in-memory index small. Their distances are approximate, so a search
+first fetches a shortlist of candidates from the quantized index and then
+reranks it with exact L2 distances computed from the float vectors, which
+stay on disk and are memory-mapped. Only the shortlisted rows are paged in.
+"""
+
+from typing import Any, Literal
+
+import faiss
+import numpy as np
+
+IndexType = Literal["flat", "sq8", "sq4", "binary"]
+
+_SCALAR_QUANTIZERS = {
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+    "sq4": faiss.ScalarQuantizer.QT_4bit,
+}
+
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """Pack the sign bit of every dimension into binary codes."""
+    return np.packbits(vectors > 0, axis=1)
+
+
+def build_index(vectors: np.ndarray, index_type: IndexType) -> Any:
+    """Build an index of ``index_type`` over float32 ``vectors``."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    dimension = vectors.shape[1]
+
+    if index_type == "flat":
+        index: Any = faiss.IndexFlatL2(dimension)
+    elif index_type in _SCALAR_QUANTIZERS:
+        index = faiss.IndexScalarQuantizer(
+            dimension, _SCALAR_QUANTIZERS[index_type], faiss.METRIC_L2
+        )
+        index.train(vectors)
+    elif index_type == "binary":
+        if dimension % 8:
+            raise ValueError(
+                f"Binary indexes need a dimension divisible by 8, got {dimension}"
+            )
+        index = faiss.IndexBinaryFlat(dimension)
+        index.add(binarize(vectors))
+        return index
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    index.add(vectors)
+    return index
+
+
+def write_index(index: Any, path: str) -> None:
+    if isinstance(index, faiss.IndexBinary):
+        faiss.write_index_binary(index, path)
+    else:
+        faiss.write_index(index, path)
+
+
+def read_index(path: str, index_type: IndexType) -> Any:
+    if index_type == "binary":
+        return faiss.read_index_binary(path)
+    return faiss.read_index(path)
+
+
+def search_with_rerank(
+    index: Any,
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int,
+    candidates: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Shortlist ``candidates`` ids from the quantized ``index``, then return the
+    exact top-``k`` (squared L2 distances, ids) computed against ``vectors``.
+    Missing results are reported as id -1 with an infinite distance.
+    """
+    coarse = binarize(queries) if isinstance(index, faiss.IndexBinary) else queries
+    _, shortlist = index.search(coarse, max(k, candidates))
+
+    distances = np.full((len(queries), k), np.inf, dtype=np.float32)
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, (query, row_ids) in enumerate(zip(queries, shortlist, strict=True)):
+        row_ids = np.sort(row_ids[row_ids >= 0])
+        if not len(row_ids):
+            continue
+        # Sorted ids keep reads from the memory-mapped file sequential
+        diff = np.asarray(vectors[row_ids], dtype=np.float32) - query
+        exact = np.einsum("ij,ij->i", diff, diff)
+        best = np.argsort(exact)[:k]
+        distances[row, : len(best)] = exact[best]
+        ids[row, : len(best)] = row_ids[best]
+    return distances, ids
@@ -0,0 +1,158 @@
+"""
+Sampled capture of production queries for replay (see replay.py).
+
+``QueryCapture.record`` samples a searched question and queues it without
+blocking or touching the disk. A background task writes queued records in
+batches, one JSON object per line. Before a write would grow the file past
+``max_bytes``, the file is rotated the way ``RotatingFileHandler`` does it:
+``queries.jsonl`` becomes ``queries.jsonl.1`` and so on. At most ``backups``
+old files are kept, so the disk used stays below
+``max_bytes * (backups + 1)``.
+
+Rotation renames files, which is only safe with one writer per file. Under
+server.py with several workers, each worker writes its own file named after
+its slot (``queries.worker1.jsonl``; see ``worker_capture_path``).
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from engine import SearchResult
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = 512
+
+
+class CapturedQuery(BaseModel):
+    timestamp: float  # Unix time the question arrived
+    query: str
+    answered: bool
+    answer_id: int  # Nearest answer, even when too far to be returned
+    distance: float | None  # Model embedding space; None when not searched there
+    static_distance: float | None = None  # Set when the static stage decided
+    latency_ms: float
+    build_id: str | None = None  # Index build that answered
+
+
+def _finite(distance: float) -> float | None:
+    return None if math.isinf(distance) else distance
+
+
+class QueryCapture:
+    """Samples queries into a queue drained by ``run`` into rotating files."""
+
+    def __init__(
+        self,
+        path: str,
+        sample_rate: float = 1.0,
+        max_bytes: int = 50_000_000,
+        backups: int = 3,
+        max_queue: int = 10_000,
+    ) -> None:
+        self.path = Path(path)
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.max_queue = max_queue
+        self.dropped = 0
+        # None is the stop sentinel; the bound is enforced in record()
+        self._queue: asyncio.Queue[CapturedQuery | None] = asyncio.Queue()
+
+    def record(
+        self,
+        query: str,
+        result: SearchResult,
+        arrived: float,
+        latency: float,
+        build_id: str | None = None,
+    ) -> None:
+        """Queue a sampled query; drops it if the writer has fallen behind."""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        if self._queue.qsize() >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.put_nowait(
+            CapturedQuery(
+                timestamp=arrived,
+                query=query,
+                answered=result.answer is not None,
+                answer_id=result.answer_id,
+                distance=None if result.static else _finite(result.distance),
+                static_distance=_finite(result.distance) if result.static else None,
+                latency_ms=latency * 1000,
+                build_id=build_id,
+            )
+        )
+
+    async def run(self) -> None:
+        """Write queued records in batches until ``stop`` is called."""
+        loop = asyncio.get_running_loop()
+        while True:
+            record = await self._queue.get()
+            batch = []
+            while record is not None:
+                batch.append(record)
+                if len(batch) >= WRITE_BATCH_SIZE or self._queue.empty():
+                    break
+                record = self._queue.get_nowait()
+            if batch:
+                try:
+                    await loop.run_in_executor(None, self._write, batch)
+                except OSError as e:
+                    logger.error(f"Failed to write {len(batch)} captured queries: {e}")
+            if record is None:
+                return
+
+    def stop(self) -> None:
+        """Let ``run`` write what is queued, then return."""
+        self._queue.put_nowait(None)
+
+    def _write(self, batch: list[CapturedQuery]) -> None:
+        data = "".join(record.model_dump_json() + "\n" for record in batch).encode()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size and size + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    def _rotate(self) -> None:
+        if self.backups == 0:
+            self.path.unlink()
+            return
+        for i in range(self.backups - 1, 0, -1):
+            source = Path(f"{self.path}.{i}")
+            if source.exists():
+                os.replace(source, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+def worker_capture_path(path: str, worker_index: int | None) -> str:
+    """``queries.jsonl`` -> ``queries.worker1.jsonl`` for worker 1."""
+    if worker_index is None:
+        return path
+    file = Path(path)
+    return str(file.with_name(f"{file.stem}.worker{worker_index}{file.suffix}"))
+
+
+def read_captures(paths: list[str]) -> list[CapturedQuery]:
+    """Records of every file in ``paths``, oldest first."""
+    records = []
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    records.append(CapturedQuery.model_validate_json(line))
+    records.sort(key=lambda record: record.timestamp)
+    return records
@@ -0,0 +1,51 @@
+"""
+Dimensionality reduction of embeddings before indexing.
+
+Two methods are supported, both stored as a FAISS ``VectorTransform``:
+
+- ``pca``: a PCA projection learned from the FAQ embeddings.
+- ``truncate``: keep the leading dimensions (Matryoshka-style). Only
+  meaningful for models trained with a Matryoshka loss, whose leading
+  dimensions carry most of the signal; vectors are re-normalized afterwards.
+"""
+
+import faiss
+import numpy as np
+
+
+def fit_reduction(
+    embeddings: np.ndarray, method: str, dimension: int
+) -> faiss.VectorTransform:
+    """Learn (``pca``) or construct (``truncate``) a projection to ``dimension``."""
+    n, d_in = embeddings.shape
+    if not 0 < dimension < d_in:
+        raise ValueError(f"Reduced dimension must be in (0, {d_in}), got {dimension}")
+
+    if method == "pca":
+        if n < dimension:
+            raise ValueError(
+                f"PCA to {dimension} dimensions needs at least {dimension} "
+                f"embeddings, got {n}"
+            )
+        pca = faiss.PCAMatrix(d_in, dimension)
+        pca.train(np.ascontiguousarray(embeddings, dtype=np.float32))
+        return pca
+
+    if method == "truncate":
+        transform = faiss.LinearTransform(d_in, dimension, False)
+        projection = np.eye(d_in, dtype=np.float32)[:dimension]
+        faiss.copy_array_to_vector(projection.ravel(), transform.A)
+        transform.is_trained = True
+        return transform
+
+    raise ValueError(f"Unknown reduction method: {method}")
+
+
+def apply_reduction(
+    transform: faiss.VectorTransform, embeddings: np.ndarray, normalize: bool
+) -> np.ndarray:
+    """Project ``embeddings`` and optionally L2-normalize the result."""
+    reduced = transform.apply(np.ascontiguousarray(embeddings, dtype=np.float32))
+    if normalize:
+        faiss.normalize_L2(reduced)
+    return np.asarray(reduced)
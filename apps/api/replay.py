@@ -0,0 +1,258 @@
+"""
+Replay captured production queries against one or two FAQ versions.
+
+Reads files written by query capture (``CAPTURE_ENABLED=true``) and sends
+every question to each target in turn:
+
+- a directory holding build artifacts (``index.faiss``, ``answers.json``,
+  ``index.json`` ...), loaded into an in-process ``FAQEngine``. Append
+  ``@model-name`` to use a different embedding model than ``MODEL_NAME``.
+- an ``http(s)://`` URL of a running API, queried through ``POST /chat``.
+
+With ``--speed 1`` the captured arrival times are kept, ``--speed 10`` plays
+them ten times faster, and ``--speed 0`` sends one question at a time as
+fast as answers come back. Paced latencies are measured from each
+question's intended send time, as in loadgen.py. With two targets, the
+answers are compared question by question.
+
+Usage (from apps/api):
+    python replay.py captures/queries.jsonl --target builds/v1 --target builds/v2
+    python replay.py captures/queries.jsonl* --target http://localhost:8000 \\
+        --speed 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+
+import httpx
+
+from engine import FAQEngine
+from loadgen import LatencyHistogram
+from query_capture import CapturedQuery, read_captures
+from settings import settings
+
+Ask = Callable[[str], Awaitable[str | None]]
+
+
+@dataclass
+class ReplayResult:
+    """Answers and latencies of one target, in capture order."""
+
+    target: str
+    answers: list[str | None] = field(default_factory=list)
+    failed: set[int] = field(default_factory=set)  # Indexes of failed requests
+    duration: float = 0.0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def answered(self) -> int:
+        return sum(answer is not None for answer in self.answers)
+
+    @property
+    def errors(self) -> int:
+        return len(self.failed)
+
+
+@dataclass(frozen=True)
+class AnswerDiff:
+    query: str
+    baseline: str | None
+    candidate: str | None
+
+    @property
+    def kind(self) -> str:
+        if self.candidate is None:
+            return "lost answer"
+        if self.baseline is None:
+            return "new answer"
+        return "changed answer"
+
+
+def load_engine(directory: str, model_name: str | None = None) -> FAQEngine:
+    """Engine over the build artifacts in ``directory``."""
+    previous_model = settings.model_name
+    if model_name:
+        settings.model_name = model_name
+    try:
+        # Artifact paths, including those in the manifest, are relative
+        with contextlib.chdir(directory):
+            engine = FAQEngine()
+            engine.load_resources()
+    finally:
+        settings.model_name = previous_model
+    if not engine.is_ready:
+        raise SystemExit(f"Failed to load the engine from {directory}")
+    return engine
+
+
+def http_asker(client: httpx.AsyncClient, spread_client_ips: bool = False) -> Ask:
+    """
+    Ask through ``POST /chat``.
+
+    With ``spread_client_ips``, each request claims a random client address
+    in ``X-Forwarded-For``. That bypasses the API's per-IP rate limit, so a
+    fast replay is not throttled. Only use it against your own test
+    deployments.
+    """
+
+    async def ask(query: str) -> str | None:
+        payload = {"messages": [{"role": "user", "content": query}]}
+        headers = {}
+        if spread_client_ips:
+            ip = f"10.{random.randrange(256)}.{random.randrange(256)}.1"
+            headers["x-forwarded-for"] = ip
+        response = await client.post("/chat", json=payload, headers=headers)
+        response.raise_for_status()
+        content: str | None = response.json()["choices"][0]["message"]["content"]
+        return content
+
+    return ask
+
+
+async def replay(
+    target: str, ask: Ask, records: list[CapturedQuery], speed: float
+) -> ReplayResult:
+    """Send every captured query to ``ask`` at ``speed`` x the captured pace."""
+    result = ReplayResult(target=target, answers=[None] * len(records))
+
+    async def fire(i: int, intended: float) -> None:
+        try:
+            result.answers[i] = await ask(records[i].query)
+        except Exception:
+            result.failed.add(i)
+        result.latency.record(time.perf_counter() - intended)
+
+    start = time.perf_counter()
+    if speed <= 0:
+        for i in range(len(records)):
+            await fire(i, time.perf_counter())
+    else:
+        first = records[0].timestamp if records else 0.0
+        tasks = []
+        for i, record in enumerate(records):
+            intended = start + (record.timestamp - first) / speed
+            delay = intended - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(i, intended)))
+        await asyncio.gather(*tasks)
+    result.duration = time.perf_counter() - start
+    return result
+
+
+def diff_answers(
+    records: list[CapturedQuery], baseline: ReplayResult, candidate: ReplayResult
+) -> list[AnswerDiff]:
+    """Questions answered differently, skipping those that failed on either."""
+    failed = baseline.failed | candidate.failed
+    return [
+        AnswerDiff(record.query, before, after)
+        for i, (record, before, after) in enumerate(
+            zip(records, baseline.answers, candidate.answers, strict=True)
+        )
+        if before != after and i not in failed
+    ]
+
+
+def format_report(
+    records: list[CapturedQuery],
+    results: list[ReplayResult],
+    diffs: list[AnswerDiff] | None,
+    examples: int = 10,
+) -> str:
+    captured = sum(record.answered for record in records)
+    lines = [f"Replayed {len(records)} queries ({captured} answered when captured)"]
+    for result in results:
+        lat = result.latency
+        lines.append(
+            f"{result.target}: {result.answered} answered, {result.errors} errors "
+            f"in {result.duration:.2f}s"
+        )
+        lines.append(
+            "  latency ms: "
+            + "  ".join(f"p{q} {lat.percentile(q) * 1000:.2f}" for q in (50, 90, 99))
+            + f"  max {lat.max * 1000 if lat.count else 0.0:.2f}"
+            + f"  mean {lat.mean * 1000:.2f}"
+        )
+    if diffs is not None:
+        share = len(diffs) / len(records) if records else 0.0
+        lines.append(f"Answer diffs: {len(diffs)} ({share:.2%})")
+        for kind in ("changed answer", "new answer", "lost answer"):
+            lines.append(f"  {kind + ':':<16} {sum(d.kind == kind for d in diffs)}")
+        for diff in diffs[:examples]:
+            lines.append(f"  [{diff.kind}] {diff.query!r}")
+            lines.append(f"    - {diff.baseline!r}")
+            lines.append(f"    + {diff.candidate!r}")
+    return "\n".join(lines)
+
+
+async def _run(args: argparse.Namespace) -> None:
+    records = read_captures(args.captures)
+    if args.limit:
+        records = records[: args.limit]
+    if not records:
+        raise SystemExit("No captured queries to replay")
+
+    results = []
+    for target in args.target:
+        if target.startswith(("http://", "https://")):
+            async with httpx.AsyncClient(
+                base_url=target, timeout=args.timeout
+            ) as client:
+                ask = http_asker(client, args.spread_client_ips)
+                results.append(await replay(target, ask, records, args.speed))
+        else:
+            directory, _, model_name = target.partition("@")
+            engine = load_engine(directory, model_name or None)
+            try:
+                results.append(
+                    await replay(target, engine.asearch, records, args.speed)
+                )
+            finally:
+                await engine.aclose()
+
+    diffs = diff_answers(records, *results) if len(results) == 2 else None
+    print(format_report(records, results, diffs, args.examples))
+    if diffs is not None and args.diff_out:
+        with open(args.diff_out, "w") as f:
+            for diff in diffs:
+                f.write(json.dumps({"kind": diff.kind, **asdict(diff)}) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay captured queries")
+    parser.add_argument("captures", nargs="+", help="Capture files to replay")
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        help="Build directory (optionally DIR@model) or API URL; give two to diff",
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="Pace multiplier, 0 = sequential"
+    )
+    parser.add_argument("--limit", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument(
+        "--spread-client-ips",
+        action="store_true",
+        help="Random X-Forwarded-For per request, bypassing the per-IP rate "
+        "limit (test deployments only)",
+    )
+    parser.add_argument("--examples", type=int, default=10)
+    parser.add_argument("--diff-out", help="Write every answer diff as JSON lines")
+    args = parser.parse_args()
+    if len(args.target) > 2:
+        parser.error("at most two targets")
+
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
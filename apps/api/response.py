@@ -1,8 +1,9 @@
+import random
 import time
-import uuid
 from typing import Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
+from starlette.responses import Response
 
 from settings import settings
 
@@ -27,6 +28,13 @@ class ChatCompletionRequest(BaseModel):
     stream: bool | None = None
 
 
+class AnswerResponse(BaseModel):
+    """Body of GET /answers; ``answer_id`` is None when nothing matched."""
+
+    answer_id: int | None
+    answer: str | None
+
+
 class ChatCompletionChoice(BaseModel):
     """OpenAI chat completion choice format."""
 
@@ -67,7 +75,7 @@ def build_chat_completion_response(
         A ChatCompletionResponse in OpenAI chat.completion format.
     """
     return ChatCompletionResponse(
-        id=f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        id=new_completion_id(),
         object="chat.completion",
         created=int(time.time()),
         model="faq-chat",
@@ -80,3 +88,87 @@ def build_chat_completion_response(
         ],
         usage=Usage(prompt_tokens=0, completion_tokens=0, total_tokens=0),
     )
+
+
+def new_completion_id() -> str:
+    """
+    Return a completion id with 48 random bits.
+
+    Uses the ``random`` module instead of ``uuid.uuid4()`` to avoid an
+    ``os.urandom`` syscall per request; ``random`` reseeds itself after fork.
+    """
+    return f"chatcmpl-{random.getrandbits(48):012x}"
+
+
+_content_adapter: TypeAdapter[str | None] = TypeAdapter(str | None)
+
+
+def encode_content(content: str | None) -> bytes:
+    """
+    JSON-encode an answer exactly as Pydantic serializes the content field.
+
+    The engine encodes every answer once, when it loads or an update lands,
+    and keeps the fragments in ``FAQEngine.encoded_answers``.
+    """
+    return _content_adapter.dump_json(content)
+
+
+NULL_CONTENT = encode_content(None)
+
+
+def _build_template() -> tuple[bytes, bytes, bytes, bytes]:
+    """
+    Split a serialized ChatCompletionResponse around its variable fields.
+
+    Deriving the template from the model keeps the fast path byte-compatible
+    with ``build_chat_completion_response(...).model_dump_json()``.
+    """
+    sample = build_chat_completion_response(content="__CONTENT__")
+    sample.id = "__ID__"
+    sample.created = 0
+    raw = sample.model_dump_json().encode()
+    head, rest = raw.split(b"__ID__")
+    middle, rest = rest.split(b'"created":0', 1)
+    before_content, tail = rest.split(b'"__CONTENT__"')
+    return head, middle + b'"created":', before_content, tail
+
+
+_HEAD, _CREATED, _CONTENT, _TAIL = _build_template()
+
+
+def render_chat_completion(encoded_content: bytes) -> bytes:
+    """
+    Serialize a chat completion response without building Pydantic models.
+
+    Produces the same bytes as ``build_chat_completion_response`` followed by
+    ``model_dump_json``, by splicing the id, timestamp and content (as
+    encoded by ``encode_content``) into a template.
+    """
+    return b"".join(
+        (
+            _HEAD,
+            new_completion_id().encode(),
+            _CREATED,
+            str(int(time.time())).encode(),
+            _CONTENT,
+            encoded_content,
+            _TAIL,
+        )
+    )
+
+
+class RawJSONResponse(Response):
+    """Response for bodies that are already serialized JSON."""
+
+    media_type = "application/json"
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an ``If-None-Match`` header names ``etag`` (weak or not)."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
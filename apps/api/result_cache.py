@@ -0,0 +1,254 @@
+"""
+Search results cached across requests, worker processes and replicas.
+
+An entry maps a query to its nearest answer id and distance, and whether the
+cascade's static stage decided it (its distance is then in static embedding
+space), 9 bytes. The
+answer text comes from the engine's own answers, and the similarity
+threshold is applied on every read. Keys are a digest of the index version
+(build id plus online changes) and the normalized query. After a rebuild or
+an online update, old entries are never matched again and they age out.
+
+Tiers are tried in ``RESULT_CACHE_TIERS`` order:
+
+- ``local``: an LRU dict in this process.
+- ``shared_memory``: a fixed table of slots in an anonymous shared mapping,
+  created when the engine loads. server.py loads the engine before it
+  forks, so every worker on the host shares the table.
+- ``redis``: a Redis server (through redis-py's asyncio client), shared by
+  replicas.
+  Entries expire after ``RESULT_CACHE_TTL_SECONDS``. Bound its memory with
+  ``maxmemory`` and an LRU eviction policy.
+
+A hit in a later tier is copied into the earlier ones. A cache failure is a
+miss. A slow or unreachable Redis costs at most
+``RESULT_CACHE_TIMEOUT_SECONDS`` per lookup and never fails a request.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import struct
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, Protocol
+from urllib.parse import urlsplit
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+CachedResult = tuple[int, float, bool]  # (answer id, distance, static stage)
+VALUE = struct.Struct("<if?")
+# Key digest, value, checksum of both
+SLOT = struct.Struct(f"<16s{VALUE.size}s8s")
+RETRY_SECONDS = 5.0  # Before reconnecting after a Redis failure
+
+
+def cache_key(version: str, query: str) -> bytes:
+    """16-byte digest of the index version and a normalized query."""
+    return hashlib.blake2b(f"{version}\0{query}".encode(), digest_size=16).digest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Share of lookups that reached this tier and found the entry."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResultCache(Protocol):
+    """One cache tier. Implementations treat their own failures as misses."""
+
+    name: str
+
+    async def get(self, key: bytes) -> CachedResult | None: ...
+
+    async def put(self, key: bytes, value: CachedResult) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+
+class LocalCache:
+    """LRU dict of at most ``max_entries`` results, private to the process."""
+
+    name = "local"
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[bytes, CachedResult] = OrderedDict()
+
+    async def get(self, key: bytes) -> CachedResult | None:
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+        return value
+
+    async def put(self, key: bytes, value: CachedResult) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class SharedMemoryCache:
+    """
+    Direct-mapped table of ``slots`` entries in an anonymous shared mapping,
+    read and written by every process forked after it was created.
+
+    There is no lock. A new entry overwrites whatever shared its slot. Each
+    slot carries a checksum of its contents, so a read racing another
+    process's write is a miss, never a torn value.
+    """
+
+    name = "shared_memory"
+
+    def __init__(self, slots: int) -> None:
+        self.slots = slots
+        self.memory = mmap.mmap(-1, slots * SLOT.size)  # MAP_SHARED
+
+    def _offset(self, key: bytes) -> int:
+        return int.from_bytes(key[:8], "little") % self.slots * SLOT.size
+
+    async def get(self, key: bytes) -> CachedResult | None:
+        stored, value, check = SLOT.unpack_from(self.memory, self._offset(key))
+        if stored != key or check != _checksum(stored + value):
+            return None
+        answer_id, distance, static = VALUE.unpack(value)
+        return answer_id, distance, static
+
+    async def put(self, key: bytes, value: CachedResult) -> None:
+        packed = VALUE.pack(*value)
+        SLOT.pack_into(
+            self.memory, self._offset(key), key, packed, _checksum(key + packed)
+        )
+
+    async def aclose(self) -> None:
+        pass
+
+
+def _checksum(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+
+class RedisCache:
+    """
+    Results in a Redis server, expiring after ``ttl_seconds``.
+
+    The client is created on first use, inside the worker's event loop, so a
+    pre-forking parent never shares its connections.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: int, timeout_seconds: float) -> None:
+        parsed = urlsplit(url)
+        self.url = url
+        self.address = f"{parsed.hostname or 'localhost'}:{parsed.port or 6379}"
+        self.ttl = ttl_seconds
+        self.timeout = timeout_seconds
+        self._client: redis.Redis | None = None
+        self._retry_at = 0.0
+
+    async def get(self, key: bytes) -> CachedResult | None:
+        reply = await self._call(lambda client: client.get(self._key(key)))
+        if not isinstance(reply, bytes) or len(reply) != VALUE.size:
+            return None
+        answer_id, distance, static = VALUE.unpack(reply)
+        return answer_id, distance, static
+
+    async def put(self, key: bytes, value: CachedResult) -> None:
+        await self._call(
+            lambda client: client.set(self._key(key), VALUE.pack(*value), ex=self.ttl)
+        )
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def _key(key: bytes) -> str:
+        return "faq:result:" + key.hex()
+
+    async def _call(self, command: Callable[[redis.Redis], Awaitable[Any]]) -> Any:
+        """Reply to a command, or None while the server is failing."""
+        if time.monotonic() < self._retry_at:
+            return None
+        if self._client is None:
+            self._client = redis.Redis.from_url(
+                self.url,
+                socket_timeout=self.timeout,
+                socket_connect_timeout=self.timeout,
+            )
+        try:
+            return await asyncio.wait_for(command(self._client), self.timeout)
+        except (RedisError, OSError, TimeoutError) as e:
+            logger.warning(
+                f"Result cache at {self.address} failed ({e!r}); "
+                f"retrying in {RETRY_SECONDS:.0f}s"
+            )
+            self._retry_at = time.monotonic() + RETRY_SECONDS
+            return None
+
+
+class TieredCache:
+    """Tiers tried in order, with hit and miss counts per tier."""
+
+    def __init__(self, tiers: list[ResultCache]) -> None:
+        self.tiers = tiers
+        self.stats = {tier.name: CacheStats() for tier in tiers}
+
+    async def get(self, key: bytes) -> CachedResult | None:
+        for i, tier in enumerate(self.tiers):
+            value = await tier.get(key)
+            stats = self.stats[tier.name]
+            if value is None:
+                stats.misses += 1
+                continue
+            stats.hits += 1
+            for earlier in self.tiers[:i]:
+                await earlier.put(key, value)
+            return value
+        return None
+
+    async def put(self, key: bytes, value: CachedResult) -> None:
+        for tier in self.tiers:
+            await tier.put(key, value)
+
+    async def aclose(self) -> None:
+        for tier in self.tiers:
+            await tier.aclose()
+
+
+def create_result_cache() -> TieredCache | None:
+    """The tiers in ``settings.result_cache_tiers``; None when there are none."""
+    tiers: list[ResultCache] = []
+    for name in settings.result_cache_tiers:
+        if name == "local":
+            tiers.append(LocalCache(settings.result_cache_local_entries))
+        elif name == "shared_memory":
+            tiers.append(SharedMemoryCache(settings.result_cache_shared_slots))
+        else:
+            tiers.append(
+                RedisCache(
+                    settings.result_cache_redis_url,
+                    settings.result_cache_ttl_seconds,
+                    settings.result_cache_timeout_seconds,
+                )
+            )
+    return TieredCache(tiers) if tiers else None
@@ -0,0 +1,145 @@
+"""
+Pre-fork server: load the engine once, then fork workers that share it.
+
+``uvicorn --workers N`` starts N independent processes, and each one loads
+its own copy of the model and index in ``lifespan``. Here the parent loads
+the engine, freezes the garbage collector's view of every object allocated
+so far and only then forks. The workers inherit the model weights and the
+index as copy-on-write pages that stay shared as long as nobody writes them.
+
+Usage (from apps/api):
+    python server.py --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from types import FrameType
+
+import uvicorn
+
+import main as app_module
+import tracing
+from engine import FAQEngine
+from logging_config import shutdown_logging
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket created once in the parent and shared by all workers."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_engine() -> FAQEngine:
+    """Load the engine in the parent and make it the app's engine."""
+    engine = FAQEngine()
+    engine.load_resources()
+    app_module.preloaded_engine = engine
+
+    # A collection in a worker writes to the header of every object it
+    # visits, copying the page it lives on. Frozen objects are never visited.
+    gc.collect()
+    gc.freeze()
+    return engine
+
+
+def run_worker(sock: socket.socket, host: str, port: int) -> None:
+    config = uvicorn.Config(
+        app_module.app,
+        host=host,
+        port=port,
+        lifespan="on",
+        ws_max_size=settings.ws_max_message_bytes,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def fork_worker(
+    sock: socket.socket, host: str, port: int, index: int | None = None
+) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Per-worker files (query captures) are named after the worker's slot
+    settings.worker_index = index
+
+    # Worker: uvicorn installs its own handlers for graceful shutdown
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        run_worker(sock, host, port)
+    except BaseException:
+        logger.exception("Worker crashed")
+        exit_code = 1
+    finally:
+        # os._exit skips atexit: flush queued spans and log records here
+        tracing.shutdown_tracing()
+        shutdown_logging()
+        os._exit(exit_code)
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    """Fork ``workers`` processes and replace any that exit until stopped."""
+    preload_engine()
+    sock = bind_socket(host, port)
+    children: dict[int, int | None] = {}  # pid -> worker index
+    stopping = False
+
+    def stop(signum: int, frame: FrameType | None) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for i in range(workers):
+        index = i if workers > 1 else None
+        children[fork_worker(sock, host, port, index)] = index
+    logger.info(f"Serving on {host}:{port} with {workers} pre-forked workers.")
+
+    while children:
+        pid, status = os.wait()
+        index = children.pop(pid, None)
+        if stopping:
+            continue
+        logger.error(f"Worker {pid} exited with status {status}; restarting.")
+        time.sleep(1)  # Don't spin if workers die at startup
+        # The replacement takes over the slot, and with it the capture file
+        children[fork_worker(sock, host, port, index)] = index
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-fork FAQ chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.workers)
+    args = parser.parse_args()
+
+    if settings.admin_token and args.workers > 1:
+        # Each worker would apply online updates to its own copy of the index
+        sys.exit("Online FAQ updates (ADMIN_TOKEN) need a single worker.")
+
+    # The engine splits the CPUs between the workers
+    settings.workers = args.workers
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,17 +12,66 @@ class Settings(BaseSettings):
     # Model settings
     model_name: str = "all-MiniLM-L6-v2"
     similarity_threshold: float = 0.9
+    # Token budget per input; longer inputs are truncated before encoding
+    max_seq_length: int = 128
+    encode_batch_size: int = 64
 
     # Search settings
     top_k_results: int = 1
+    rerank_candidates: int = 32  # Shortlist size for quantized indexes
+
+    # CPU threads: detected from the affinity mask and the cgroup CPU quota
+    cpu_count: int | None = None  # Override the detected CPU count
+    thread_autotune: bool = False  # Time a few thread splits at startup
+    thread_autotune_queries: int = 64
+
+    # Sharded deployment: a router sends query vectors to shard nodes
+    shard_urls: list[str] = []  # Set on the router, e.g. ["http://shard0:8101"]
+    shard_timeout_seconds: float = 0.5
+    shard_index_path: str = "index.shard0.faiss"  # Set on each shard node
+    shard_max_k: int = 1024  # Largest k a shard node accepts
+
+    # Cascaded search: static token embeddings first, the transformer only
+    # when the static result falls inside the uncertainty band
+    cascade_enabled: bool = False
+    cascade_accept_distance: float = 0.35
+    cascade_min_margin: float = 0.15
+    cascade_reject_distance: float = 1.6
+
+    # Index build settings
+    # Reduce embeddings to this many dimensions before indexing (None = keep)
+    reduced_dimension: int | None = None
+    reduction_method: Literal["pca", "truncate"] = "pca"
+    # Quantized types keep float vectors on disk for an exact rerank
+    index_type: Literal["flat", "sq8", "sq4", "binary"] = "flat"
+    # Also split the index into this many shard artifacts for shard nodes
+    num_shards: int = 1
 
     # Security / Input validation
     max_question_length: int = 1000
     max_messages_limit: int = 20
+    # Request bodies are cut off with 413 past this many bytes, while they
+    # stream in; fits max_messages_limit questions even if fully \u-escaped
+    max_request_body_bytes: int = 262_144
+    # WebSocket sessions: messages share the HTTP per-IP rate limit
+    ws_max_connections_per_client: int = 5
+    ws_max_message_bytes: int = 10000
+
+    # Online FAQ updates (admin endpoints are off unless a token is set)
+    admin_token: str | None = None
+    faq_journal_path: str = "faq.journal"
+    journal_fsync: bool = True
+    snapshot_interval_seconds: float = 300.0
 
     # File paths
     faiss_index_path: str = "index.faiss"
+    faiss_transform_path: str = "index.transform"
+    rerank_vectors_path: str = "index.vectors.npy"
+    static_embeddings_path: str = "static.npy"
+    static_index_path: str = "index.static.faiss"
+    index_manifest_path: str = "index.json"
     answers_json_path: str = "answers.json"
+    answer_ids_path: str = "index.answer_ids.npy"
     web_dist_path: str = "/app/web_dist"
 
     # CORS settings
@@ -29,6 +80,50 @@ class Settings(BaseSettings):
     cors_allow_methods: list[str] = ["GET", "POST", "OPTIONS"]
     cors_allow_headers: list[str] = ["content-type", "authorization", "accept"]
 
+    # Logging settings
+    # Fraction of successful requests logged; failed requests are always logged
+    log_sample_rate: float = 1.0
+    log_sample_rates: dict[str, float] = {"/health": 0.01, "/ready": 0.01}
+
+    # Profiling settings (sampling profiler, off by default)
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.0  # Fraction of requests profiled (0-1)
+    # "x-profile: 1" forces a profile, honored only with the admin bearer token
+    profiling_header: str = "x-profile"
+    profiling_interval_ms: float = 1.0
+    profiling_output_dir: str = "profiles"
+    profiling_max_profiles: int = 100  # Older profiles are deleted
+
+    # Tracing: spans of sampled requests, exported in batches off the hot path
+    tracing_enabled: bool = False
+    trace_sample_rate: float = 0.01  # Sampled incoming traceparents always are
+    trace_exporter: str = "file"  # Or "module:factory" returning an exporter
+    trace_export_path: str = "traces.jsonl"
+
+    # GET /answers: cacheable by browsers and CDNs, revalidated by ETag
+    answer_cache_control: str = "public, max-age=300"
+
+    # Query capture for replay.py: sampled questions with the answer id,
+    # distance and latency, in a size-bounded rotating file
+    capture_enabled: bool = False
+    capture_sample_rate: float = 0.1
+    capture_path: str = "captures/queries.jsonl"
+    capture_max_bytes: int = 50_000_000  # Per file, before rotating
+    capture_backups: int = 3
+
+    # Search result caches, tried in order: "local" (this process),
+    # "shared_memory" (server.py workers on one host), "redis" (replicas)
+    result_cache_tiers: list[Literal["local", "shared_memory", "redis"]] = []
+    result_cache_local_entries: int = 4096
+    result_cache_shared_slots: int = 65_536  # 32 bytes each
+    result_cache_redis_url: str = "redis://localhost:6379/0"
+    result_cache_ttl_seconds: int = 86_400
+    result_cache_timeout_seconds: float = 0.05
+
+    # Server (server.py): pre-forked workers sharing one loaded engine
+    workers: int = 1
+    worker_index: int | None = None  # Set by server.py in each worker when > 1
+
     # Development settings
     debug: bool = False
     dev_delay_seconds: float = 1.0
@@ -0,0 +1,77 @@
+"""
+Shard node: serves nearest-neighbour searches over one index shard.
+
+Shard nodes load only their FAISS shard (no model, no answers). Start one
+per shard artifact written by ``build.py`` with ``NUM_SHARDS`` > 1:
+
+    SHARD_INDEX_PATH=index.shard0.faiss uvicorn shard_server:app --port 8101
+"""
+
+import asyncio
+import binascii
+import logging
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from typing import Any, cast
+
+import faiss
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request
+
+from logging_config import setup_logging
+from settings import settings
+from sharding import (
+    ShardSearchRequest,
+    ShardSearchResponse,
+    decode_array,
+    encode_array,
+)
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """Load the shard index on startup."""
+    app.state.index = faiss.read_index(settings.shard_index_path)
+    logger.info(
+        f"Loaded shard {settings.shard_index_path} ({app.state.index.ntotal} entries)."
+    )
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/health")
+async def health_check() -> dict[str, str]:
+    """Basic health check endpoint."""
+    return {"status": "healthy"}
+
+
+@app.post("/shard/search")
+async def shard_search(
+    body: ShardSearchRequest, request: Request
+) -> ShardSearchResponse:
+    """Return this shard's top-k neighbours (global ids) for each vector."""
+    index = cast(Any, request.app.state.index)
+    if body.dimension != index.d:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Vectors have dimension {body.dimension}, the index {index.d}",
+        )
+    try:
+        vectors = decode_array(body.vectors, np.float32, body.dimension)
+    except (binascii.Error, ValueError) as e:
+        raise HTTPException(
+            status_code=422, detail="Vectors are not base64 float32 rows"
+        ) from e
+    loop = asyncio.get_running_loop()
+    # FAISS releases the GIL, so searches run in parallel in the thread pool
+    distances, ids = await loop.run_in_executor(None, index.search, vectors, body.k)
+    return ShardSearchResponse(
+        distances=encode_array(distances, np.float32),
+        ids=encode_array(ids, np.int64),
+        k=body.k,
+    )
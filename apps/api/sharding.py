@@ -0,0 +1,139 @@
+"""
+Scatter-gather retrieval across shard nodes.
+
+``build.py`` can split the index into N shard artifacts, each a FAISS index
+keyed by global entry ids. Shard nodes (``shard_server.py``) serve nearest
+neighbour searches over HTTP; the router (the regular API with
+``shard_urls`` set) encodes the query once, sends the vector to every shard
+concurrently and merges their top-k lists.
+
+Vectors and results travel as base64-encoded little-endian arrays, which is
+several times smaller and cheaper to parse than JSON number lists.
+"""
+
+import asyncio
+import base64
+import logging
+
+import faiss
+import httpx
+import numpy as np
+from pydantic import BaseModel, Field
+
+import tracing
+from exceptions import ModelError
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ShardSearchRequest(BaseModel):
+    """Query vectors sent from the router to a shard."""
+
+    vectors: str  # base64 float32, row-major
+    dimension: int = Field(ge=1)
+    k: int = Field(ge=1, le=settings.shard_max_k)
+
+
+class ShardSearchResponse(BaseModel):
+    """Per-query neighbours found by one shard, using global entry ids."""
+
+    distances: str  # base64 float32, shape (n, k)
+    ids: str  # base64 int64, shape (n, k)
+    k: int
+
+
+def encode_array(array: np.ndarray, dtype: type[np.generic]) -> str:
+    return base64.b64encode(np.ascontiguousarray(array, dtype=dtype).tobytes()).decode()
+
+
+def decode_array(data: str, dtype: type[np.generic], columns: int) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=dtype).reshape(-1, columns)
+
+
+def partition(count: int, num_shards: int) -> list[np.ndarray]:
+    """Split global ids ``0..count-1`` into contiguous, near-equal ranges."""
+    return np.array_split(np.arange(count, dtype=np.int64), num_shards)
+
+
+def build_shard_index(vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+    """Flat index over one shard's vectors that reports global ids."""
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+    index.add_with_ids(np.ascontiguousarray(vectors, dtype=np.float32), ids)
+    return index
+
+
+def merge_results(
+    results: list[tuple[np.ndarray, np.ndarray]], k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Merge per-shard (distances, ids) into the global top-``k``."""
+    distances = np.concatenate([d for d, _ in results], axis=1)
+    ids = np.concatenate([i for _, i in results], axis=1)
+    # Padding entries (id -1) must never beat real neighbours
+    distances = np.where(ids < 0, np.inf, distances)
+    order = np.argsort(distances, axis=1, kind="stable")[:, :k]
+    return (
+        np.take_along_axis(distances, order, axis=1),
+        np.take_along_axis(ids, order, axis=1),
+    )
+
+
+class ShardClient:
+    """
+    Fans query vectors out to shard nodes and merges their answers.
+
+    A single pooled client keeps keep-alive connections to every shard. A
+    shard that errors or exceeds ``timeout`` is left out of the merge; the
+    search only fails if no shard answers.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        timeout: float,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.urls = [url.rstrip("/") for url in urls]
+        self._client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_keepalive_connections=8 * len(urls)),
+            transport=transport,
+        )
+
+    async def search(
+        self, vectors: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        payload = ShardSearchRequest(
+            vectors=encode_array(vectors, np.float32),
+            dimension=vectors.shape[1],
+            k=k,
+        ).model_dump()
+        responses = await asyncio.gather(
+            *(self._search_shard(url, payload) for url in self.urls)
+        )
+        results = [r for r in responses if r is not None]
+        if not results:
+            raise ModelError("No shard answered the search")
+        return merge_results(results, k)
+
+    async def _search_shard(
+        self, url: str, payload: dict[str, object]
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        try:
+            span = tracing.current_span()
+            headers = {"traceparent": span.traceparent} if span is not None else None
+            response = await self._client.post(
+                f"{url}/shard/search", json=payload, headers=headers
+            )
+            response.raise_for_status()
+            body = ShardSearchResponse.model_validate_json(response.content)
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning(f"Shard {url} failed: {e!r}")
+            return None
+        return (
+            decode_array(body.distances, np.float32, body.k),
+            decode_array(body.ids, np.int64, body.k),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
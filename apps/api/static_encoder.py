@@ -0,0 +1,139 @@
+"""
+Static token-embedding encoder used as a cheap first stage.
+
+At build time every vocabulary token is run through the transformer on its
+own, giving a static embedding per token. A query is then embedded by
+tokenizing it and averaging its token vectors: a table lookup instead of a
+forward pass. These embeddings are much less precise than the transformer's,
+so the engine only trusts them when the static search is clearly confident
+and falls back to the transformer inside the uncertainty band.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Literal
+
+import faiss
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from faq import dedup_by_answer
+
+
+def distill_static_embeddings(
+    model: SentenceTransformer, batch_size: int = 512
+) -> np.ndarray:
+    """Embed every vocabulary token on its own: ``[CLS] token [SEP]``."""
+    tokenizer = model.tokenizer
+    vocab_size = len(tokenizer)
+    cls_id, sep_id = tokenizer.cls_token_id, tokenizer.sep_token_id
+    table: np.ndarray | None = None
+
+    with torch.inference_mode():
+        for start in range(0, vocab_size, batch_size):
+            ids = torch.arange(start, min(start + batch_size, vocab_size))
+            input_ids = torch.stack(
+                [torch.full_like(ids, cls_id), ids, torch.full_like(ids, sep_id)],
+                dim=1,
+            )
+            features = {
+                "input_ids": input_ids,
+                "attention_mask": torch.ones_like(input_ids),
+                "token_type_ids": torch.zeros_like(input_ids),
+            }
+            batch = model(features)["sentence_embedding"].float().numpy()
+            if table is None:
+                table = np.empty((vocab_size, batch.shape[1]), dtype=np.float16)
+            table[start : start + len(batch)] = batch
+
+    assert table is not None
+    return table
+
+
+class StaticEncoder:
+    """Embeds texts as the normalized mean of their static token vectors."""
+
+    def __init__(self, tokenizer: Any, table: np.ndarray) -> None:
+        self.tokenizer = tokenizer
+        self.table = table
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        token_ids = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=512,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )["input_ids"]
+        embeddings = np.zeros((len(texts), self.table.shape[1]), dtype=np.float32)
+        for row, ids in enumerate(token_ids):
+            if ids:
+                embeddings[row] = self.table[ids].mean(axis=0, dtype=np.float32)
+        faiss.normalize_L2(embeddings)
+        return embeddings
+
+
+@dataclass(frozen=True)
+class CascadeDecision:
+    """Outcome of the static stage for one query; ``index`` is an answer id."""
+
+    outcome: Literal["accept", "reject", "uncertain"]
+    index: int = -1
+    distance: float = float("inf")
+
+
+class StaticCascade:
+    """
+    First stage of the search: decide from static embeddings when confident.
+
+    - accept: top-1 is within ``accept_distance`` and beats top-2 by at least
+      ``min_margin``
+    - reject: top-1 is farther than ``reject_distance`` (clearly no FAQ)
+    - uncertain: anything in between; the transformer decides
+
+    With ``answer_ids``, the static index holds one vector per question
+    variant; top-1 and top-2 are compared as distinct answers.
+    """
+
+    def __init__(
+        self,
+        encoder: StaticEncoder,
+        index: Any,
+        accept_distance: float,
+        min_margin: float,
+        reject_distance: float,
+        answer_ids: np.ndarray | None = None,
+        max_variants: int = 1,
+    ) -> None:
+        self.encoder = encoder
+        self.index = index
+        self.accept_distance = accept_distance
+        self.min_margin = min_margin
+        self.reject_distance = reject_distance
+        self.answer_ids = answer_ids
+        self.max_variants = max_variants
+        self.counts = {"accept": 0, "reject": 0, "uncertain": 0}
+
+    def decide(self, query: str) -> CascadeDecision:
+        embedding = self.encoder.encode([query])
+        distances, ids = self.index.search(embedding, 2 * self.max_variants)
+        # Missing neighbours come back as (inf, -1)
+        distances, ids = dedup_by_answer(distances, ids, self.answer_ids, 2)
+        top1, top2 = float(distances[0][0]), float(distances[0][1])
+
+        if top1 <= self.accept_distance and top2 - top1 >= self.min_margin:
+            decision = CascadeDecision("accept", int(ids[0][0]), top1)
+        elif top1 > self.reject_distance:
+            decision = CascadeDecision("reject", distance=top1)
+        else:
+            decision = CascadeDecision("uncertain", distance=top1)
+        self.counts[decision.outcome] += 1
+        return decision
+
+    @property
+    def short_circuit_ratio(self) -> float:
+        """Fraction of queries decided without the transformer."""
+        total = sum(self.counts.values())
+        decided = self.counts["accept"] + self.counts["reject"]
+        return decided / total if total else 0.0
@@ -0,0 +1,215 @@
+"""
+Serving of the built web frontend from build-time compressed variants.
+
+The web build (``apps/web/scripts/precompress.js``) writes ``.br`` and
+``.gz`` files next to each compressible asset. ``PrecompressedStaticFiles``
+indexes the directory once, at startup, and keeps every file up to
+``max_memory_bytes`` (``index.html`` included) in memory, so a request is a
+dict lookup and one send. Each request gets the smallest variant its
+``Accept-Encoding`` allows; nothing is compressed per request.
+
+Vite writes content-hashed files to ``assets/``; a new build gives them new
+names, so they are cached for a year as ``immutable``. Everything else keeps
+its name across deploys and is revalidated by ETag on every use.
+
+Files added to the directory after startup are not served until a restart.
+"""
+
+import hashlib
+import mimetypes
+from dataclasses import dataclass
+from pathlib import Path
+
+from starlette.responses import FileResponse, PlainTextResponse
+from starlette.types import Receive, Scope, Send
+
+from response import etag_matches
+
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+@dataclass(frozen=True)
+class Variant:
+    """One encoding of a file, with its response headers precomputed."""
+
+    path: Path
+    etag: str
+    headers: list[tuple[bytes, bytes]]
+    body: bytes | None  # None for files streamed from disk
+
+
+@dataclass(frozen=True)
+class StaticAsset:
+    variants: dict[str | None, Variant]  # By Content-Encoding; None = identity
+
+    def choose(self, accept_encoding: str) -> Variant | None:
+        """Smallest variant the client accepts; None if it accepts none."""
+        qvalues = encoding_qvalues(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in self.variants and is_acceptable(qvalues, encoding):
+                return self.variants[encoding]
+        if is_acceptable(qvalues, "identity"):
+            return self.variants[None]
+        return None
+
+
+def encoding_qvalues(header: str) -> dict[str, float]:
+    """q-value of each coding named in an ``Accept-Encoding`` header."""
+    qvalues = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = params.strip().removeprefix("q=").strip()
+        try:
+            qvalue = float(q) if q else 1.0
+        except ValueError:
+            qvalue = 1.0
+        if coding:
+            qvalues[coding] = qvalue
+    return qvalues
+
+
+def is_acceptable(qvalues: dict[str, float], coding: str) -> bool:
+    """
+    Whether ``coding`` is allowed: by its own q-value if named, else by
+    ``*``'s. Unnamed, only identity is allowed.
+    """
+    if coding in qvalues:
+        return qvalues[coding] > 0
+    if "*" in qvalues:
+        return qvalues["*"] > 0
+    return coding == "identity"
+
+
+def cache_control(name: str) -> str:
+    return IMMUTABLE if name.startswith("assets/") else REVALIDATE
+
+
+def load_asset(path: Path, name: str, max_memory_bytes: int) -> StaticAsset:
+    data = path.read_bytes()
+    digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+    media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+
+    files: dict[str | None, Path] = {None: path}
+    for coding, suffix in ENCODINGS.items():
+        compressed = path.with_name(path.name + suffix)
+        if compressed.is_file():
+            files[coding] = compressed
+
+    variants: dict[str | None, Variant] = {}
+    for encoding, file in files.items():
+        size = file.stat().st_size
+        etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+        headers = [
+            (b"content-type", media_type.encode()),
+            (b"content-length", str(size).encode()),
+            (b"cache-control", cache_control(name).encode()),
+            (b"etag", etag.encode()),
+        ]
+        if encoding:
+            headers.append((b"content-encoding", encoding.encode()))
+        if len(files) > 1:
+            headers.append((b"vary", b"accept-encoding"))
+        if size > max_memory_bytes:
+            body = None
+        else:
+            body = data if encoding is None else file.read_bytes()
+        variants[encoding] = Variant(file, etag, headers, body)
+    return StaticAsset(variants)
+
+
+def index_directory(directory: Path, max_memory_bytes: int) -> dict[str, StaticAsset]:
+    """Assets by URL path relative to ``directory``, e.g. ``assets/app.js``."""
+    assets = {}
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file():
+            continue
+        original = path.with_suffix("")
+        if path.suffix in ENCODINGS.values() and original.is_file():
+            continue  # A variant of ``original``
+        name = path.relative_to(directory).as_posix()
+        assets[name] = load_asset(path, name, max_memory_bytes)
+    return assets
+
+
+class PrecompressedStaticFiles:
+    """
+    ASGI app serving a build directory, a drop-in for
+    ``StaticFiles(directory=..., html=True)``: ``/`` and ``dir/`` serve the
+    ``index.html`` inside, and unknown paths get ``404.html`` if it exists.
+    """
+
+    def __init__(self, directory: str, max_memory_bytes: int = 1_000_000) -> None:
+        root = Path(directory)
+        if not root.is_dir():
+            raise RuntimeError(f"Directory '{directory}' does not exist")
+        self.assets = index_directory(root, max_memory_bytes)
+
+    def lookup(self, path: str) -> tuple[StaticAsset | None, int]:
+        name = path.strip("/")
+        candidates = [name, f"{name}/index.html"] if name else ["index.html"]
+        for candidate in candidates:
+            if candidate in self.assets:
+                return self.assets[candidate], 200
+        return self.assets.get("404.html"), 404
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            response = PlainTextResponse(
+                "Method Not Allowed", status_code=405, headers={"allow": "GET, HEAD"}
+            )
+            await response(scope, receive, send)
+            return
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path + "/"):
+            path = path[len(root_path) :]
+        asset, status = self.lookup(path)
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        variant = asset.choose(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if variant is None:
+            response = PlainTextResponse(
+                "Not Acceptable", status_code=406, headers={"vary": "accept-encoding"}
+            )
+            await response(scope, receive, send)
+            return
+        if status == 200 and etag_matches(
+            headers.get(b"if-none-match", b"").decode("latin-1"), variant.etag
+        ):
+            not_modified = [h for h in variant.headers if h[0] != b"content-length"]
+            await send(
+                {"type": "http.response.start", "status": 304, "headers": not_modified}
+            )
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if variant.body is None:
+            file = FileResponse(
+                variant.path,
+                status_code=status,
+                headers={k.decode(): v.decode() for k, v in variant.headers},
+            )
+            await file(scope, receive, send)
+            return
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": variant.headers,
+            }
+        )
+        body = b"" if method == "HEAD" else variant.body
+        await send({"type": "http.response.body", "body": body})
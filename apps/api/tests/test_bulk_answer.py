@@ -0,0 +1,206 @@
+import json
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import faiss
+import numpy as np
+import pytest
+
+import bulk_answer
+from bulk_answer import Checkpoint, checkpoint_path, read_batches
+from cpu_tuning import ThreadConfig
+from engine import FAQEngine
+
+TOPICS = {"refund": [0.0, 0.0], "hours": [5.0, 5.0], "weather": [50.0, 50.0]}
+
+
+class TopicModel:
+    """Stand-in model: a question embeds at the topic word it contains."""
+
+    max_seq_length = 16
+
+    def tokenizer(self, texts: list[str], **kwargs: Any) -> dict[str, list[list[int]]]:
+        return {"input_ids": [[0] * len(t.split()) for t in texts]}
+
+    def encode(self, texts: list[str], **kwargs: Any) -> np.ndarray:
+        return np.array(
+            [next(TOPICS[w] for w in t.split() if w in TOPICS) for t in texts],
+            dtype=np.float32,
+        )
+
+
+@pytest.fixture
+def engine() -> FAQEngine:
+    engine = FAQEngine()
+    engine._ready = True
+    engine.model = TopicModel()  # type: ignore[assignment]
+    engine.index = faiss.IndexFlatL2(2)
+    engine.index.add(np.array([[0.0, 0.0], [5.0, 5.0]], dtype=np.float32))
+    engine.answers = ["Refunds take 5 days.", "Open 9 to 5."]
+    return engine
+
+
+@pytest.fixture
+def questions(tmp_path: Path) -> Path:
+    path = tmp_path / "questions.jsonl"
+    rows = [
+        json.dumps({"id": i, "question": f"{topic} question {i}"})
+        for i, topic in enumerate(["refund", "hours", "weather"] * 3)
+    ]
+    rows[4] = "not json"
+    rows.insert(2, "")
+    path.write_text("\n".join(rows) + "\n")
+    return path
+
+
+def read_rows(path: Path) -> list[dict[str, Any]]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class TestReadBatches:
+    def test_batches_skip_blank_lines(self, questions: Path) -> None:
+        batches = list(read_batches(str(questions), batch_size=4, id_field="id"))
+
+        assert [batch.first_row for batch in batches] == [0, 4, 8]
+        assert batches[0].ids == [0, 1, 2, 3]
+        assert batches[1].questions[0] is None  # Unreadable row
+        assert batches[-1].end_offset == questions.stat().st_size
+
+    def test_resumes_from_offset(self, questions: Path) -> None:
+        first, *rest = read_batches(str(questions), batch_size=4)
+
+        resumed = list(
+            read_batches(
+                str(questions),
+                4,
+                offset=first.end_offset,
+                first_row=first.first_row + 4,
+            )
+        )
+
+        assert [batch.questions for batch in resumed] == [b.questions for b in rest]
+        assert resumed[0].first_row == 4
+
+
+class TestBulkAnswer:
+    def test_answers_in_input_order(
+        self, engine: FAQEngine, questions: Path, tmp_path: Path
+    ) -> None:
+        output = tmp_path / "answers.jsonl"
+
+        done, answered, rows = bulk_answer.bulk_answer(
+            engine, str(questions), str(output), batch_size=4, id_field="id"
+        )
+
+        assert (done, answered, rows) == (9, 5, 9)
+        results = read_rows(output)
+        assert [row["row"] for row in results] == list(range(9))
+        assert results[0]["answer"] == "Refunds take 5 days."
+        assert results[1] == {
+            "row": 1,
+            "id": 1,
+            "answered": True,
+            "answer_id": 1,
+            "distance": 0.0,
+            "answer": "Open 9 to 5.",
+        }
+        assert results[2]["answered"] is False  # "weather" is far from both
+        assert results[2]["answer_id"] == 1
+        assert results[4]["answer_id"] is None  # Unreadable
+        assert not checkpoint_path(str(output)).exists()
+
+    def test_resume_after_crash_matches_clean_run(
+        self, engine: FAQEngine, questions: Path, tmp_path: Path
+    ) -> None:
+        clean = tmp_path / "clean.jsonl"
+        bulk_answer.bulk_answer(engine, str(questions), str(clean), batch_size=2)
+        output = tmp_path / "answers.jsonl"
+        answer_all = bulk_answer.answer_all
+
+        def crash_after_two(*args: Any) -> Iterator[Any]:
+            for i, result in enumerate(answer_all(*args)):
+                if i == 2:
+                    raise RuntimeError("crash")
+                yield result
+
+        with (
+            patch("bulk_answer.answer_all", crash_after_two),
+            pytest.raises(RuntimeError),
+        ):
+            bulk_answer.bulk_answer(engine, str(questions), str(output), batch_size=2)
+        with output.open("a") as f:
+            f.write('{"row": 4, "torn')  # A write the checkpoint never covered
+
+        done, _, rows = bulk_answer.bulk_answer(
+            engine, str(questions), str(output), batch_size=2, resume=True
+        )
+
+        assert (done, rows) == (5, 9)
+        assert output.read_text() == clean.read_text()
+
+    def test_resume_refuses_other_build(
+        self, engine: FAQEngine, questions: Path, tmp_path: Path
+    ) -> None:
+        output = tmp_path / "answers.jsonl"
+        output.write_text("")
+        checkpoint_path(str(output)).write_text(
+            Checkpoint(build_id="other").model_dump_json()
+        )
+
+        with pytest.raises(SystemExit, match="build other"):
+            bulk_answer.bulk_answer(engine, str(questions), str(output), resume=True)
+
+    def test_resume_without_output_is_a_clear_error(
+        self, engine: FAQEngine, questions: Path, tmp_path: Path
+    ) -> None:
+        output = tmp_path / "answers.jsonl"
+        checkpoint_path(str(output)).write_text(
+            Checkpoint(build_id=None, rows=2, output_bytes=100).model_dump_json()
+        )
+
+        with pytest.raises(SystemExit, match="answers.jsonl is missing"):
+            bulk_answer.bulk_answer(engine, str(questions), str(output), resume=True)
+
+        output.write_text("short")
+        with pytest.raises(SystemExit, match="shorter than its checkpoint"):
+            bulk_answer.bulk_answer(engine, str(questions), str(output), resume=True)
+
+    def test_columns_output(
+        self, engine: FAQEngine, questions: Path, tmp_path: Path
+    ) -> None:
+        output = tmp_path / "columns"
+
+        bulk_answer.bulk_answer(
+            engine, str(questions), str(output), output_format="columns"
+        )
+
+        description = json.loads((output / "columns.json").read_text())
+        assert description["rows"] == 9
+        answer_ids = np.fromfile(output / "answer_id.i32", dtype="<i4")
+        answered = np.fromfile(output / "answered.u8", dtype="u1")
+        assert answer_ids.tolist() == [0, 1, 1, 0, -1, 1, 0, 1, 1]
+        assert answered.tolist() == [1, 1, 0, 1, 0, 0, 1, 1, 0]
+
+    def test_processes_give_same_output(
+        self, engine: FAQEngine, questions: Path, tmp_path: Path
+    ) -> None:
+        single, forked = tmp_path / "single.jsonl", tmp_path / "forked.jsonl"
+
+        bulk_answer.bulk_answer(engine, str(questions), str(single), batch_size=2)
+        bulk_answer.bulk_answer(
+            engine, str(questions), str(forked), batch_size=2, processes=2
+        )
+
+        assert forked.read_text() == single.read_text()
+
+    def test_workers_set_their_own_thread_counts(self, engine: FAQEngine) -> None:
+        engine.thread_config = ThreadConfig(2, 3, 4)
+        with (
+            patch.object(bulk_answer, "_engine", engine),
+            patch("bulk_answer.apply_thread_config") as apply,
+        ):
+            bulk_answer.init_worker()
+
+        apply.assert_called_once_with(ThreadConfig(2, 3, 4))
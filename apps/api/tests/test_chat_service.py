@@ -3,8 +3,9 @@ from unittest.mock import AsyncMock, Mock
 import pytest
 
 from chat_service import ChatService
-from exceptions import InvalidInputError, ServiceNotReadyError
-from response import ChatCompletionMessage
+from engine import SearchResult
+from exceptions import EntryNotFoundError, InvalidInputError, ServiceNotReadyError
+from response import ChatCompletionMessage, ChatCompletionResponse
 
 
 @pytest.fixture
@@ -12,7 +13,8 @@ def mock_engine() -> Mock:
     """Create a mock FAQEngine with default ready state."""
     engine = Mock()
     engine.is_ready = True
-    engine.asearch = AsyncMock(return_value="Test answer")
+    engine.asearch_result = AsyncMock(return_value=SearchResult("Test answer", 0, 0.1))
+    engine.encoded_answers = []
     return engine
 
 
@@ -23,6 +25,30 @@ def chat_service(mock_engine: Mock) -> ChatService:
 
 
 class TestChatService:
+    @pytest.mark.asyncio
+    async def test_process_chat_request_raw_returns_serialized_body(
+        self, chat_service: ChatService, mock_engine: Mock
+    ) -> None:
+        messages = [ChatCompletionMessage(role="user", content="How do I reset?")]
+
+        body = await chat_service.process_chat_request_raw(messages)
+
+        response = ChatCompletionResponse.model_validate_json(body)
+        mock_engine.asearch_result.assert_called_once_with("How do I reset?")
+        assert response.choices[0].message.content == "Test answer"
+
+    @pytest.mark.asyncio
+    async def test_process_chat_request_raw_uses_pre_encoded_answer(
+        self, chat_service: ChatService, mock_engine: Mock
+    ) -> None:
+        mock_engine.encoded_answers = [b'"Encoded at load"']
+        messages = [ChatCompletionMessage(role="user", content="How do I reset?")]
+
+        body = await chat_service.process_chat_request_raw(messages)
+
+        response = ChatCompletionResponse.model_validate_json(body)
+        assert response.choices[0].message.content == "Encoded at load"
+
     @pytest.mark.asyncio
     async def test_process_chat_request_returns_answer(
         self, chat_service: ChatService, mock_engine: Mock
@@ -31,7 +57,7 @@ class TestChatService:
 
         response = await chat_service.process_chat_request(messages)
 
-        mock_engine.asearch.assert_called_once_with("How do I reset?")
+        mock_engine.asearch_result.assert_called_once_with("How do I reset?")
         assert response.choices[0].message.content == "Test answer"
         assert response.choices[0].message.role == "assistant"
 
@@ -39,7 +65,7 @@ class TestChatService:
     async def test_process_chat_request_returns_null_when_no_match(
         self, chat_service: ChatService, mock_engine: Mock
     ) -> None:
-        mock_engine.asearch.return_value = None
+        mock_engine.asearch_result.return_value = SearchResult(None)
         messages = [ChatCompletionMessage(role="user", content="Unknown question")]
 
         response = await chat_service.process_chat_request(messages)
@@ -69,7 +95,7 @@ class TestChatService:
 
         await chat_service.process_chat_request(messages)
 
-        mock_engine.asearch.assert_called_once_with("Second question")
+        mock_engine.asearch_result.assert_called_once_with("Second question")
 
     @pytest.mark.asyncio
     async def test_process_chat_request_skips_assistant_messages(
@@ -82,7 +108,7 @@ class TestChatService:
 
         await chat_service.process_chat_request(messages)
 
-        mock_engine.asearch.assert_called_once_with("User question")
+        mock_engine.asearch_result.assert_called_once_with("User question")
 
     @pytest.mark.asyncio
     async def test_process_chat_request_raises_when_no_user_message(
@@ -113,7 +139,7 @@ class TestChatService:
 
         await chat_service.process_chat_request(messages)
 
-        mock_engine.asearch.assert_called_once_with("Valid question")
+        mock_engine.asearch_result.assert_called_once_with("Valid question")
 
     @pytest.mark.asyncio
     async def test_process_chat_request_response_format(
@@ -128,3 +154,55 @@ class TestChatService:
         assert len(response.choices) == 1
         assert response.choices[0].index == 0
         assert response.choices[0].finish_reason == "stop"
+
+
+class TestQueryCapture:
+    @pytest.mark.asyncio
+    async def test_records_searched_question(self, mock_engine: Mock) -> None:
+        mock_engine.asearch_result = AsyncMock(
+            return_value=SearchResult("Test answer", 4, 0.3)
+        )
+        mock_engine.manifest = None
+        capture = Mock()
+        service = ChatService(engine=mock_engine, capture=capture)
+        messages = [ChatCompletionMessage(role="user", content="How do I reset?")]
+
+        response = await service.process_chat_request(messages)
+
+        assert response.choices[0].message.content == "Test answer"
+        query, result, _, latency, build_id = capture.record.call_args.args
+        assert query == "How do I reset?"
+        assert result.answer_id == 4
+        assert latency >= 0
+        assert build_id is None
+
+
+class TestSingleQuestion:
+    @pytest.mark.asyncio
+    async def test_answer_question_returns_search_result(
+        self, chat_service: ChatService, mock_engine: Mock
+    ) -> None:
+        mock_engine.asearch_result = AsyncMock(
+            return_value=SearchResult("Test answer", 4, 0.3)
+        )
+
+        result = await chat_service.answer_question("How do I reset?")
+
+        assert result.answer_id == 4
+        mock_engine.asearch_result.assert_called_once_with("How do I reset?")
+
+    @pytest.mark.asyncio
+    async def test_answer_question_rejects_blank_question(
+        self, chat_service: ChatService
+    ) -> None:
+        with pytest.raises(InvalidInputError):
+            await chat_service.answer_question("   ")
+
+    def test_get_answer_by_id(
+        self, chat_service: ChatService, mock_engine: Mock
+    ) -> None:
+        mock_engine.answer_for = Mock(side_effect=[None, "Second answer"])
+
+        with pytest.raises(EntryNotFoundError):
+            chat_service.get_answer(7)
+        assert chat_service.get_answer(1) == "Second answer"
@@ -0,0 +1,117 @@
+import json
+from pathlib import Path
+from typing import Any
+
+import faiss
+import numpy as np
+
+from cluster_unanswered import (
+    analyze,
+    cluster,
+    count_unique,
+    format_report,
+    load_unanswered,
+    rank_clusters,
+)
+from engine import FAQEngine
+
+TOPICS = {"refund": [10.0, 0.0], "invoice": [0.0, 10.0], "hours": [-10.0, -10.0]}
+
+
+class TopicModel:
+    """Stand-in model: a question embeds near the topic word it contains."""
+
+    max_seq_length = 16
+
+    def tokenizer(self, texts: list[str], **kwargs: Any) -> dict[str, list[list[int]]]:
+        return {"input_ids": [[0] * len(t.split()) for t in texts]}
+
+    def encode(self, texts: list[str], **kwargs: Any) -> np.ndarray:
+        rows = []
+        for text in texts:
+            topic = next(word for word in text.split() if word in TOPICS)
+            jitter = len(text) % 7 * 0.01
+            rows.append([TOPICS[topic][0] + jitter, TOPICS[topic][1]])
+        return np.array(rows, dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 2
+
+
+def topic_engine() -> FAQEngine:
+    engine = FAQEngine()
+    engine._ready = True
+    engine.model = TopicModel()  # type: ignore[assignment]
+    engine.index = faiss.IndexFlatL2(2)
+    engine.index.add(np.array([[9.0, 0.0], [-9.0, -9.0]], dtype=np.float32))
+    engine.answers = ["Refunds take 5 days.", "Open 9 to 5."]
+    return engine
+
+
+class TestLoadUnanswered:
+    def test_reads_unanswered_captures_and_text(self, tmp_path: Path) -> None:
+        captures = tmp_path / "queries.jsonl"
+        captures.write_text(
+            "\n".join(
+                json.dumps({"query": query, "answered": answered})
+                for query, answered in [("lost", False), ("found", True)]
+            )
+        )
+        text = tmp_path / "unanswered.txt"
+        text.write_text("one\n\n  two \n")
+
+        assert load_unanswered([str(captures), str(text)]) == ["lost", "one", "two"]
+
+    def test_counts_repeated_questions_once(self) -> None:
+        texts, counts = count_unique(["a  b", "a b", "c"])
+
+        assert texts == ["a b", "c"]
+        assert counts.tolist() == [2.0, 1.0]
+
+
+class TestClustering:
+    def test_ranks_clusters_by_weighted_size(self) -> None:
+        rng = np.random.default_rng(0)
+        centers = np.array([[0.0, 0.0], [50.0, 50.0]], dtype=np.float32)
+        embeddings = np.concatenate(
+            [center + rng.normal(size=(20, 2)) for center in centers]
+        ).astype(np.float32)
+        counts = np.ones(40, dtype=np.float32)
+        counts[20:] = 5.0  # The second blob is asked five times as often
+
+        centroids, labels, distances = cluster(embeddings, counts, k=2)
+        ids, sizes, unique, _, reps = rank_clusters(
+            labels, distances, counts, len(centroids), representatives=3
+        )
+
+        assert sizes.tolist() == [100.0, 20.0]
+        assert unique.tolist() == [20, 20]
+        assert np.linalg.norm(centroids[ids[0]] - centers[1]) < 2
+        assert set(labels[reps[0]]) == {ids[0]}
+
+    def test_representatives_are_most_asked_and_padded(self) -> None:
+        labels = np.array([0, 0, 0, 1])
+        distances = np.array([0.1, 0.5, 0.2, 0.0], dtype=np.float32)
+        counts = np.array([1.0, 9.0, 1.0, 1.0], dtype=np.float32)
+
+        ids, _, _, _, reps = rank_clusters(labels, distances, counts, 3, 2)
+
+        assert ids.tolist() == [0, 1]  # The empty cluster 2 is left out
+        assert reps.tolist() == [[1, 0], [3, -1]]
+
+
+class TestAnalyze:
+    def test_finds_missing_topic(self) -> None:
+        queries = ["refund please", "my refund"] * 3 + ["invoice copy"] * 10
+
+        clusters = analyze(topic_engine(), queries, k=2)
+
+        assert [found.size for found in clusters] == [10, 6]
+        missing, covered = clusters
+        assert missing.representatives == ["invoice copy"]
+        assert covered.nearest_answer == "Refunds take 5 days."
+        assert missing.nearest_distance > covered.nearest_distance
+        assert "16 unanswered questions in 2 clusters" in format_report(clusters, 16)
+
+    def test_no_queries(self) -> None:
+        assert analyze(topic_engine(), [], k=2) == []
@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from coalescing import SingleFlight
+
+
+class TestSingleFlight:
+    async def test_concurrent_calls_share_one_computation(self) -> None:
+        flights: SingleFlight[str] = SingleFlight()
+        release = asyncio.Event()
+        started = 0
+
+        async def compute() -> str:
+            nonlocal started
+            started += 1
+            await release.wait()
+            return "answer"
+
+        callers = [asyncio.create_task(flights.do("q", compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await asyncio.gather(*callers) == ["answer"] * 5
+        assert started == 1
+        assert (flights.calls, flights.coalesced) == (5, 4)
+        assert flights.ratio == pytest.approx(0.8)
+
+    async def test_different_keys_run_separately(self) -> None:
+        flights: SingleFlight[str] = SingleFlight()
+
+        async def echo(value: str) -> str:
+            await asyncio.sleep(0)
+            return value
+
+        results = await asyncio.gather(
+            flights.do("a", lambda: echo("a")), flights.do("b", lambda: echo("b"))
+        )
+
+        assert list(results) == ["a", "b"]
+        assert flights.coalesced == 0
+
+    async def test_cancelled_caller_does_not_cancel_others(self) -> None:
+        flights: SingleFlight[str] = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute() -> str:
+            await release.wait()
+            return "answer"
+
+        first = asyncio.create_task(flights.do("q", compute))
+        second = asyncio.create_task(flights.do("q", compute))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "answer"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    async def test_last_cancelled_caller_cancels_computation(self) -> None:
+        flights: SingleFlight[str] = SingleFlight()
+        computation_cancelled = asyncio.Event()
+
+        async def compute() -> str:
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                computation_cancelled.set()
+                raise
+            return "answer"
+
+        callers = [asyncio.create_task(flights.do("q", compute)) for _ in range(2)]
+        await asyncio.sleep(0)
+        callers[0].cancel()
+        await asyncio.sleep(0)
+        assert not computation_cancelled.is_set()
+
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+        assert computation_cancelled.is_set()
+        assert flights.abandoned == 1
+
+        async def fresh() -> str:
+            return "fresh"
+
+        assert await flights.do("q", fresh) == "fresh"
+
+    async def test_error_reaches_every_caller(self) -> None:
+        flights: SingleFlight[str] = SingleFlight()
+
+        async def fail() -> str:
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            flights.do("q", fail), flights.do("q", fail), return_exceptions=True
+        )
+
+        assert [type(result) for result in results] == [ValueError, ValueError]
+
+    async def test_finished_key_starts_a_new_computation(self) -> None:
+        flights: SingleFlight[int] = SingleFlight()
+        count = 0
+
+        async def compute() -> int:
+            nonlocal count
+            count += 1
+            return count
+
+        assert await flights.do("q", compute) == 1
+        await asyncio.sleep(0)  # Let the done callback release the key
+        assert await flights.do("q", compute) == 2
@@ -0,0 +1,91 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from cpu_tuning import (
+    ThreadConfig,
+    autotune,
+    available_cpus,
+    candidate_configs,
+    cgroup_cpu_limit,
+    cpu_budget,
+    derive_thread_config,
+    synthetic_queries,
+)
+
+
+class TestCPUDetection:
+    def test_reads_cgroup_v2_quota(self, tmp_path: Path) -> None:
+        (tmp_path / "cpu.max").write_text("150000 100000\n")
+
+        assert cgroup_cpu_limit(tmp_path) == 1.5
+
+    def test_unlimited_cgroup_v2(self, tmp_path: Path) -> None:
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+
+        assert cgroup_cpu_limit(tmp_path) is None
+
+    def test_reads_cgroup_v1_quota(self, tmp_path: Path) -> None:
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("200000\n")
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+
+        assert cgroup_cpu_limit(tmp_path) == 2.0
+
+    def test_unlimited_cgroup_v1(self, tmp_path: Path) -> None:
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+
+        assert cgroup_cpu_limit(tmp_path) is None
+
+    @pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="Linux only")
+    def test_quota_caps_affinity(self, tmp_path: Path) -> None:
+        (tmp_path / "cpu.max").write_text("150000 100000\n")
+
+        with patch("cpu_tuning.os.sched_getaffinity", return_value=set(range(16))):
+            assert available_cpus(tmp_path) == 2
+            assert available_cpus(tmp_path / "missing") == 16
+
+
+class TestThreadConfig:
+    def test_budget_is_split_between_workers(self) -> None:
+        assert cpu_budget(16, workers=4) == 4
+        assert cpu_budget(1, workers=4) == 1
+
+    def test_default_runs_one_single_threaded_search_per_cpu(self) -> None:
+        assert derive_thread_config(4) == ThreadConfig(1, 1, 4)
+
+    def test_candidates_keep_within_budget(self) -> None:
+        candidates = candidate_configs(4)
+
+        assert candidates == [
+            ThreadConfig(1, 1, 4),
+            ThreadConfig(2, 2, 2),
+            ThreadConfig(4, 4, 1),
+        ]
+
+    def test_autotune_picks_fastest_candidate(self) -> None:
+        candidates = [ThreadConfig(1, 1, 1), ThreadConfig(2, 2, 1)]
+        speeds = iter([10.0, 30.0])
+
+        with (
+            patch("cpu_tuning.measure_throughput", side_effect=lambda *_: next(speeds)),
+            patch("cpu_tuning.apply_thread_config") as apply,
+        ):
+            best = autotune(lambda query: None, ["q"], candidates)
+
+        assert best == ThreadConfig(2, 2, 1)
+        apply.assert_called_once_with(best)
+
+    def test_synthetic_queries_use_source_vocabulary(self) -> None:
+        queries = synthetic_queries(["reset your password"], n=5)
+
+        assert len(queries) == 5
+        assert {word for query in queries for word in query.split()} <= {
+            "reset",
+            "your",
+            "password",
+        }
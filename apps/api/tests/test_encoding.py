@@ -0,0 +1,57 @@
+from typing import Any
+
+import numpy as np
+
+from encoding import encode_length_bucketed, token_lengths
+
+
+class FakeModel:
+    """Stand-in model: one token per word, embedding = [word count, batch max]."""
+
+    max_seq_length = 4
+
+    def __init__(self) -> None:
+        self.batches: list[list[str]] = []
+
+    def tokenizer(self, texts: list[str], **kwargs: Any) -> dict[str, list[list[int]]]:
+        max_length = kwargs["max_length"]
+        return {"input_ids": [[0] * min(len(t.split()), max_length) for t in texts]}
+
+    def encode(self, texts: list[str], **kwargs: Any) -> np.ndarray:
+        self.batches.append(texts)
+        longest = max(len(t.split()) for t in texts)
+        return np.array([[len(t.split()), longest] for t in texts], dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 2
+
+
+class TestEncodeLengthBucketed:
+    def test_restores_input_order(self) -> None:
+        model = FakeModel()
+        texts = ["a b c", "a", "a b", "a b c d", "a"]
+
+        embeddings = encode_length_bucketed(model, texts, batch_size=2)  # type: ignore[arg-type]
+
+        assert embeddings[:, 0].tolist() == [3, 1, 2, 4, 1]
+        assert embeddings.dtype == np.float32
+
+    def test_batches_group_similar_lengths(self) -> None:
+        model = FakeModel()
+        texts = ["a b c d", "a", "a b c d", "a"]
+
+        embeddings = encode_length_bucketed(model, texts, batch_size=2)  # type: ignore[arg-type]
+
+        assert model.batches == [["a", "a"], ["a b c d", "a b c d"]]
+        # Short inputs were never padded to the long ones
+        assert embeddings[1, 1] == 1
+
+    def test_token_lengths_respect_budget(self) -> None:
+        lengths = token_lengths(FakeModel(), ["a b c d e f", "a"])  # type: ignore[arg-type]
+
+        assert lengths.tolist() == [4, 1]
+
+    def test_empty_input(self) -> None:
+        embeddings = encode_length_bucketed(FakeModel(), [])  # type: ignore[arg-type]
+
+        assert embeddings.shape == (0, 2)
@@ -1,9 +1,18 @@
-from unittest.mock import MagicMock, Mock, patch
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
 import numpy as np
 import pytest
 
-from engine import FAQEngine
+from cpu_tuning import ThreadConfig, candidate_configs
+from engine import FAQEngine, SearchResult
+from quantization import build_index
+from reduction import fit_reduction
+from result_cache import LocalCache, TieredCache
+from settings import settings
+from static_encoder import CascadeDecision
 
 
 class TestFAQEngine:
@@ -42,6 +51,36 @@ class TestFAQEngine:
         assert engine.is_ready is True
         assert engine.model is mock_model
         mock_model.eval.assert_called_once()
+        assert mock_model.max_seq_length == settings.max_seq_length
+
+    @patch("engine.autotune")
+    @patch("engine.SentenceTransformer")
+    @patch("engine.faiss.read_index")
+    @patch("builtins.open", create=True)
+    @patch("engine.json.load")
+    def test_load_resources_autotunes_threads(
+        self,
+        mock_json_load: Mock,
+        mock_open: Mock,
+        mock_read_index: Mock,
+        mock_sentence_transformer: Mock,
+        mock_autotune: Mock,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setattr(settings, "cpu_count", 4)
+        monkeypatch.setattr(settings, "thread_autotune", True)
+        mock_json_load.return_value = ["Answer 1", "Answer 2"]
+        mock_autotune.return_value = ThreadConfig(2, 2, 2)
+
+        engine = FAQEngine()
+        engine.load_resources()
+
+        assert engine.is_ready is True
+        candidates = mock_autotune.call_args.args[2]
+        assert candidates == candidate_configs(4)
+        assert engine.thread_config == ThreadConfig(2, 2, 2)
+        assert engine.executor is not None
+        assert engine.executor._max_workers == 2
 
     @patch("engine.SentenceTransformer")
     def test_load_resources_failure_sets_not_ready(
@@ -96,6 +135,22 @@ class TestFAQEngine:
 
         assert result is None
 
+    @pytest.mark.asyncio
+    async def test_asearch_result_reports_nearest_answer_beyond_threshold(
+        self,
+    ) -> None:
+        engine = FAQEngine()
+        engine._ready = True
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        engine.index = MagicMock()
+        engine.index.search.return_value = (np.array([[2.0]]), np.array([[1]]))
+        engine.answers = ["First", "Second"]
+
+        result = await engine.asearch_result("unrelated query")
+
+        assert result == SearchResult(None, 1, 2.0)
+
     @pytest.mark.asyncio
     async def test_asearch_returns_none_when_index_out_of_bounds(self) -> None:
         engine = FAQEngine()
@@ -130,6 +185,227 @@ class TestFAQEngine:
 
         assert result is None
 
+    @pytest.mark.asyncio
+    async def test_asearch_coalesces_identical_concurrent_queries(self) -> None:
+        engine = FAQEngine()
+        engine._ready = True
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        engine.index = MagicMock()
+        engine.index.search.return_value = (np.array([[0.5]]), np.array([[0]]))
+        engine.answers = ["Answer"]
+
+        results = await asyncio.gather(
+            engine.asearch("test query"),
+            engine.asearch("  test   query "),
+            engine.asearch("other query"),
+        )
+
+        assert list(results) == ["Answer"] * 3
+        assert engine.model.encode.call_count == 2
+        assert engine.inflight.coalesced == 1
+
+    @pytest.mark.asyncio
+    async def test_asearch_uses_result_cache_per_version(self) -> None:
+        engine = FAQEngine()
+        engine._ready = True
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        engine.index = MagicMock()
+        engine.index.search.return_value = (np.array([[0.5]]), np.array([[1]]))
+        engine.answers = ["First", "Second"]
+        engine.manifest = MagicMock(build_id="build1")
+        engine.result_cache = TieredCache([LocalCache(8)])
+
+        first = await engine.asearch_result("test query")
+        await asyncio.gather(*engine.cache_writes)
+        cached = await engine.asearch_result(" test  query")
+        engine.manifest.build_id = "build2"
+        await engine.asearch_result("test query")
+
+        assert first == cached == SearchResult("Second", 1, 0.5)
+        assert engine.model.encode.call_count == 2
+        assert engine.result_cache.stats["local"].hits == 1
+
+    @pytest.mark.asyncio
+    async def test_cached_static_stage_result_keeps_its_decision(self) -> None:
+        engine = FAQEngine()
+        engine._ready = True
+        engine.model = MagicMock()
+        engine.index = MagicMock()
+        engine.answers = ["First", "Second"]
+        engine.manifest = MagicMock(build_id="build1")
+        engine.result_cache = TieredCache([LocalCache(8)])
+        engine.cascade = MagicMock()
+        # Beyond the model's similarity threshold, but accepted statically
+        engine.cascade.decide.return_value = CascadeDecision("accept", 1, 1.5)
+
+        first = await engine.asearch_result("test query")
+        await asyncio.gather(*engine.cache_writes)
+        cached = await engine.asearch_result("test query")
+
+        assert first == cached == SearchResult("Second", 1, 1.5, static=True)
+        assert engine.cascade.decide.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_cache_write_does_not_delay_the_result(self) -> None:
+        engine = FAQEngine()
+        engine._ready = True
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        engine.index = MagicMock()
+        engine.index.search.return_value = (np.array([[0.5]]), np.array([[0]]))
+        engine.answers = ["Answer"]
+        engine.manifest = MagicMock(build_id="build1")
+        release = asyncio.Event()
+
+        async def put(key: bytes, value: tuple[int, float, bool]) -> None:
+            await release.wait()
+            raise ConnectionError("cache down")
+
+        engine.result_cache = MagicMock()
+        engine.result_cache.get = AsyncMock(return_value=None)
+        engine.result_cache.put = put
+
+        result = await engine.asearch_result("test query")
+
+        assert result == SearchResult("Answer", 0, 0.5)
+        assert len(engine.cache_writes) == 1
+        with patch("engine.logger") as logger:
+            release.set()
+            await asyncio.gather(*engine.cache_writes, return_exceptions=True)
+            await asyncio.sleep(0)
+        assert not engine.cache_writes
+        assert "Result cache write failed" in logger.warning.call_args[0][0]
+
+    @pytest.mark.asyncio
+    async def test_abandoned_searches_are_skipped_or_discarded(self) -> None:
+        engine = FAQEngine()
+        engine._ready = True
+        engine.executor = ThreadPoolExecutor(max_workers=1)
+        started, release = threading.Event(), threading.Event()
+
+        def encode(texts: list[str]) -> np.ndarray:
+            started.set()
+            release.wait(timeout=5)
+            return np.array([[0.1, 0.2, 0.3]])
+
+        engine.model = MagicMock()
+        engine.model.encode.side_effect = encode
+        engine.index = MagicMock()
+        engine.index.search.return_value = (np.array([[0.5]]), np.array([[0]]))
+        engine.answers = ["Answer"]
+
+        running = asyncio.create_task(engine.asearch("running"))
+        queued = asyncio.create_task(engine.asearch("queued"))
+        await asyncio.to_thread(started.wait, 5)
+        running.cancel()
+        queued.cancel()
+        await asyncio.gather(running, queued, return_exceptions=True)
+        release.set()
+        engine.executor.shutdown(wait=True)
+
+        assert engine.model.encode.call_count == 1
+        assert (engine.work.started, engine.work.cancelled) == (1, 1)
+        assert engine.work.discarded == 1
+        assert engine.work.discarded_seconds == engine.work.seconds > 0
+        assert engine.inflight.abandoned == 2
+
+    @pytest.mark.asyncio
+    async def test_asearch_routes_to_shards(self) -> None:
+        engine = FAQEngine()
+        engine._ready = True
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        engine.shard_client = MagicMock()
+        engine.shard_client.search = AsyncMock(
+            return_value=(np.array([[0.5]]), np.array([[1]]))
+        )
+        engine.answers = ["First answer", "Second answer"]
+
+        result = await engine.asearch("test query")
+
+        assert result == "Second answer"
+        vectors, k = engine.shard_client.search.await_args.args
+        assert vectors.shape == (1, 3)
+        assert k == settings.top_k_results
+
+    def test_search_sync_applies_index_transform(self) -> None:
+        engine = FAQEngine()
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[3.0, 4.0, 1.0]])
+        engine.transform = fit_reduction(np.eye(3, dtype=np.float32), "truncate", 2)
+        engine.manifest = MagicMock(normalize=True)
+        engine.index = MagicMock()
+        engine.index.search.return_value = (np.array([[0.1]]), np.array([[0]]))
+        engine.answers = ["Answer"]
+
+        result = engine._search_sync("test")
+
+        assert result == "Answer"
+        query = engine.index.search.call_args.args[0]
+        np.testing.assert_allclose(query, [[0.6, 0.8]], rtol=1e-6)
+
+    def test_search_sync_reranks_quantized_index(self) -> None:
+        vectors = np.eye(8, dtype=np.float32)
+        engine = FAQEngine()
+        engine.model = MagicMock()
+        engine.model.encode.return_value = vectors[[3]] * 0.9
+        engine.index = build_index(vectors, "sq8")
+        engine.rerank_vectors = vectors
+        engine.answers = [f"Answer {i}" for i in range(8)]
+
+        result = engine._search_sync("test")
+
+        assert result == "Answer 3"
+
+    def test_search_sync_maps_question_variants_to_answers(self) -> None:
+        engine = FAQEngine()
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        engine.index = MagicMock()
+        engine.index.search.return_value = (
+            np.array([[0.2, 0.3]]),
+            np.array([[2, 0]]),
+        )
+        engine.answers = ["First answer", "Second answer"]
+        engine.answer_ids = np.array([0, 1, 1], dtype=np.int32)
+        engine.max_variants = 2
+
+        result = engine._search_sync("test")
+
+        assert result == "Second answer"
+        # Enough vectors are fetched to see top_k_results distinct answers
+        assert engine.index.search.call_args.kwargs["k"] == 2 * settings.top_k_results
+
+    def test_search_sync_uses_confident_cascade_decision(self) -> None:
+        engine = FAQEngine()
+        engine.model = MagicMock()
+        engine.index = MagicMock()
+        engine.answers = ["First answer", "Second answer"]
+        engine.cascade = MagicMock()
+        engine.cascade.decide.return_value = CascadeDecision("accept", 1, 0.1)
+
+        result = engine._search_result_sync("test")
+
+        assert result == SearchResult("Second answer", 1, 0.1, static=True)
+        engine.model.encode.assert_not_called()
+
+    def test_search_sync_falls_back_when_cascade_uncertain(self) -> None:
+        engine = FAQEngine()
+        engine.model = MagicMock()
+        engine.model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
+        engine.index = MagicMock()
+        engine.index.search.return_value = (np.array([[0.5]]), np.array([[0]]))
+        engine.answers = ["First answer"]
+        engine.cascade = MagicMock()
+        engine.cascade.decide.return_value = CascadeDecision("uncertain")
+
+        result = engine._search_sync("test")
+
+        assert result == "First answer"
+        engine.model.encode.assert_called_once_with(["test"])
+
     def test_search_sync_returns_none_when_model_is_none(self) -> None:
         engine = FAQEngine()
         engine.model = None
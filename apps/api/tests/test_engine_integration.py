@@ -52,7 +52,7 @@ def _build_test_engine() -> FAQEngine:
 
     # Generate embeddings for test questions
     questions = [item["question"] for item in TEST_FAQ_DATA]
-    answers = [item["answer"] for item in TEST_FAQ_DATA]
+    answers: list[str | None] = [item["answer"] for item in TEST_FAQ_DATA]
 
     embeddings = engine.model.encode(questions)
 
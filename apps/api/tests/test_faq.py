@@ -0,0 +1,77 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from faq import FAQEntry, dedup_by_answer, flatten, load_answer_ids, load_faq
+
+
+class TestFAQEntry:
+    def test_single_question_entry(self) -> None:
+        entry = FAQEntry(question="Q", answer="A")
+
+        assert entry.variants == ["Q"]
+
+    def test_question_variants_keep_order_without_duplicates(self) -> None:
+        entry = FAQEntry(question="Q1", questions=["Q1", "Q2", "", "Q3"], answer="A")
+
+        assert entry.variants == ["Q1", "Q2", "Q3"]
+
+    def test_entry_without_questions_is_invalid(self) -> None:
+        with pytest.raises(ValidationError):
+            FAQEntry(questions=[], answer="A")
+
+
+class TestFlatten:
+    def test_answers_are_stored_once(self, tmp_path: Path) -> None:
+        path = tmp_path / "faq.json"
+        path.write_text(
+            '[{"question": "Q1", "answer": "A1"},'
+            ' {"questions": ["Q2", "Q2b", "Q2c"], "answer": "A2"}]'
+        )
+
+        questions, answer_ids, answers = flatten(load_faq(str(path)))
+
+        assert questions == ["Q1", "Q2", "Q2b", "Q2c"]
+        assert answer_ids.dtype == np.int32
+        assert answer_ids.tolist() == [0, 1, 1, 1]
+        assert answers == ["A1", "A2"]
+
+    def test_load_answer_ids_reports_max_variants(self, tmp_path: Path) -> None:
+        path = tmp_path / "ids.npy"
+        np.save(path, np.array([0, 1, 1, 1, 2], dtype=np.int32))
+
+        answer_ids, max_variants = load_answer_ids(str(path))
+
+        assert answer_ids.tolist() == [0, 1, 1, 1, 2]
+        assert max_variants == 3
+
+
+class TestDedupByAnswer:
+    def test_keeps_closest_variant_per_answer(self) -> None:
+        answer_ids = np.array([0, 1, 1, 2], dtype=np.int32)
+        distances = np.array([[0.1, 0.2, 0.3, 0.4]], dtype=np.float32)
+        ids = np.array([[1, 2, 0, 3]])
+
+        top_distances, top_answers = dedup_by_answer(distances, ids, answer_ids, k=2)
+
+        assert top_answers.tolist() == [[1, 0]]
+        np.testing.assert_allclose(top_distances, [[0.1, 0.3]])
+
+    def test_pads_when_too_few_answers(self) -> None:
+        answer_ids = np.array([0, 0], dtype=np.int32)
+        distances = np.array([[0.1, 0.2, 0.0]], dtype=np.float32)
+        ids = np.array([[0, 1, -1]])
+
+        top_distances, top_answers = dedup_by_answer(distances, ids, answer_ids, k=2)
+
+        assert top_answers.tolist() == [[0, -1]]
+        assert np.isinf(top_distances[0, 1])
+
+    def test_vector_ids_are_answer_ids_without_map(self) -> None:
+        distances = np.array([[0.5]], dtype=np.float32)
+
+        _, top_answers = dedup_by_answer(distances, np.array([[4]]), None, k=1)
+
+        assert top_answers.tolist() == [[4]]
@@ -0,0 +1,247 @@
+import threading
+import time
+import zlib
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import faiss
+import numpy as np
+import pytest
+
+from engine import FAQEngine
+from exceptions import EntryNotFoundError
+from faq import FAQEntry
+from faq_updates import FAQUpdater, Journal, RWLock
+from settings import settings
+from static_encoder import StaticCascade
+
+
+def fake_encode(texts: list[str]) -> np.ndarray:
+    """Deterministic unit vectors: equal texts embed identically."""
+    vectors = np.stack(
+        [
+            np.random.default_rng(zlib.crc32(text.encode())).normal(size=8)
+            for text in texts
+        ]
+    ).astype(np.float32)
+    normalized: np.ndarray = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return normalized
+
+
+def make_engine() -> FAQEngine:
+    engine = FAQEngine()
+    engine.model = MagicMock()
+    engine.model.encode.side_effect = fake_encode
+    engine.index = faiss.IndexFlatL2(8)
+    engine.index.add(fake_encode(["Q0", "Q1"]))
+    engine.answers = ["A0", "A1"]
+    engine._ready = True
+    return engine
+
+
+def make_cascaded_engine() -> FAQEngine:
+    """An engine whose static stage accepts exact question matches."""
+    engine = make_engine()
+    encoder = MagicMock()
+    encoder.encode.side_effect = fake_encode
+    static_index = faiss.IndexFlatL2(8)
+    static_index.add(fake_encode(["Q0", "Q1"]))
+    engine.cascade = StaticCascade(
+        encoder, static_index, accept_distance=1e-4, min_margin=0.1, reject_distance=9
+    )
+    return engine
+
+
+def restart() -> FAQEngine:
+    """A fresh engine loaded from the snapshot and journal on disk."""
+    with patch("engine.SentenceTransformer") as mock_sentence_transformer:
+        mock_sentence_transformer.return_value.encode.side_effect = fake_encode
+        engine = FAQEngine()
+        engine.load_resources()
+    return engine
+
+
+@pytest.fixture
+def artifacts(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    for name, filename in [
+        ("faiss_index_path", "index.faiss"),
+        ("answers_json_path", "answers.json"),
+        ("answer_ids_path", "index.answer_ids.npy"),
+        ("index_manifest_path", "index.json"),
+        ("faq_journal_path", "faq.journal"),
+    ]:
+        monkeypatch.setattr(settings, name, str(tmp_path / filename))
+    monkeypatch.setattr(settings, "journal_fsync", False)
+    return tmp_path
+
+
+@pytest.fixture
+def updater(artifacts: Path) -> FAQUpdater:
+    return FAQUpdater(make_engine(), Journal(settings.faq_journal_path, fsync=False))
+
+
+class TestFAQUpdater:
+    def test_add_makes_entry_searchable(self, updater: FAQUpdater) -> None:
+        answer_id = updater.add(FAQEntry(questions=["Q2", "Q2b"], answer="A2"))
+
+        assert answer_id == 2
+        assert updater.engine._search_sync("Q2b") == "A2"
+        assert updater.engine._search_sync("Q0") == "A0"
+        assert updater.journal.records == 1
+
+    def test_update_replaces_questions(self, updater: FAQUpdater) -> None:
+        updater.update(1, FAQEntry(question="New Q1", answer="New A1"))
+
+        assert updater.engine._search_sync("New Q1") == "New A1"
+        # The old question's vector is gone, so it now matches nothing exactly
+        assert updater.engine.index is not None
+        assert updater.engine.index.ntotal == 2
+
+    def test_delete_removes_entry(self, updater: FAQUpdater) -> None:
+        updater.delete(0)
+
+        assert updater.engine._search_sync("Q0") != "A0"
+        assert updater.engine.answers == [None, "A1"]
+        with pytest.raises(EntryNotFoundError):
+            updater.delete(0)
+
+    def test_encoded_answers_follow_changes(self, updater: FAQUpdater) -> None:
+        updater.add(FAQEntry(question="Q2", answer="A2"))
+        updater.update(0, FAQEntry(question="Q0", answer="New A0"))
+        updater.delete(1)
+
+        assert updater.engine.encoded_answers == [b'"New A0"', b"null", b'"A2"']
+
+    def test_cascade_follows_changes(self, artifacts: Path) -> None:
+        engine = make_cascaded_engine()
+        updater = FAQUpdater(engine, Journal(settings.faq_journal_path, fsync=False))
+
+        updater.update(0, FAQEntry(question="New Q0", answer="New A0"))
+        updater.add(FAQEntry(questions=["Q2", "Q2b"], answer="A2"))
+
+        assert engine.cascade is not None
+        for question, answer, answer_id in [
+            ("New Q0", "New A0", 0),
+            ("Q1", "A1", 1),
+            ("Q2b", "A2", 2),
+        ]:
+            result = engine._search_result_sync(question)
+            assert (result.answer, result.answer_id) == (answer, answer_id)
+        assert engine.cascade.counts["accept"] == 3
+        assert engine.cascade.max_variants == 2
+
+    def test_update_of_unknown_entry_is_rejected(self, updater: FAQUpdater) -> None:
+        with pytest.raises(EntryNotFoundError):
+            updater.update(7, FAQEntry(question="Q", answer="A"))
+
+        assert updater.journal.records == 0
+
+    def test_replay_rebuilds_state(self, updater: FAQUpdater) -> None:
+        updater.add(FAQEntry(question="Q2", answer="A2"))
+        updater.update(0, FAQEntry(question="Q0 again", answer="A0 v2"))
+        updater.delete(1)
+
+        replayed = FAQUpdater(make_engine(), Journal(settings.faq_journal_path))
+        assert replayed.replay() == 3
+
+        assert replayed.engine.answers == ["A0 v2", None, "A2"]
+        assert replayed.engine._search_sync("Q0 again") == "A0 v2"
+        assert replayed.engine._search_sync("Q2") == "A2"
+
+    def test_replay_skips_torn_last_record(self, updater: FAQUpdater) -> None:
+        updater.add(FAQEntry(question="Q2", answer="A2"))
+        with open(settings.faq_journal_path, "a") as f:
+            f.write('{"op": "upsert", "answer_id"')
+
+        replayed = FAQUpdater(make_engine(), Journal(settings.faq_journal_path))
+
+        assert replayed.replay() == 1
+
+    def test_snapshot_is_loaded_on_restart(self, updater: FAQUpdater) -> None:
+        updater.add(FAQEntry(questions=["Q2", "Q2b"], answer="A2"))
+        updater.delete(0)
+
+        updater.snapshot()
+
+        assert Path(settings.faq_journal_path).stat().st_size == 0
+        restarted = restart()
+
+        assert restarted.is_ready
+        assert restarted.answers == [None, "A1", "A2"]
+        assert restarted.index is not None and restarted.index.ntotal == 3
+        assert restarted._search_sync("Q2b") == "A2"
+        assert restarted._search_sync("Q1") == "A1"
+
+    def test_crash_during_snapshot_keeps_previous_snapshot(
+        self, updater: FAQUpdater
+    ) -> None:
+        updater.add(FAQEntry(question="Q2", answer="A2"))
+        updater.snapshot()
+        updater.delete(0)
+        updater.update(1, FAQEntry(question="Q1 v2", answer="A1 v2"))
+
+        with (
+            # After the index file is written, before the rest
+            patch("faq_updates._save_npy", side_effect=OSError("disk full")),
+            pytest.raises(OSError),
+        ):
+            updater.snapshot()
+        updater.journal.close()
+        restarted = restart()
+
+        # Previous snapshot plus the replayed journal
+        assert restarted.answers == [None, "A1 v2", "A2"]
+        assert restarted._search_sync("Q1 v2") == "A1 v2"
+        assert restarted._search_sync("Q2") == "A2"
+
+    def test_snapshot_removes_previous_snapshot_files(
+        self, updater: FAQUpdater, artifacts: Path
+    ) -> None:
+        updater.add(FAQEntry(question="Q2", answer="A2"))
+        updater.snapshot()
+        assert updater.engine.manifest is not None
+        first = updater.engine.manifest
+
+        updater.delete(0)
+        updater.snapshot()
+
+        second = updater.engine.manifest
+        assert first.index_path and second.index_path
+        assert not Path(first.index_path).exists()
+        assert not Path(str(first.answers_path)).exists()
+        assert Path(second.index_path).exists()
+        assert Path(str(second.answers_path)).exists()
+
+    def test_version_counts_changes_since_snapshot(self, updater: FAQUpdater) -> None:
+        updater.engine.updater = updater
+        updater.snapshot()
+        assert updater.engine.manifest is not None
+        build_id = updater.engine.manifest.build_id
+        assert updater.engine.version == build_id
+
+        updater.add(FAQEntry(question="Q2", answer="A2"))
+        updater.delete(0)
+        assert updater.engine.version == f"{build_id}+2"
+
+        updater.snapshot()
+        assert updater.engine.version == updater.engine.manifest.build_id
+        assert updater.engine.version != build_id
+
+
+class TestRWLock:
+    def test_writer_waits_for_readers(self) -> None:
+        lock = RWLock()
+        events: list[str] = []
+
+        def write() -> None:
+            with lock.write():
+                events.append("write")
+
+        with lock.read():
+            writer = threading.Thread(target=write)
+            writer.start()
+            time.sleep(0.05)
+            events.append("read done")
+        writer.join()
+
+        assert events == ["read done", "write"]
@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import httpx
+import pytest
+
+from loadgen import (
+    LatencyHistogram,
+    LoadResult,
+    evaluate_slos,
+    load_questions,
+    run_load,
+)
+
+
+class TestLatencyHistogram:
+    def test_percentiles_within_relative_precision(self) -> None:
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.record(ms / 1000)
+
+        assert histogram.count == 1000
+        assert histogram.percentile(50) == pytest.approx(0.5, rel=0.02)
+        assert histogram.percentile(99) == pytest.approx(0.99, rel=0.02)
+        assert histogram.percentile(100) == pytest.approx(1.0)
+
+    def test_empty_histogram_reports_zero(self) -> None:
+        histogram = LatencyHistogram()
+
+        assert histogram.percentile(99) == 0.0
+        assert histogram.mean == 0.0
+
+
+class TestSLOEvaluation:
+    def test_slo_met_and_missed(self) -> None:
+        result = LoadResult(target_rate=10)
+        for _ in range(98):
+            result.latency.record(0.010)
+        for _ in range(2):
+            result.latency.record(0.500)
+
+        p50, p99 = evaluate_slos(result, p50_ms=20, p99_ms=100)
+
+        assert p50.met is True
+        assert p99.met is False
+
+    def test_unset_slos_are_skipped(self) -> None:
+        assert evaluate_slos(LoadResult(target_rate=1), None, None) == []
+
+
+class TestLoadQuestions:
+    def test_reads_faq_json(self, tmp_path: Path) -> None:
+        path = tmp_path / "faq.json"
+        path.write_text('[{"question": "Q1", "answer": "A1"}, "Q2"]')
+
+        assert load_questions(str(path)) == ["Q1", "Q2"]
+
+    def test_reads_question_variants(self, tmp_path: Path) -> None:
+        path = tmp_path / "faq.json"
+        path.write_text('[{"questions": ["Q1", "Q1b"], "answer": "A1"}]')
+
+        assert load_questions(str(path)) == ["Q1", "Q1b"]
+
+    def test_reads_text_lines(self, tmp_path: Path) -> None:
+        path = tmp_path / "questions.txt"
+        path.write_text("Q1\n\nQ2\n")
+
+        assert load_questions(str(path)) == ["Q1", "Q2"]
+
+
+class TestRunLoad:
+    @pytest.mark.asyncio
+    async def test_counts_statuses_at_fixed_rate(self) -> None:
+        calls = 0
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal calls
+            calls += 1
+            if calls % 4 == 0:
+                return httpx.Response(429)
+            if calls % 5 == 0:
+                return httpx.Response(503)
+            return httpx.Response(200, json={})
+
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://test"
+        ) as client:
+            result = await run_load(client, ["Q"], rate=200, duration=0.1)
+
+        assert result.sent == 20
+        assert result.completed == 20
+        assert result.latency.count == 20
+        assert result.status_counts[429] == 5
+        assert result.status_counts[503] == 3
+        assert result.status_rate(429) == 0.25
+        assert result.error_rate == 0.4
@@ -0,0 +1,74 @@
+import json
+import logging
+import queue
+import sys
+
+from logging_config import (
+    DeferredFormatQueueHandler,
+    JSONFormatter,
+    RequestLogSampler,
+)
+
+
+def _record(
+    msg: str = "hello %s", args: tuple[object, ...] = ("world",)
+) -> logging.LogRecord:
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+
+
+class TestJSONFormatter:
+    def test_includes_message_and_extra_fields(self) -> None:
+        record = _record()
+        record.status_code = 200
+
+        entry = json.loads(JSONFormatter().format(record))
+
+        assert entry["message"] == "hello world"
+        assert entry["status_code"] == 200
+        assert entry["level"] == "INFO"
+        assert entry["timestamp"].endswith("Z")
+        assert "msg" not in entry and "args" not in entry
+
+    def test_includes_exception(self) -> None:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.LogRecord(
+                "test", logging.ERROR, __file__, 1, "failed", (), sys.exc_info()
+            )
+
+        entry = json.loads(JSONFormatter().format(record))
+
+        assert "ValueError: boom" in entry["exception"]
+
+
+class TestDeferredFormatQueueHandler:
+    def test_resolves_args_but_keeps_exc_info(self) -> None:
+        log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        handler = DeferredFormatQueueHandler(log_queue)
+        try:
+            raise RuntimeError("later")
+        except RuntimeError:
+            record = _record()
+            record.exc_info = sys.exc_info()
+
+        handler.emit(record)
+        queued = log_queue.get_nowait()
+
+        assert queued.msg == "hello world"
+        assert queued.args == ()
+        assert queued.exc_info is not None
+
+
+class TestRequestLogSampler:
+    def test_errors_are_always_logged(self) -> None:
+        sampler = RequestLogSampler(0.0, {})
+
+        assert sampler.should_log("/chat", 500) is True
+        assert sampler.should_log("/chat", 429) is True
+
+    def test_success_uses_path_rate(self) -> None:
+        sampler = RequestLogSampler(1.0, {"/health": 0.0})
+
+        assert sampler.should_log("/chat", 200) is True
+        assert sampler.should_log("/health", 200) is False
@@ -1,13 +1,24 @@
 # Ensure the API package (apps/api) is on the import path when running tests
 
+import asyncio
+import json
+from collections.abc import Generator
 from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from starlette.types import Message
+from starlette.websockets import WebSocketDisconnect
 
-from exceptions import ModelError
-from main import app, get_chat_service, lifespan
+import main
+from coalescing import SingleFlight
+from engine import SearchResult, SearchWork
+from exceptions import EntryNotFoundError, ModelError
+from main import app, get_chat_service, lifespan, rate_limiter
+from response import ChatCompletionResponse
+from result_cache import LocalCache, TieredCache
+from settings import settings
 
 
 @pytest.fixture
@@ -15,8 +26,14 @@ def mock_engine() -> Mock:
     """Create a mock FAQEngine."""
     engine = Mock()
     engine.is_ready = True
-    engine.asearch = AsyncMock(return_value="Mocked answer")
+    engine.asearch_result = AsyncMock(
+        return_value=SearchResult("Mocked answer", 0, 0.1)
+    )
+    engine.encoded_answers = []
     engine.load_resources = Mock()
+    engine.inflight = SingleFlight()
+    engine.result_cache = None
+    engine.work = SearchWork()
     return engine
 
 
@@ -24,6 +41,7 @@ def mock_engine() -> Mock:
 def test_client(mock_engine: Mock) -> TestClient:
     """Create a test client with mocked engine."""
     app.state.engine = mock_engine
+    rate_limiter.clients.clear()
     return TestClient(app, raise_server_exceptions=False)
 
 
@@ -42,10 +60,22 @@ class TestChatEndpoint:
         assert data["choices"][0]["message"]["content"] == "Mocked answer"
         assert data["choices"][0]["message"]["role"] == "assistant"
 
+    def test_chat_body_matches_response_model_serialization(
+        self, test_client: TestClient
+    ) -> None:
+        response = test_client.post(
+            "/chat",
+            json={"messages": [{"role": "user", "content": "How do I reset?"}]},
+        )
+
+        assert response.headers["content-type"] == "application/json"
+        model = ChatCompletionResponse.model_validate_json(response.content)
+        assert response.content == model.model_dump_json().encode()
+
     def test_chat_returns_null_when_no_match(
         self, test_client: TestClient, mock_engine: Mock
     ) -> None:
-        mock_engine.asearch.return_value = None
+        mock_engine.asearch_result.return_value = SearchResult(None)
 
         response = test_client.post(
             "/chat",
@@ -105,6 +135,170 @@ class TestChatEndpoint:
 
         assert response.status_code == 200
 
+    async def test_chat_cancels_search_when_client_disconnects(
+        self, mock_engine: Mock
+    ) -> None:
+        app.state.engine = mock_engine
+        cancelled = asyncio.Event()
+
+        async def search_forever(question: str) -> SearchResult:
+            try:
+                await asyncio.Event().wait()
+            finally:
+                cancelled.set()
+            return SearchResult("never")
+
+        mock_engine.asearch_result = AsyncMock(side_effect=search_forever)
+        body = b'{"messages": [{"role": "user", "content": "Test"}]}'
+        messages: list[Message] = [
+            {"type": "http.request", "body": body, "more_body": False},
+            {"type": "http.disconnect"},
+        ]
+        sent: list[Message] = []
+
+        async def receive() -> Message:
+            if len(messages) == 1:
+                await asyncio.sleep(0.05)  # The client gives up mid-search
+            return messages.pop(0)
+
+        async def send(message: Message) -> None:
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": "/chat",
+            "raw_path": b"/chat",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 1),
+            "server": ("testserver", 80),
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+
+        assert cancelled.is_set()
+        assert sent[0]["status"] == 499
+
+
+class TestMetricsEndpoint:
+    def test_reports_query_coalescing(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        mock_engine.inflight.calls = 4
+        mock_engine.inflight.coalesced = 3
+
+        data = test_client.get("/metrics").json()
+
+        assert data["status"] == "ok"
+        assert data["search_calls"] == 4
+        assert data["search_coalesced"] == 3
+        assert data["search_coalescing_ratio"] == 0.75
+
+    def test_reports_result_cache_hits_per_tier(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        mock_engine.result_cache = TieredCache([LocalCache(8)])
+        mock_engine.result_cache.stats["local"].hits = 1
+        mock_engine.result_cache.stats["local"].misses = 3
+
+        data = test_client.get("/metrics").json()
+
+        assert data["result_cache_local_hits"] == 1
+        assert data["result_cache_local_misses"] == 3
+        assert data["result_cache_local_hit_ratio"] == 0.25
+
+
+class TestAnswersEndpoint:
+    @pytest.fixture(autouse=True)
+    def versioned(self, mock_engine: Mock) -> None:
+        mock_engine.version = "build1"
+        mock_engine.asearch_result = AsyncMock(
+            return_value=SearchResult("Mocked answer", 3, 0.2)
+        )
+
+    def test_returns_cacheable_answer(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        response = test_client.get("/answers", params={"q": "How do I reset?"})
+
+        assert response.status_code == 200
+        assert response.json() == {"answer_id": 3, "answer": "Mocked answer"}
+        assert response.headers["etag"] == '"build1"'
+        assert response.headers["cache-control"] == settings.answer_cache_control
+
+    def test_unanswered_question_has_no_answer_id(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        mock_engine.asearch_result.return_value = SearchResult(None, 3, 1.5)
+
+        response = test_client.get("/answers", params={"q": "Unrelated"})
+
+        assert response.json() == {"answer_id": None, "answer": None}
+
+    def test_matching_etag_skips_search(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        response = test_client.get(
+            "/answers",
+            params={"q": "How do I reset?"},
+            headers={"if-none-match": 'W/"old", "build1"'},
+        )
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"build1"'
+        mock_engine.asearch_result.assert_not_called()
+
+    def test_stale_etag_gets_fresh_answer(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        response = test_client.get(
+            "/answers", params={"q": "How"}, headers={"if-none-match": '"build0"'}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"build1"'
+
+    def test_not_cached_if_index_changes_during_search(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        async def search(query: str) -> SearchResult:
+            mock_engine.version = "build1+1"
+            return SearchResult("Mocked answer", 3, 0.2)
+
+        mock_engine.asearch_result.side_effect = search
+
+        response = test_client.get("/answers", params={"q": "How"})
+
+        assert response.status_code == 200
+        assert "etag" not in response.headers
+        assert response.headers["cache-control"] == "no-store"
+
+    def test_rejects_missing_query(self, test_client: TestClient) -> None:
+        assert test_client.get("/answers").status_code == 422
+
+    def test_answer_by_id(self, test_client: TestClient, mock_engine: Mock) -> None:
+        mock_engine.answer_for = Mock(return_value="Second answer")
+
+        response = test_client.get("/answers/1")
+
+        assert response.json() == {"answer_id": 1, "answer": "Second answer"}
+        assert response.headers["etag"] == '"build1"'
+
+    def test_unknown_answer_id(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        mock_engine.answer_for = Mock(return_value=None)
+
+        assert test_client.get("/answers/99").status_code == 404
+
 
 class TestExceptionHandlers:
     def test_service_not_ready_returns_503(
@@ -122,7 +316,7 @@ class TestExceptionHandlers:
     def test_model_error_returns_500(
         self, test_client: TestClient, mock_engine: Mock
     ) -> None:
-        mock_engine.asearch.side_effect = ModelError("Model failed")
+        mock_engine.asearch_result.side_effect = ModelError("Model failed")
 
         response = test_client.post(
             "/chat",
@@ -145,6 +339,156 @@ class TestExceptionHandlers:
         assert response.status_code == 400
 
 
+class TestChatWebSocket:
+    def test_session_answers_each_frame(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        with test_client.websocket_connect("/chat/ws") as ws:
+            for question in ("First?", "Second?"):
+                ws.send_json({"messages": [{"role": "user", "content": question}]})
+                data = ws.receive_json()
+
+                assert data["object"] == "chat.completion"
+                assert data["choices"][0]["message"]["content"] == "Mocked answer"
+
+        assert mock_engine.asearch_result.await_count == 2
+
+    def test_errors_are_sent_as_frames(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> None:
+        mock_engine.asearch_result.side_effect = [
+            ModelError("Model failed"),
+            SearchResult("Answer"),
+        ]
+        question = {"messages": [{"role": "user", "content": "Test"}]}
+
+        with test_client.websocket_connect("/chat/ws") as ws:
+            ws.send_text("not json")
+            assert ws.receive_json()["error"]["status"] == 422
+            ws.send_json({"messages": [{"role": "system", "content": "Only"}]})
+            assert ws.receive_json()["error"]["status"] == 400
+            ws.send_json(question)
+            assert ws.receive_json()["error"]["status"] == 500
+            # The session survives errors
+            ws.send_json(question)
+            assert ws.receive_json()["choices"][0]["message"]["content"] == "Answer"
+
+    def test_rate_limit_is_shared_per_client(self, test_client: TestClient) -> None:
+        question = {"messages": [{"role": "user", "content": "Test"}]}
+
+        # The handshake and each message spend the client's HTTP budget
+        with patch.object(rate_limiter, "calls", 3):
+            with test_client.websocket_connect("/chat/ws") as ws:
+                ws.send_json(question)
+                assert "choices" in ws.receive_json()
+            with test_client.websocket_connect("/chat/ws") as ws:
+                ws.send_json(question)
+                assert ws.receive_json()["error"]["status"] == 429
+            with pytest.raises(WebSocketDisconnect) as exc_info:
+                with test_client.websocket_connect("/chat/ws"):
+                    pass
+            assert test_client.get("/health").status_code == 429
+
+        assert exc_info.value.code == 1013
+
+    def test_caps_connections_per_client(self, test_client: TestClient) -> None:
+        with patch.object(main.websocket_connections, "max_connections", 1):
+            with test_client.websocket_connect("/chat/ws"):
+                with pytest.raises(WebSocketDisconnect) as exc_info:
+                    with test_client.websocket_connect("/chat/ws"):
+                        pass
+            with test_client.websocket_connect("/chat/ws") as ws:
+                ws.send_json({"messages": [{"role": "user", "content": "Test"}]})
+                assert "choices" in ws.receive_json()
+
+        assert exc_info.value.code == 1013
+
+    def test_frame_size_is_counted_in_bytes(self, test_client: TestClient) -> None:
+        # 4000 characters, 12000 bytes in UTF-8
+        content = "\u20ac" * 4000
+        frame = {"messages": [{"role": "user", "content": content}]}
+
+        with patch.object(settings, "ws_max_message_bytes", 10000):
+            with test_client.websocket_connect("/chat/ws") as ws:
+                ws.send_text(json.dumps(frame, ensure_ascii=False))
+                assert ws.receive_json()["error"]["status"] == 413
+
+    def test_rejects_foreign_origin(self, test_client: TestClient) -> None:
+        with pytest.raises(WebSocketDisconnect) as exc_info:
+            with test_client.websocket_connect(
+                "/chat/ws", headers={"origin": "https://evil.example"}
+            ):
+                pass
+
+        assert exc_info.value.code == 1008
+
+    def test_accepts_configured_origin(self, test_client: TestClient) -> None:
+        origin = settings.cors_origins[0]
+
+        with test_client.websocket_connect(
+            "/chat/ws", headers={"origin": origin}
+        ) as ws:
+            ws.send_json({"messages": [{"role": "user", "content": "Test"}]})
+            assert "choices" in ws.receive_json()
+
+
+class TestAdminEndpoints:
+    @pytest.fixture
+    def admin_client(
+        self, test_client: TestClient, mock_engine: Mock
+    ) -> Generator[TestClient, None, None]:
+        mock_engine.updater = Mock()
+        mock_engine.updater.add.return_value = 3
+        with patch.object(settings, "admin_token", "secret"):
+            yield test_client
+
+    def test_disabled_without_admin_token(self, test_client: TestClient) -> None:
+        response = test_client.delete("/admin/faq/0")
+
+        assert response.status_code == 404
+
+    def test_rejects_wrong_token(self, admin_client: TestClient) -> None:
+        response = admin_client.delete(
+            "/admin/faq/0", headers={"authorization": "Bearer wrong"}
+        )
+
+        assert response.status_code == 401
+
+    def test_add_entry(self, admin_client: TestClient, mock_engine: Mock) -> None:
+        response = admin_client.post(
+            "/admin/faq",
+            json={"questions": ["Q", "Q2"], "answer": "A"},
+            headers={"authorization": "Bearer secret"},
+        )
+
+        assert response.status_code == 201
+        assert response.json() == {"id": 3}
+        entry = mock_engine.updater.add.call_args.args[0]
+        assert entry.variants == ["Q", "Q2"]
+
+    def test_delete_unknown_entry_returns_404(
+        self, admin_client: TestClient, mock_engine: Mock
+    ) -> None:
+        mock_engine.updater.delete.side_effect = EntryNotFoundError("No entry 9")
+
+        response = admin_client.delete(
+            "/admin/faq/9", headers={"authorization": "Bearer secret"}
+        )
+
+        assert response.status_code == 404
+
+    def test_conflict_when_index_is_not_updatable(
+        self, admin_client: TestClient, mock_engine: Mock
+    ) -> None:
+        mock_engine.updater = None
+
+        response = admin_client.delete(
+            "/admin/faq/0", headers={"authorization": "Bearer secret"}
+        )
+
+        assert response.status_code == 409
+
+
 class TestLifespan:
     @pytest.mark.asyncio
     async def test_lifespan_initializes_engine(self) -> None:
@@ -152,12 +496,31 @@ class TestLifespan:
 
         with patch("main.FAQEngine") as mock_engine_class:
             mock_engine = Mock()
+            mock_engine.aclose = AsyncMock()
             mock_engine_class.return_value = mock_engine
 
             async with lifespan(test_app):
                 assert test_app.state.engine is mock_engine
                 mock_engine.load_resources.assert_called_once()
 
+            mock_engine.aclose.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_lifespan_reuses_preloaded_engine(self) -> None:
+        test_app = FastAPI()
+        preloaded = Mock()
+        preloaded.aclose = AsyncMock()
+
+        with (
+            patch("main.preloaded_engine", preloaded),
+            patch("main.FAQEngine") as mock_engine_class,
+        ):
+            async with lifespan(test_app):
+                assert test_app.state.engine is preloaded
+
+        mock_engine_class.assert_not_called()
+        preloaded.load_resources.assert_not_called()
+
 
 class TestDependencies:
     def test_get_chat_service_returns_service_with_engine(
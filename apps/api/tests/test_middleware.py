@@ -1,8 +1,19 @@
 """Tests for security and rate limiting middleware."""
 
+import asyncio
+import tracemalloc
+
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from pydantic import BaseModel
+from starlette.types import Message, Scope
 
 from main import app
+from middleware import (
+    BodySizeLimitMiddleware,
+    ClientRateLimiter,
+    ConnectionLimiter,
+)
 
 client = TestClient(app)
 
@@ -10,7 +21,7 @@ client = TestClient(app)
 class TestSecurityMiddleware:
     """Test security middleware functionality."""
 
-    def test_security_headers_present(self):
+    def test_security_headers_present(self) -> None:
         """Test that security headers are added to responses."""
         response = client.get("/health")
 
@@ -22,19 +33,19 @@ class TestSecurityMiddleware:
             response.headers.get("Referrer-Policy") == "strict-origin-when-cross-origin"
         )
 
-    def test_health_endpoint_works(self):
+    def test_health_endpoint_works(self) -> None:
         """Test that health endpoint works with middleware."""
         response = client.get("/health")
         assert response.status_code == 200
         assert response.json() == {"status": "healthy"}
 
-    def test_ready_endpoint_works(self):
+    def test_ready_endpoint_works(self) -> None:
         """Test that ready endpoint works with middleware."""
         response = client.get("/ready")
         # Should return 503 since engine isn't loaded in test client
         assert response.status_code in [200, 503]
 
-    def test_metrics_endpoint_works(self):
+    def test_metrics_endpoint_works(self) -> None:
         """Test that metrics endpoint works with middleware."""
         response = client.get("/metrics")
         assert response.status_code == 200
@@ -46,16 +57,166 @@ class TestSecurityMiddleware:
 class TestRateLimitMiddleware:
     """Test rate limiting middleware functionality."""
 
-    def test_rate_limit_not_exceeded(self):
+    def test_rate_limit_not_exceeded(self) -> None:
         """Test that normal usage doesn't trigger rate limiting."""
         # Make a few requests within the limit
         for _ in range(5):
             response = client.get("/health")
             assert response.status_code == 200
 
-    def test_different_endpoints_work(self):
+    def test_different_endpoints_work(self) -> None:
         """Test that different endpoints work with rate limiting."""
         endpoints = ["/health", "/metrics"]
         for endpoint in endpoints:
             response = client.get(endpoint)
             assert response.status_code == 200
+
+
+class TestClientRateLimiter:
+    """Test the per-client sliding window."""
+
+    def test_blocks_over_limit_within_period(self) -> None:
+        limiter = ClientRateLimiter(calls=2, period=60)
+
+        assert limiter.allow("a", now=0.0)
+        assert limiter.allow("a", now=1.0)
+        assert not limiter.allow("a", now=2.0)
+        assert limiter.allow("b", now=2.0)
+
+    def test_allows_again_after_period(self) -> None:
+        limiter = ClientRateLimiter(calls=1, period=60)
+
+        assert limiter.allow("a", now=0.0)
+        assert not limiter.allow("a", now=30.0)
+        assert limiter.allow("a", now=61.0)
+
+
+class TestConnectionLimiter:
+    def test_caps_open_connections_per_client(self) -> None:
+        limiter = ConnectionLimiter(max_connections=1)
+
+        assert limiter.acquire("a")
+        assert not limiter.acquire("a")
+        assert limiter.acquire("b")
+        limiter.release("a")
+        assert limiter.acquire("a")
+
+
+class Payload(BaseModel):
+    text: str
+
+
+def limited_app(max_bytes: int) -> BodySizeLimitMiddleware:
+    inner = FastAPI()
+
+    @inner.post("/echo")
+    async def echo(payload: Payload) -> dict[str, int]:
+        return {"length": len(payload.text)}
+
+    return BodySizeLimitMiddleware(inner, max_bytes=max_bytes)
+
+
+async def post_chunks(
+    app: BodySizeLimitMiddleware,
+    chunk: bytes,
+    chunks: int,
+    content_length: int | None = None,
+) -> tuple[int, int]:
+    """POST ``chunks`` copies of ``chunk``; returns (status, chunks read)."""
+    headers = [(b"content-type", b"application/json")]
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    scope: Scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/echo",
+        "raw_path": b"/echo",
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 1),
+        "server": ("test", 80),
+    }
+    read = 0
+    status = 0
+
+    async def receive() -> Message:
+        nonlocal read
+        if read >= chunks:
+            await asyncio.Event().wait()  # Connected, nothing more to send
+        read += 1
+        return {"type": "http.request", "body": chunk, "more_body": read < chunks}
+
+    async def send(message: Message) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status, read
+
+
+class TestBodySizeLimitMiddleware:
+    """Request bodies are limited while they are received."""
+
+    def test_small_body_passes(self) -> None:
+        client = TestClient(limited_app(max_bytes=100))
+
+        response = client.post("/echo", json={"text": "hello"})
+
+        assert response.status_code == 200
+        assert response.json() == {"length": 5}
+
+    def test_declared_oversize_is_rejected_unread(self) -> None:
+        status, read = asyncio.run(
+            post_chunks(limited_app(100), b"x" * 50, chunks=4, content_length=200)
+        )
+
+        assert status == 413
+        assert read == 0
+
+    def test_chunked_body_is_cut_off_at_limit(self) -> None:
+        status, read = asyncio.run(post_chunks(limited_app(100), b"x" * 40, chunks=50))
+
+        assert status == 413
+        assert read == 3  # 120 bytes: the first read past the limit
+
+    def test_invalid_content_length(self) -> None:
+        status, _ = asyncio.run(
+            post_chunks(limited_app(100), b"{}", chunks=1, content_length=-1)
+        )
+
+        assert status == 400
+
+    def test_main_app_rejects_oversized_chat(self) -> None:
+        big = "x" * (256 * 1024)
+
+        response = client.post(
+            "/chat", json={"messages": [{"role": "user", "content": big}]}
+        )
+
+        assert response.status_code == 413
+        assert response.headers.get("X-Content-Type-Options") == "nosniff"
+
+    def test_flood_of_large_bodies_stays_flat(self) -> None:
+        """Each 16 MB body costs a few 64 KB reads, not 16 MB of buffering."""
+        app = limited_app(max_bytes=256 * 1024)
+        chunk = b"x" * 65536
+        per_body = 256  # 16 MB
+
+        async def flood() -> list[tuple[int, int]]:
+            return [await post_chunks(app, chunk, per_body) for _ in range(200)]
+
+        tracemalloc.start()
+        try:
+            results = asyncio.run(flood())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert {status for status, _ in results} == {413}
+        assert max(read for _, read in results) == 5
+        assert peak < 2 * 1024 * 1024
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+from middleware import ProfilingMiddleware
+
+
+def _busy_wait(seconds: float) -> None:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+TOKEN = "secret"
+
+
+def _make_app(
+    output_dir: Path, sample_rate: float = 0.0, max_profiles: int = 100
+) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(
+        ProfilingMiddleware,
+        output_dir=str(output_dir),
+        sample_rate=sample_rate,
+        header_token=TOKEN,
+        interval=0.001,
+        max_profiles=max_profiles,
+    )
+
+    @app.get("/work")
+    async def work() -> dict[str, str]:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, profiling.bind_to_session(_busy_wait), 0.05)
+        return {"status": "ok"}
+
+    return app
+
+
+def _wait_for(path: Path) -> None:
+    deadline = time.monotonic() + 2
+    while not path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+class TestProfileSession:
+    def test_samples_attached_executor_thread(self, tmp_path: Path) -> None:
+        session = profiling.ProfileSession("unit", str(tmp_path))
+        token = profiling.activate(session)
+        session.start()
+        try:
+            bound = profiling.bind_to_session(_busy_wait)
+            worker = threading.Thread(target=bound, args=(0.05,))
+            worker.start()
+            worker.join()
+        finally:
+            session.stop()
+            profiling.deactivate(token)
+        session.join()
+
+        assert any("_busy_wait" in stack for stack in session.samples)
+        folded = (tmp_path / "unit.folded").read_text()
+        assert "_busy_wait" in folded
+        assert (tmp_path / "unit.svg").read_text().startswith("<svg")
+
+    def test_bind_without_session_returns_function(self) -> None:
+        assert profiling.bind_to_session(_busy_wait) is _busy_wait
+
+    def test_render_flamegraph_escapes_names(self) -> None:
+        svg = profiling.render_flamegraph(Counter({"main;<lambda> (x.py:1)": 3}), "t")
+
+        assert "&lt;lambda&gt;" in svg
+        assert "3 samples" in svg
+
+    def test_prune_keeps_newest_profiles(self, tmp_path: Path) -> None:
+        for i in range(5):
+            for suffix in (".folded", ".svg"):
+                path = tmp_path / f"p{i}{suffix}"
+                path.write_text("")
+                os.utime(path, (i, i))
+
+        profiling.prune_profiles(tmp_path, keep=2)
+
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "p3.folded",
+            "p3.svg",
+            "p4.folded",
+            "p4.svg",
+        ]
+
+
+class TestProfilingMiddleware:
+    def test_header_triggers_profile(self, tmp_path: Path) -> None:
+        client = TestClient(_make_app(tmp_path))
+
+        response = client.get(
+            "/work", headers={"x-profile": "1", "authorization": f"Bearer {TOKEN}"}
+        )
+
+        assert response.status_code == 200
+        name = response.headers["X-Profile-Id"]
+        folded = tmp_path / f"{name}.folded"
+        _wait_for(folded)
+        _wait_for(tmp_path / f"{name}.svg")
+        assert "_busy_wait" in folded.read_text()
+
+    def test_header_without_token_is_ignored(self, tmp_path: Path) -> None:
+        client = TestClient(_make_app(tmp_path))
+
+        for headers in (
+            {"x-profile": "1"},
+            {"x-profile": "1", "authorization": "Bearer wrong"},
+        ):
+            response = client.get("/work", headers=headers)
+
+            assert response.status_code == 200
+            assert "X-Profile-Id" not in response.headers
+        assert not any(tmp_path.iterdir())
+
+    def test_header_ignored_when_no_token_configured(self, tmp_path: Path) -> None:
+        app = FastAPI()
+        app.add_middleware(ProfilingMiddleware, output_dir=str(tmp_path))
+
+        @app.get("/")
+        async def root() -> dict[str, str]:
+            return {"status": "ok"}
+
+        response = TestClient(app).get(
+            "/", headers={"x-profile": "1", "authorization": "Bearer "}
+        )
+
+        assert "X-Profile-Id" not in response.headers
+
+    def test_unselected_request_is_not_profiled(self, tmp_path: Path) -> None:
+        client = TestClient(_make_app(tmp_path))
+
+        response = client.get("/work")
+
+        assert response.status_code == 200
+        assert "X-Profile-Id" not in response.headers
+        assert not any(tmp_path.iterdir())
+
+    def test_sampling_rate_one_profiles_every_request(self, tmp_path: Path) -> None:
+        client = TestClient(_make_app(tmp_path, sample_rate=1.0))
+
+        response = client.get("/work")
+
+        assert "X-Profile-Id" in response.headers
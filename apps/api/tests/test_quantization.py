@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from quantization import (
+    binarize,
+    build_index,
+    read_index,
+    search_with_rerank,
+    write_index,
+)
+
+
+@pytest.fixture
+def vectors() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    data = rng.normal(size=(500, 32)).astype(np.float32)
+    normalized: np.ndarray = data / np.linalg.norm(data, axis=1, keepdims=True)
+    return normalized
+
+
+class TestQuantizedSearch:
+    @pytest.mark.parametrize("index_type", ["sq8", "sq4", "binary"])
+    def test_rerank_returns_exact_distances(
+        self, vectors: np.ndarray, index_type: str
+    ) -> None:
+        index = build_index(vectors, index_type)  # type: ignore[arg-type]
+        queries = vectors[:20] + 0.01
+
+        distances, ids = search_with_rerank(index, vectors, queries, k=1, candidates=50)
+
+        assert ids[:, 0].tolist() == list(range(20))
+        exact = ((vectors[:20] - queries) ** 2).sum(axis=1)
+        np.testing.assert_allclose(distances[:, 0], exact, rtol=1e-4)
+
+    def test_rerank_reads_memory_mapped_vectors(
+        self, vectors: np.ndarray, tmp_path: Path
+    ) -> None:
+        path = tmp_path / "vectors.npy"
+        np.save(path, vectors)
+        mapped = np.load(path, mmap_mode="r")
+        index = build_index(vectors, "sq8")
+
+        _, ids = search_with_rerank(index, mapped, vectors[:5], k=3, candidates=10)
+
+        assert ids[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+    def test_missing_candidates_are_padded(self, vectors: np.ndarray) -> None:
+        index = build_index(vectors[:2], "sq8")
+
+        distances, ids = search_with_rerank(
+            index, vectors[:2], vectors[:1], k=4, candidates=4
+        )
+
+        assert ids[0, 2:].tolist() == [-1, -1]
+        assert np.isinf(distances[0, 2:]).all()
+
+    @pytest.mark.parametrize("index_type", ["flat", "sq4", "binary"])
+    def test_write_and_read_round_trip(
+        self, vectors: np.ndarray, tmp_path: Path, index_type: str
+    ) -> None:
+        path = str(tmp_path / "index.faiss")
+        write_index(build_index(vectors, index_type), path)  # type: ignore[arg-type]
+
+        assert read_index(path, index_type).ntotal == len(vectors)  # type: ignore[arg-type]
+
+    def test_binary_requires_byte_aligned_dimension(self) -> None:
+        with pytest.raises(ValueError, match="divisible by 8"):
+            build_index(np.ones((4, 12), dtype=np.float32), "binary")
+
+    def test_binarize_packs_sign_bits(self) -> None:
+        codes = binarize(np.array([[1, -1, 1, -1, 1, 1, 1, 1]], dtype=np.float32))
+
+        assert codes.tolist() == [[0b10101111]]
@@ -0,0 +1,111 @@
+import asyncio
+import math
+from pathlib import Path
+
+from engine import SearchResult
+from query_capture import QueryCapture, read_captures, worker_capture_path
+
+
+def record_n(capture: QueryCapture, n: int, start: float = 0.0) -> None:
+    for i in range(n):
+        capture.record(f"question {i}", SearchResult("A", 1, 0.25), start + i, 0.002)
+
+
+class TestQueryCapture:
+    async def test_writes_queued_queries(self, tmp_path: Path) -> None:
+        capture = QueryCapture(str(tmp_path / "captures" / "queries.jsonl"))
+        writer = capture.run()
+        capture.record("Q", SearchResult("A", 3, 0.25), 100.0, 0.002, "build-1")
+        capture.record("Q2", SearchResult(None), 101.0, 0.001)
+        capture.stop()
+        await writer
+
+        first, second = read_captures([str(capture.path)])
+        assert first.query == "Q" and first.answered and first.answer_id == 3
+        assert first.latency_ms == 2.0 and first.build_id == "build-1"
+        assert not second.answered
+        assert second.answer_id == -1 and second.distance is None
+
+    async def test_static_stage_distance_has_its_own_field(
+        self, tmp_path: Path
+    ) -> None:
+        capture = QueryCapture(str(tmp_path / "queries.jsonl"))
+        writer = capture.run()
+        capture.record("Q", SearchResult("A", 3, 0.25), 100.0, 0.002)
+        capture.record("Q2", SearchResult("A", 3, 0.75, static=True), 101.0, 0.001)
+        capture.stop()
+        await writer
+
+        model, static = read_captures([str(capture.path)])
+        assert model.distance == 0.25 and model.static_distance is None
+        assert static.distance is None and static.static_distance == 0.75
+
+    async def test_sampling(self, tmp_path: Path) -> None:
+        capture = QueryCapture(str(tmp_path / "queries.jsonl"), sample_rate=0.0)
+        record_n(capture, 10)
+        capture.stop()
+        await capture.run()
+
+        assert not capture.path.exists()
+
+    def test_drops_when_writer_falls_behind(self, tmp_path: Path) -> None:
+        capture = QueryCapture(str(tmp_path / "queries.jsonl"), max_queue=3)
+
+        record_n(capture, 5)
+
+        assert capture.dropped == 2
+
+    async def test_rotation_bounds_disk_use(self, tmp_path: Path) -> None:
+        path = tmp_path / "queries.jsonl"
+        capture = QueryCapture(str(path), max_bytes=1000, backups=2)
+        for batch in range(10):
+            record_n(capture, 5, start=batch * 5)
+            capture.stop()
+            await capture.run()
+
+        files = sorted(tmp_path.iterdir())
+        assert [f.name for f in files] == [
+            "queries.jsonl",
+            "queries.jsonl.1",
+            "queries.jsonl.2",
+        ]
+        assert all(f.stat().st_size <= 1000 for f in files)
+        records = read_captures([str(f) for f in files])
+        # Newest records survive, oldest first
+        assert records[-1].timestamp == 49
+        assert records == sorted(records, key=lambda r: r.timestamp)
+        assert all(not math.isnan(r.latency_ms) for r in records)
+
+    async def test_workers_write_and_rotate_their_own_files(
+        self, tmp_path: Path
+    ) -> None:
+        base = str(tmp_path / "queries.jsonl")
+        captures = [
+            QueryCapture(worker_capture_path(base, i), max_bytes=1000, backups=20)
+            for i in range(2)
+        ]
+
+        async def write(worker: int, capture: QueryCapture) -> None:
+            for batch in range(10):
+                for i in range(5):
+                    result = SearchResult("A", worker, 0.25)
+                    capture.record(f"w{worker} q{batch * 5 + i}", result, 0.0, 0.002)
+                capture.stop()
+                await capture.run()
+
+        await asyncio.gather(*(write(i, c) for i, c in enumerate(captures)))
+
+        names = {f.name for f in tmp_path.iterdir()}
+        assert "queries.worker0.jsonl.1" in names
+        assert "queries.worker1.jsonl.1" in names
+        records = read_captures([str(f) for f in tmp_path.iterdir()])
+        for worker in range(2):
+            queries = {r.query for r in records if r.answer_id == worker}
+            assert queries == {f"w{worker} q{i}" for i in range(50)}
+        assert len(records) == 100
+
+    def test_worker_capture_path(self) -> None:
+        path = "captures/queries.jsonl"
+
+        assert worker_capture_path(path, None) == path
+        assert worker_capture_path(path, 3) == "captures/queries.worker3.jsonl"
@@ -0,0 +1,106 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from faq import FAQEntry, flatten
+from index_manifest import IndexManifest, compute_build_id, load_manifest, save_manifest
+from reduction import apply_reduction, fit_reduction
+
+
+@pytest.fixture
+def embeddings() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    # Most variance in the first 4 dimensions
+    data = rng.normal(size=(200, 16)).astype(np.float32)
+    data[:, 4:] *= 0.01
+    return data
+
+
+class TestFitReduction:
+    def test_pca_reduces_dimension(self, embeddings: np.ndarray) -> None:
+        transform = fit_reduction(embeddings, "pca", 4)
+
+        reduced = apply_reduction(transform, embeddings, normalize=False)
+
+        assert reduced.shape == (200, 4)
+        # Almost all variance is kept, so pairwise distances barely change
+        full = np.linalg.norm(embeddings[0] - embeddings[1])
+        assert np.linalg.norm(reduced[0] - reduced[1]) == pytest.approx(full, rel=0.05)
+
+    def test_truncate_keeps_leading_dimensions(self, embeddings: np.ndarray) -> None:
+        transform = fit_reduction(embeddings, "truncate", 4)
+
+        reduced = apply_reduction(transform, embeddings, normalize=True)
+
+        expected = embeddings[:, :4] / np.linalg.norm(
+            embeddings[:, :4], axis=1, keepdims=True
+        )
+        np.testing.assert_allclose(reduced, expected, rtol=1e-5)
+
+    def test_pca_needs_enough_vectors(self, embeddings: np.ndarray) -> None:
+        with pytest.raises(ValueError, match="at least"):
+            fit_reduction(embeddings[:3], "pca", 4)
+
+    def test_rejects_invalid_dimension(self, embeddings: np.ndarray) -> None:
+        with pytest.raises(ValueError, match="Reduced dimension"):
+            fit_reduction(embeddings, "truncate", 16)
+
+
+class TestIndexManifest:
+    def test_round_trip(self, tmp_path: Path) -> None:
+        path = str(tmp_path / "index.json")
+        manifest = IndexManifest(
+            build_id="abc",
+            model_name="m",
+            model_dimension=384,
+            dimension=128,
+            reduction="pca",
+            transform_path="index.transform",
+        )
+
+        save_manifest(manifest, path)
+
+        assert load_manifest(path) == manifest
+
+    def test_missing_manifest_returns_none(self, tmp_path: Path) -> None:
+        assert load_manifest(str(tmp_path / "missing.json")) is None
+
+    def test_build_id_is_content_hash(self, embeddings: np.ndarray) -> None:
+        answer_ids = np.zeros(len(embeddings), dtype=np.int32)
+        first = compute_build_id(embeddings, answer_ids, ["a"])
+
+        assert first == compute_build_id(embeddings.copy(), answer_ids, ["a"])
+        assert first != compute_build_id(embeddings, answer_ids, ["b"])
+
+    def test_build_id_covers_variant_grouping(self, embeddings: np.ndarray) -> None:
+        # [{q1, q2} -> A, {q3} -> B] against [{q1} -> A, {q2, q3} -> B]
+        _, first_ids, first_answers = flatten(
+            [
+                FAQEntry(questions=["q1", "q2"], answer="A"),
+                FAQEntry(questions=["q3"], answer="B"),
+            ]
+        )
+        _, second_ids, second_answers = flatten(
+            [
+                FAQEntry(questions=["q1"], answer="A"),
+                FAQEntry(questions=["q2", "q3"], answer="B"),
+            ]
+        )
+        vectors = embeddings[:3]
+
+        assert first_answers == second_answers
+        assert compute_build_id(vectors, first_ids, first_answers) != (
+            compute_build_id(vectors, second_ids, second_answers)
+        )
+
+    def test_build_id_covers_answer_boundaries(self, embeddings: np.ndarray) -> None:
+        answer_ids = np.array([0, 1], dtype=np.int32)
+        vectors = embeddings[:2]
+
+        assert compute_build_id(vectors, answer_ids, ["ab", "c"]) != (
+            compute_build_id(vectors, answer_ids, ["a", "bc"])
+        )
+        assert compute_build_id(vectors, answer_ids, ["", None]) != (
+            compute_build_id(vectors, answer_ids, [None, ""])
+        )
@@ -0,0 +1,116 @@
+import asyncio
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from query_capture import CapturedQuery
+from replay import (
+    ReplayResult,
+    diff_answers,
+    format_report,
+    http_asker,
+    load_engine,
+    replay,
+)
+from settings import settings
+
+
+def captured(*queries: str) -> list[CapturedQuery]:
+    return [
+        CapturedQuery(
+            timestamp=1000.0 + i * 0.01,
+            query=query,
+            answered=True,
+            answer_id=i,
+            distance=0.2,
+            latency_ms=3.0,
+        )
+        for i, query in enumerate(queries)
+    ]
+
+
+class TestReplay:
+    @pytest.mark.parametrize("speed", [0.0, 1.0])
+    async def test_collects_answers_in_capture_order(self, speed: float) -> None:
+        records = captured("a", "b", "fail")
+
+        async def ask(query: str) -> str | None:
+            await asyncio.sleep(0)
+            if query == "fail":
+                raise RuntimeError("boom")
+            return query.upper()
+
+        result = await replay("target", ask, records, speed)
+
+        assert result.answers == ["A", "B", None]
+        assert result.failed == {2}
+        assert result.latency.count == 3
+
+    async def test_keeps_captured_pace(self) -> None:
+        records = captured("a", "b", "c")  # 10 ms apart
+
+        async def ask(query: str) -> str | None:
+            return query
+
+        paced = await replay("target", ask, records, speed=1.0)
+        fast = await replay("target", ask, records, speed=100.0)
+
+        assert paced.duration >= 0.02
+        assert fast.duration < paced.duration
+
+    def test_diff_answers_skips_failures(self) -> None:
+        records = captured("same", "changed", "new", "lost", "failed")
+        baseline = ReplayResult("v1", ["A", "B", None, "D", "E"])
+        candidate = ReplayResult("v2", ["A", "B2", "C", None, None], failed={4})
+
+        diffs = diff_answers(records, baseline, candidate)
+
+        assert [(d.query, d.kind) for d in diffs] == [
+            ("changed", "changed answer"),
+            ("new", "new answer"),
+            ("lost", "lost answer"),
+        ]
+        report = format_report(records, [baseline, candidate], diffs)
+        assert "Answer diffs: 3 (60.00%)" in report
+        assert "v2: 3 answered, 1 errors" in report
+
+
+class TestHTTPAsker:
+    @pytest.mark.parametrize("spread", [False, True])
+    async def test_spoofs_client_ips_only_when_asked(self, spread: bool) -> None:
+        forwarded: list[str | None] = []
+
+        def handle(request: httpx.Request) -> httpx.Response:
+            forwarded.append(request.headers.get("x-forwarded-for"))
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": "Answer"}}]}
+            )
+
+        transport = httpx.MockTransport(handle)
+        async with httpx.AsyncClient(transport=transport, base_url="http://a") as c:
+            assert await http_asker(c, spread)("question") == "Answer"
+
+        assert (forwarded[0] is not None) == spread
+
+
+class TestLoadEngine:
+    def test_loads_artifacts_from_directory(self, tmp_path: Path) -> None:
+        seen = {}
+
+        class FakeEngine:
+            is_ready = True
+
+            def load_resources(self) -> None:
+                seen["cwd"] = os.getcwd()
+                seen["model"] = settings.model_name
+
+        model_before = settings.model_name
+        with patch("replay.FAQEngine", FakeEngine):
+            load_engine(str(tmp_path), "other-model")
+
+        assert seen == {"cwd": str(tmp_path), "model": "other-model"}
+        assert settings.model_name == model_before
+        assert os.getcwd() != str(tmp_path)
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from response import (
+    ChatCompletionResponse,
+    build_chat_completion_response,
+    encode_content,
+    new_completion_id,
+    render_chat_completion,
+)
+
+CONTENTS = [
+    None,
+    "",
+    "Returns within 30 days.",
+    'Quotes " and backslashes \\ and\nnewlines\ttabs',
+    "Unicode: héllo, 日本語, emoji 🎉, separators   ",
+    "Control characters: \x00\x01\x1f\x7f",
+    "</script><!-- html-ish -->",
+]
+
+
+class TestRenderChatCompletion:
+    @pytest.mark.parametrize("content", CONTENTS)
+    def test_bytes_match_pydantic_serialization(self, content: str | None) -> None:
+        raw = render_chat_completion(encode_content(content))
+        parsed = json.loads(raw)
+
+        expected = build_chat_completion_response(content=content)
+        expected.id = parsed["id"]
+        expected.created = parsed["created"]
+
+        assert raw == expected.model_dump_json().encode()
+
+    def test_output_validates_against_schema(self) -> None:
+        raw = render_chat_completion(encode_content("Answer"))
+
+        response = ChatCompletionResponse.model_validate_json(raw)
+
+        assert response.choices[0].message.content == "Answer"
+        assert response.object == "chat.completion"
+        assert response.id.startswith("chatcmpl-")
+
+
+class TestCompletionId:
+    def test_format_and_uniqueness(self) -> None:
+        ids = {new_completion_id() for _ in range(1000)}
+
+        assert len(ids) == 1000
+        assert all(len(i) == len("chatcmpl-") + 12 for i in ids)
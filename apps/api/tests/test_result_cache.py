@@ -0,0 +1,191 @@
+import asyncio
+import os
+from collections.abc import AsyncIterator
+
+import pytest
+
+from result_cache import (
+    SLOT,
+    LocalCache,
+    RedisCache,
+    SharedMemoryCache,
+    TieredCache,
+    cache_key,
+)
+
+
+async def read_command(reader: asyncio.StreamReader) -> list[bytes]:
+    """One command, sent by the client as an array of bulk strings."""
+    line = await reader.readuntil(b"\r\n")
+    assert line[:1] == b"*"
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readuntil(b"\r\n"))[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+class StandInRedis:
+    """In-memory server for the commands RedisCache sends, replying in RESP3."""
+
+    def __init__(self) -> None:
+        self.data: dict[bytes, bytes] = {}
+        self.commands: list[list[bytes]] = []
+        self.delay = 0.0
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                command = await read_command(reader)
+                self.commands.append(command)
+                await asyncio.sleep(self.delay)
+                name = command[0].upper()
+                if name == b"GET" and command[1] in self.data:
+                    value = self.data[command[1]]
+                    reply = b"$%d\r\n%s\r\n" % (len(value), value)
+                elif name == b"GET":
+                    reply = b"_\r\n"
+                elif name == b"SET":
+                    self.data[command[1]] = command[2]
+                    reply = b"+OK\r\n"
+                elif name == b"HELLO":
+                    reply = b"%1\r\n+proto\r\n:3\r\n"
+                else:  # SELECT, CLIENT SETINFO
+                    reply = b"+OK\r\n"
+                writer.write(reply)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+@pytest.fixture
+async def redis_server() -> AsyncIterator[tuple[StandInRedis, str]]:
+    stand_in = StandInRedis()
+    server = await asyncio.start_server(stand_in.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield stand_in, f"redis://127.0.0.1:{port}/2"
+    server.close()
+
+
+KEY = cache_key("build1", "how do i reset")
+
+
+def test_cache_key_depends_on_version() -> None:
+    assert cache_key("build1", "q") == cache_key("build1", "q")
+    assert cache_key("build1", "q") != cache_key("build1+1", "q")
+    assert len(KEY) == 16
+
+
+class TestLocalCache:
+    async def test_evicts_least_recently_used(self) -> None:
+        cache = LocalCache(max_entries=2)
+        a, b, c = (cache_key("v", q) for q in "abc")
+        await cache.put(a, (1, 0.1, False))
+        await cache.put(b, (2, 0.2, False))
+        await cache.get(a)
+
+        await cache.put(c, (3, 0.3, False))
+
+        assert await cache.get(a) == (1, 0.1, False)
+        assert await cache.get(b) is None
+
+
+class TestSharedMemoryCache:
+    async def test_round_trip(self) -> None:
+        cache = SharedMemoryCache(slots=64)
+
+        await cache.put(KEY, (7, 0.25, True))
+
+        assert await cache.get(KEY) == (7, 0.25, True)
+        assert await cache.get(cache_key("build2", "how do i reset")) is None
+
+    def test_shared_with_forked_process(self) -> None:
+        cache = SharedMemoryCache(slots=64)
+
+        pid = os.fork()
+        if pid == 0:
+            asyncio.run(cache.put(KEY, (3, 0.5, False)))
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        assert asyncio.run(cache.get(KEY)) == (3, 0.5, False)
+
+    async def test_torn_slot_is_a_miss(self) -> None:
+        cache = SharedMemoryCache(slots=1)
+        await cache.put(KEY, (3, 0.5, False))
+
+        cache.memory[16] ^= 0xFF  # A value byte written without its checksum
+
+        assert await cache.get(KEY) is None
+        assert len(cache.memory) == SLOT.size
+
+
+class TestRedisCache:
+    async def test_round_trip(self, redis_server: tuple[StandInRedis, str]) -> None:
+        stand_in, url = redis_server
+        cache = RedisCache(url, ttl_seconds=60, timeout_seconds=1.0)
+
+        assert await cache.get(KEY) is None
+        await cache.put(KEY, (4, 0.75, False))
+
+        assert await cache.get(KEY) == (4, 0.75, False)
+        assert [b"SELECT", b"2"] in stand_in.commands
+        (set_command,) = (c for c in stand_in.commands if c[0] == b"SET")
+        assert set_command[3:] == [b"EX", b"60"]
+        await cache.aclose()
+
+    async def test_concurrent_commands(
+        self, redis_server: tuple[StandInRedis, str]
+    ) -> None:
+        stand_in, url = redis_server
+        cache = RedisCache(url, ttl_seconds=60, timeout_seconds=1.0)
+        keys = [cache_key("v", str(i)) for i in range(20)]
+        await asyncio.gather(
+            *(cache.put(k, (i, 0.0, False)) for i, k in enumerate(keys))
+        )
+
+        values = await asyncio.gather(*(cache.get(k) for k in keys))
+
+        assert values == [(i, 0.0, False) for i in range(20)]
+        await cache.aclose()
+
+    async def test_slow_server_is_a_miss(
+        self, redis_server: tuple[StandInRedis, str]
+    ) -> None:
+        stand_in, url = redis_server
+        cache = RedisCache(url, ttl_seconds=60, timeout_seconds=0.05)
+        await cache.get(KEY)  # Connected
+        stand_in.delay = 0.5
+
+        assert await cache.get(KEY) is None
+        # Backing off: no more round trips until the retry time
+        sent = len(stand_in.commands)
+        assert await cache.get(KEY) is None
+        assert len(stand_in.commands) == sent
+        await cache.aclose()
+
+    async def test_unreachable_server_is_a_miss(self) -> None:
+        cache = RedisCache("redis://127.0.0.1:1", ttl_seconds=60, timeout_seconds=1.0)
+
+        assert await cache.get(KEY) is None
+        await cache.put(KEY, (1, 0.0, False))
+
+
+class TestTieredCache:
+    async def test_backfills_earlier_tiers_and_counts_per_tier(self) -> None:
+        local, shared = LocalCache(8), SharedMemoryCache(64)
+        cache = TieredCache([local, shared])
+        await shared.put(KEY, (5, 0.5, False))
+
+        assert await cache.get(KEY) == (5, 0.5, False)
+        assert await local.get(KEY) == (5, 0.5, False)
+        assert await cache.get(KEY) == (5, 0.5, False)
+        assert await cache.get(cache_key("v", "other")) is None
+
+        first, second = cache.stats["local"], cache.stats["shared_memory"]
+        assert (first.hits, first.misses) == (1, 2)
+        assert (second.hits, second.misses) == (1, 1)
+        assert first.ratio == pytest.approx(1 / 3)
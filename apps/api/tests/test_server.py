@@ -0,0 +1,37 @@
+import gc
+import socket
+from collections.abc import Generator
+from unittest.mock import patch
+
+import pytest
+
+import main
+import server
+
+
+@pytest.fixture(autouse=True)
+def reset_preload() -> Generator[None, None, None]:
+    yield
+    main.preloaded_engine = None
+    gc.unfreeze()
+
+
+class TestPreloadEngine:
+    def test_loads_once_and_freezes_heap(self) -> None:
+        with patch("server.FAQEngine") as mock_engine_class:
+            engine = server.preload_engine()
+
+        mock_engine_class.return_value.load_resources.assert_called_once()
+        assert main.preloaded_engine is engine
+        assert gc.get_freeze_count() > 0
+
+
+class TestBindSocket:
+    def test_socket_is_listening_and_inheritable(self) -> None:
+        sock = server.bind_socket("127.0.0.1", 0)
+        try:
+            assert sock.get_inheritable()
+            client = socket.create_connection(sock.getsockname())
+            client.close()
+        finally:
+            sock.close()
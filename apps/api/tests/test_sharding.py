@@ -0,0 +1,161 @@
+import base64
+
+import httpx
+import numpy as np
+import pytest
+
+import shard_server
+from exceptions import ModelError
+from sharding import (
+    ShardClient,
+    ShardSearchRequest,
+    ShardSearchResponse,
+    build_shard_index,
+    decode_array,
+    encode_array,
+    merge_results,
+    partition,
+)
+
+
+@pytest.fixture
+def vectors() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(100, 16)).astype(np.float32)
+
+
+def shard_transport(
+    vectors: np.ndarray, num_shards: int, failing: set[int] | None = None
+) -> httpx.MockTransport:
+    """One simulated shard node per host: http://shard{i}."""
+    indexes = [
+        build_shard_index(vectors[ids], ids)
+        for ids in partition(len(vectors), num_shards)
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        shard = int(request.url.host.removeprefix("shard"))
+        if failing and shard in failing:
+            return httpx.Response(503)
+        body = ShardSearchRequest.model_validate_json(request.content)
+        queries = decode_array(body.vectors, np.float32, body.dimension)
+        distances, ids = indexes[shard].search(queries, body.k)
+        response = ShardSearchResponse(
+            distances=encode_array(distances, np.float32),
+            ids=encode_array(ids, np.int64),
+            k=body.k,
+        )
+        return httpx.Response(200, content=response.model_dump_json())
+
+    return httpx.MockTransport(handler)
+
+
+class TestPartition:
+    def test_covers_every_id_once(self) -> None:
+        shards = partition(10, 3)
+
+        assert [len(ids) for ids in shards] == [4, 3, 3]
+        assert np.concatenate(shards).tolist() == list(range(10))
+
+    def test_shard_index_reports_global_ids(self, vectors: np.ndarray) -> None:
+        ids = partition(len(vectors), 4)[2]
+        index = build_shard_index(vectors[ids], ids)
+
+        _, found = index.search(vectors[ids[:3]], 1)
+
+        assert found[:, 0].tolist() == ids[:3].tolist()
+
+
+class TestMergeResults:
+    def test_keeps_global_top_k(self) -> None:
+        a = (np.array([[0.1, 0.5]], np.float32), np.array([[1, 2]]))
+        b = (np.array([[0.2, 0.3]], np.float32), np.array([[7, 8]]))
+
+        distances, ids = merge_results([a, b], k=3)
+
+        assert ids.tolist() == [[1, 7, 8]]
+        np.testing.assert_allclose(distances, [[0.1, 0.2, 0.3]])
+
+    def test_padding_never_wins(self) -> None:
+        a = (np.array([[0.0, 0.0]], np.float32), np.array([[3, -1]]))
+        b = (np.array([[0.4, 0.9]], np.float32), np.array([[5, 6]]))
+
+        _, ids = merge_results([a, b], k=2)
+
+        assert ids.tolist() == [[3, 5]]
+
+
+class TestShardClient:
+    @pytest.mark.asyncio
+    async def test_matches_unsharded_search(self, vectors: np.ndarray) -> None:
+        urls = [f"http://shard{i}" for i in range(3)]
+        client = ShardClient(urls, timeout=1.0, transport=shard_transport(vectors, 3))
+        queries = (vectors[[0, 50, 99]] + 0.01).astype(np.float32)
+
+        distances, ids = await client.search(queries, k=5)
+        await client.aclose()
+
+        exact = build_shard_index(vectors, np.arange(len(vectors)))
+        expected_distances, expected_ids = exact.search(queries, 5)
+        assert ids.tolist() == expected_ids.tolist()
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+    @pytest.mark.asyncio
+    async def test_failed_shard_is_left_out(self, vectors: np.ndarray) -> None:
+        urls = [f"http://shard{i}" for i in range(2)]
+        transport = shard_transport(vectors, 2, failing={0})
+        client = ShardClient(urls, timeout=1.0, transport=transport)
+
+        _, ids = await client.search(vectors[:1], k=3)
+        await client.aclose()
+
+        assert (ids >= 50).all()
+
+    @pytest.mark.asyncio
+    async def test_raises_when_no_shard_answers(self, vectors: np.ndarray) -> None:
+        transport = shard_transport(vectors, 1, failing={0})
+        client = ShardClient(["http://shard0"], timeout=1.0, transport=transport)
+
+        with pytest.raises(ModelError):
+            await client.search(vectors[:1], k=3)
+        await client.aclose()
+
+
+class TestShardServer:
+    @pytest.mark.asyncio
+    async def test_search_endpoint(self, vectors: np.ndarray) -> None:
+        ids = partition(len(vectors), 2)[1]
+        shard_server.app.state.index = build_shard_index(vectors[ids], ids)
+        transport = httpx.ASGITransport(app=shard_server.app)
+        client = ShardClient(["http://shard1"], timeout=1.0, transport=transport)
+
+        _, found = await client.search(vectors[[60, 70]], k=1)
+        await client.aclose()
+
+        assert found[:, 0].tolist() == [60, 70]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        ("dimension", "k", "payload"),
+        [
+            (8, 1, np.zeros((1, 8), np.float32).tobytes()),  # Wrong dimension
+            (16, 0, np.zeros((1, 16), np.float32).tobytes()),
+            (16, 10**6, np.zeros((1, 16), np.float32).tobytes()),
+            (16, 1, b"\0" * 10),  # Not whole float32 rows
+        ],
+    )
+    async def test_rejects_invalid_requests(
+        self, vectors: np.ndarray, dimension: int, k: int, payload: bytes
+    ) -> None:
+        shard_server.app.state.index = build_shard_index(vectors, partition(100, 1)[0])
+        transport = httpx.ASGITransport(app=shard_server.app)
+        body = {
+            "vectors": base64.b64encode(payload).decode(),
+            "dimension": dimension,
+            "k": k,
+        }
+
+        async with httpx.AsyncClient(transport=transport, base_url="http://shard") as c:
+            response = await c.post("/shard/search", json=body)
+
+        assert response.status_code == 422
@@ -0,0 +1,116 @@
+from pathlib import Path
+from typing import Any
+
+import faiss
+import numpy as np
+import pytest
+from sentence_transformers import SentenceTransformer
+from sentence_transformers.models import Pooling, Transformer
+from transformers import BertConfig, BertModel, BertTokenizer
+
+from static_encoder import StaticCascade, StaticEncoder, distill_static_embeddings
+
+
+class FakeTokenizer:
+    """Maps each known word to an id; unknown words are dropped."""
+
+    vocab = {"reset": 0, "password": 1, "refund": 2, "policy": 3}
+
+    def __call__(self, texts: list[str], **kwargs: Any) -> dict[str, list[list[int]]]:
+        return {
+            "input_ids": [
+                [self.vocab[w] for w in t.lower().split() if w in self.vocab]
+                for t in texts
+            ]
+        }
+
+
+@pytest.fixture
+def encoder() -> StaticEncoder:
+    table = np.eye(4, dtype=np.float16)
+    return StaticEncoder(FakeTokenizer(), table)
+
+
+@pytest.fixture
+def cascade(encoder: StaticEncoder) -> StaticCascade:
+    index = faiss.IndexFlatL2(4)
+    index.add(encoder.encode(["reset password", "refund policy"]))
+    return StaticCascade(
+        encoder, index, accept_distance=0.1, min_margin=0.5, reject_distance=0.9
+    )
+
+
+class TestStaticEncoder:
+    def test_mean_of_token_vectors_is_normalized(self, encoder: StaticEncoder) -> None:
+        embeddings = encoder.encode(["reset password"])
+
+        np.testing.assert_allclose(embeddings, [[0.7071, 0.7071, 0, 0]], atol=1e-4)
+
+    def test_text_without_known_tokens_is_zero(self, encoder: StaticEncoder) -> None:
+        assert not encoder.encode(["hello there"]).any()
+
+
+class TestStaticCascade:
+    def test_accepts_confident_match(self, cascade: StaticCascade) -> None:
+        decision = cascade.decide("reset password")
+
+        assert decision.outcome == "accept"
+        assert decision.index == 0
+
+    def test_rejects_distant_query(self, cascade: StaticCascade) -> None:
+        assert cascade.decide("hello").outcome == "reject"
+
+    def test_uncertain_inside_band(self, cascade: StaticCascade) -> None:
+        assert cascade.decide("password").outcome == "uncertain"
+
+    def test_margin_ignores_variants_of_the_same_answer(
+        self, encoder: StaticEncoder
+    ) -> None:
+        index = faiss.IndexFlatL2(4)
+        index.add(encoder.encode(["reset password", "reset password", "refund"]))
+        cascade = StaticCascade(
+            encoder,
+            index,
+            accept_distance=0.1,
+            min_margin=0.5,
+            reject_distance=0.9,
+            answer_ids=np.array([0, 0, 1], dtype=np.int32),
+            max_variants=2,
+        )
+
+        decision = cascade.decide("reset password")
+
+        assert decision.outcome == "accept"
+        assert decision.index == 0
+
+    def test_short_circuit_ratio(self, cascade: StaticCascade) -> None:
+        cascade.decide("reset password")
+        cascade.decide("password")
+
+        assert cascade.short_circuit_ratio == 0.5
+
+
+def test_distill_embeds_every_vocabulary_token(tmp_path: Path) -> None:
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "reset", "password"]
+    (tmp_path / "vocab.txt").write_text("\n".join(vocab))
+    tokenizer = BertTokenizer(str(tmp_path / "vocab.txt"))
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=8,
+        num_hidden_layers=1,
+        num_attention_heads=1,
+        intermediate_size=16,
+    )
+    BertModel(config).save_pretrained(tmp_path / "bert")  # type: ignore[no-untyped-call]
+    tokenizer.save_pretrained(tmp_path / "bert")
+    model = SentenceTransformer(
+        modules=[Transformer(str(tmp_path / "bert")), Pooling(8)],
+        device="cpu",
+    )
+
+    table = distill_static_embeddings(model, batch_size=3)
+
+    assert table.shape == (len(vocab), 8)
+    assert table.dtype == np.float16
+    single = model.encode(["reset"])[0]
+    np.testing.assert_allclose(table[5], single, atol=1e-2)
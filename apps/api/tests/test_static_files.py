@@ -0,0 +1,160 @@
+import gzip
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from static_files import PrecompressedStaticFiles, encoding_qvalues, is_acceptable
+
+SCRIPT = b"console.log('hello');\n" * 100
+INDEX = b"<!doctype html><title>FAQ</title>"
+
+
+@pytest.fixture
+def dist(tmp_path: Path) -> Path:
+    (tmp_path / "assets").mkdir()
+    script = tmp_path / "assets" / "index-B1x2y3z4.js"
+    script.write_bytes(SCRIPT)
+    script.with_name(script.name + ".gz").write_bytes(gzip.compress(SCRIPT))
+    script.with_name(script.name + ".br").write_bytes(b"brotli bytes")
+    (tmp_path / "index.html").write_bytes(INDEX)
+    (tmp_path / "favicon.svg").write_bytes(b"<svg/>")
+    return tmp_path
+
+
+@pytest.fixture
+def client(dist: Path) -> TestClient:
+    app = FastAPI()
+    app.mount("/", PrecompressedStaticFiles(directory=str(dist)), name="static")
+    return TestClient(app)
+
+
+class TestPrecompressedStaticFiles:
+    def test_serves_brotli_when_accepted(self, client: TestClient) -> None:
+        # Headers only: the fixture's .br file is not real brotli
+        with client.stream(
+            "GET", "/assets/index-B1x2y3z4.js", headers={"accept-encoding": "gzip, br"}
+        ) as response:
+            pass
+
+        assert response.headers["content-encoding"] == "br"
+        assert response.headers["vary"] == "accept-encoding"
+        assert response.headers["content-length"] == str(len(b"brotli bytes"))
+        assert "immutable" in response.headers["cache-control"]
+
+    def test_serves_gzip_without_brotli(self, client: TestClient) -> None:
+        response = client.get(
+            "/assets/index-B1x2y3z4.js", headers={"accept-encoding": "gzip, br;q=0"}
+        )
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.content == SCRIPT  # Decoded by the client
+
+    def test_explicit_zero_beats_wildcard(self, client: TestClient) -> None:
+        response = client.get(
+            "/assets/index-B1x2y3z4.js", headers={"accept-encoding": "br;q=0, *"}
+        )
+
+        assert response.headers["content-encoding"] == "gzip"
+
+    def test_refused_identity(self, client: TestClient) -> None:
+        compressed = client.get(
+            "/assets/index-B1x2y3z4.js",
+            headers={"accept-encoding": "identity;q=0, gzip"},
+        )
+        uncompressed_only = client.get(
+            "/favicon.svg", headers={"accept-encoding": "identity;q=0, gzip"}
+        )
+
+        assert compressed.headers["content-encoding"] == "gzip"
+        assert uncompressed_only.status_code == 406
+
+    def test_serves_identity_by_default(self, client: TestClient) -> None:
+        response = client.get(
+            "/assets/index-B1x2y3z4.js", headers={"accept-encoding": "identity"}
+        )
+
+        assert "content-encoding" not in response.headers
+        assert response.content == SCRIPT
+        assert response.headers["content-type"].startswith("text/javascript")
+
+    def test_index_is_revalidated(self, client: TestClient) -> None:
+        response = client.get("/")
+
+        assert response.content == INDEX
+        assert response.headers["cache-control"] == "no-cache"
+
+        cached = client.get("/", headers={"if-none-match": response.headers["etag"]})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    def test_encodings_have_distinct_etags(self, client: TestClient) -> None:
+        path = "/assets/index-B1x2y3z4.js"
+        with client.stream("GET", path, headers={"accept-encoding": "br"}) as brotli:
+            pass
+        plain = client.get(path, headers={"accept-encoding": "identity"})
+
+        assert brotli.headers["etag"] != plain.headers["etag"]
+
+    def test_unknown_path_is_404(self, client: TestClient, dist: Path) -> None:
+        assert client.get("/missing.js").status_code == 404
+
+    def test_custom_404_page(self, dist: Path) -> None:
+        (dist / "404.html").write_bytes(b"gone")
+        app = FastAPI()
+        app.mount("/", PrecompressedStaticFiles(directory=str(dist)))
+
+        response = TestClient(app).get("/missing")
+
+        assert response.status_code == 404
+        assert response.content == b"gone"
+
+    def test_large_files_are_streamed_from_disk(self, dist: Path) -> None:
+        app = FastAPI()
+        app.mount("/", PrecompressedStaticFiles(str(dist), max_memory_bytes=10))
+        client = TestClient(app)
+
+        response = client.get(
+            "/assets/index-B1x2y3z4.js", headers={"accept-encoding": "identity"}
+        )
+
+        assert response.content == SCRIPT
+        assert "immutable" in response.headers["cache-control"]
+
+    def test_head_and_post(self, client: TestClient) -> None:
+        head = client.head("/favicon.svg")
+        assert head.content == b""
+        assert head.headers["content-length"] == "6"
+
+        assert client.post("/favicon.svg").status_code == 405
+
+    def test_missing_directory(self, tmp_path: Path) -> None:
+        with pytest.raises(RuntimeError):
+            PrecompressedStaticFiles(str(tmp_path / "missing"))
+
+
+def test_encoding_qvalues() -> None:
+    assert encoding_qvalues("gzip, deflate, br;q=0.5") == {
+        "gzip": 1.0,
+        "deflate": 1.0,
+        "br": 0.5,
+    }
+    assert encoding_qvalues("br;q=0, GZIP") == {"br": 0.0, "gzip": 1.0}
+    assert encoding_qvalues("") == {}
+
+
+@pytest.mark.parametrize(
+    ("header", "coding", "acceptable"),
+    [
+        ("br;q=0, *", "br", False),  # Named q-values beat the wildcard
+        ("br;q=0, *", "gzip", True),
+        ("gzip", "br", False),
+        ("gzip", "identity", True),  # Unless excluded
+        ("identity;q=0", "identity", False),
+        ("*;q=0", "identity", False),
+        ("*;q=0, identity", "identity", True),
+    ],
+)
+def test_is_acceptable(header: str, coding: str, acceptable: bool) -> None:
+    assert is_acceptable(encoding_qvalues(header), coding) is acceptable
@@ -0,0 +1,180 @@
+import asyncio
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import tracing
+from middleware import TracingMiddleware
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+class ListExporter:
+    def __init__(self) -> None:
+        self.spans: list[tracing.Span] = []
+        self.closed = False
+
+    def export(self, spans: list[tracing.Span]) -> None:
+        self.spans.extend(spans)
+
+    def shutdown(self) -> None:
+        self.closed = True
+
+
+def make_exporter() -> ListExporter:
+    return ListExporter()
+
+
+@pytest.fixture
+def exporter() -> Iterator[ListExporter]:
+    exporter = ListExporter()
+    tracing.setup_tracing(exporter, sample_rate=1.0)
+    yield exporter
+    tracing.shutdown_tracing()
+
+
+def finished(exporter: ListExporter) -> dict[str, tracing.Span]:
+    """Flush the processor and index the exported spans by name."""
+    tracing.shutdown_tracing()
+    return {span.name: span for span in exporter.spans}
+
+
+class TestTraceparent:
+    def test_parses_sampled_header(self) -> None:
+        header = f"00-{TRACE_ID}-{PARENT_ID}-01"
+
+        assert tracing.parse_traceparent(header) == (TRACE_ID, PARENT_ID, True)
+
+    def test_parses_unsampled_header(self) -> None:
+        header = f"00-{TRACE_ID}-{PARENT_ID}-00"
+
+        assert tracing.parse_traceparent(header) == (TRACE_ID, PARENT_ID, False)
+
+    @pytest.mark.parametrize(
+        "header",
+        [None, "", "garbage", f"00-{'0' * 32}-{PARENT_ID}-01", f"01-{TRACE_ID}-x-01"],
+    )
+    def test_rejects_invalid_header(self, header: str | None) -> None:
+        assert tracing.parse_traceparent(header) is None
+
+
+class TestSpans:
+    def test_no_spans_without_setup(self) -> None:
+        with tracing.root_span("request") as root, tracing.span("child") as child:
+            assert root is None
+            assert child is None
+
+    def test_children_are_linked_to_root(self, exporter: ListExporter) -> None:
+        with tracing.root_span("request") as root, tracing.span("child"):
+            assert tracing.current_span() is not None
+
+        spans = finished(exporter)
+        assert root is not None
+        assert spans["child"].trace_id == root.trace_id
+        assert spans["child"].parent_id == root.span_id
+        assert spans["request"].parent_id is None
+        assert tracing.current_span() is None
+
+    def test_root_joins_incoming_trace(self, exporter: ListExporter) -> None:
+        with tracing.root_span("request", f"00-{TRACE_ID}-{PARENT_ID}-01"):
+            pass
+
+        span = finished(exporter)["request"]
+        assert (span.trace_id, span.parent_id) == (TRACE_ID, PARENT_ID)
+
+    def test_respects_unsampled_incoming_trace(self, exporter: ListExporter) -> None:
+        with tracing.root_span("request", f"00-{TRACE_ID}-{PARENT_ID}-00") as root:
+            assert root is None
+
+        assert finished(exporter) == {}
+
+    def test_sample_rate_zero_records_nothing(self) -> None:
+        exporter = ListExporter()
+        tracing.setup_tracing(exporter, sample_rate=0.0)
+
+        with tracing.root_span("request") as root:
+            assert root is None
+
+        assert finished(exporter) == {}
+
+    def test_error_is_recorded(self, exporter: ListExporter) -> None:
+        with pytest.raises(ValueError), tracing.root_span("request"):
+            raise ValueError("boom")
+
+        assert finished(exporter)["request"].attributes["error"] == "ValueError"
+
+    async def test_bound_function_runs_in_trace(self, exporter: ListExporter) -> None:
+        def work() -> None:
+            with tracing.span("work"):
+                pass
+
+        loop = asyncio.get_running_loop()
+        with tracing.root_span("request") as root:
+            await loop.run_in_executor(None, tracing.bind_to_trace(work))
+
+        spans = finished(exporter)
+        assert root is not None
+        assert spans["executor.wait"].parent_id == root.span_id
+        assert spans["work"].parent_id == root.span_id
+
+
+class TestExport:
+    def test_file_exporter_writes_json_lines(self, tmp_path: Path) -> None:
+        path = tmp_path / "traces.jsonl"
+        tracing.setup_tracing(tracing.FileSpanExporter(str(path)), sample_rate=1.0)
+
+        with tracing.root_span("request"), tracing.span("child"):
+            pass
+        tracing.shutdown_tracing()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["name"] for line in lines] == ["child", "request"]
+        assert lines[0]["parent_id"] == lines[1]["span_id"]
+        assert lines[1]["duration_ms"] >= lines[0]["duration_ms"]
+
+    def test_full_queue_drops_spans(self) -> None:
+        exporter = ListExporter()
+        processor = tracing.BatchSpanProcessor(exporter, max_queue_size=2)
+        processor._stop.set()
+        processor._wake.set()
+        processor._thread.join()
+
+        for _ in range(3):
+            processor.on_end(tracing.Span("span", TRACE_ID))
+
+        assert processor.dropped == 1
+        processor.shutdown()
+        assert len(exporter.spans) == 2
+        assert exporter.closed
+
+    def test_loads_custom_exporter(self) -> None:
+        exporter = tracing.load_exporter(f"{__name__}:make_exporter", "")
+
+        assert isinstance(exporter, ListExporter)
+
+
+class TestTracingMiddleware:
+    def test_root_span_per_request(self, exporter: ListExporter) -> None:
+        app = FastAPI()
+
+        @app.get("/ping")
+        async def ping() -> dict[str, str]:
+            with tracing.span("handler"):
+                return {"status": "ok"}
+
+        app.add_middleware(TracingMiddleware)
+        response = TestClient(app).get(
+            "/ping", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        )
+
+        assert response.status_code == 200
+        spans = finished(exporter)
+        root = spans["GET /ping"]
+        assert root.trace_id == TRACE_ID
+        assert root.attributes["http.status_code"] == 200
+        assert spans["handler"].parent_id == root.span_id
@@ -0,0 +1,332 @@
+"""
+Lightweight tracing spans for the request pipeline.
+
+A root span is opened per request, joining the trace of an incoming W3C
+``traceparent`` header when there is one. Child spans are opened around the
+stages of the search (executor wait, tokenization, encode, FAISS search,
+serialization) and linked through a context variable.
+
+Finished spans go to a bounded in-memory buffer. A background thread
+exports them in batches, so the request path never waits on the exporter.
+When the buffer is full, spans are dropped and counted.
+
+Sampling is decided once per trace. An incoming ``traceparent`` keeps its
+sampled flag; otherwise ``sample_rate`` of the traces are recorded.
+Unsampled requests create no spans, and every ``span()`` call becomes a
+single context variable lookup.
+"""
+
+import atexit
+import importlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar, Token
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, ParamSpec, Protocol, TypeVar
+
+logger = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+_current_span: ContextVar["Span | None"] = ContextVar("trace_span", default=None)
+
+_processor: "BatchSpanProcessor | None" = None
+_sample_rate = 0.0
+
+# What ``span()`` returns outside a sampled trace
+_NOT_RECORDING: AbstractContextManager[None] = nullcontext()
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "_perf_start",
+        "_token",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None = None,
+        attributes: dict[str, Any] | None = None,
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes or {}
+        self._perf_start = time.perf_counter_ns()
+        self._token: Token[Span | None] | None = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        if self._token is not None:
+            _current_span.reset(self._token)
+        self.end()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        # Wall clock start, monotonic duration
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._perf_start
+        if _processor is not None:
+            _processor.on_end(self)
+
+    @property
+    def traceparent(self) -> str:
+        """W3C header value for a call made on behalf of this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class FileSpanExporter:
+    """Appends spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self._file: IO[str] | None = None
+
+    def export(self, spans: list[Span]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a")
+        self._file.write("".join(json.dumps(s.to_dict()) + "\n" for s in spans))
+        self._file.flush()
+
+    def shutdown(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BatchSpanProcessor:
+    """Queues finished spans and exports them from a background thread."""
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        max_batch_size: int = 512,
+        schedule_delay: float = 1.0,
+        max_queue_size: int = 8192,
+    ) -> None:
+        self.exporter = exporter
+        self.max_batch_size = max_batch_size
+        self.schedule_delay = schedule_delay
+        self.max_queue_size = max_queue_size
+        self.dropped = 0
+        self._thread = self._start_thread()
+
+    def on_end(self, span: Span) -> None:
+        # deque appends and pops are atomic: no lock on the request path
+        if len(self._spans) >= self.max_queue_size:
+            self.dropped += 1
+            return
+        self._spans.append(span)
+        if len(self._spans) == self.max_batch_size:
+            self._wake.set()
+
+    def shutdown(self) -> None:
+        """Export what is queued, then stop the thread and the exporter."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._drain()
+        self.exporter.shutdown()
+
+    def restart_after_fork(self) -> None:
+        """
+        Threads do not survive fork: give a forked worker its own.
+
+        The events are replaced as well, since their locks may have been held
+        by the parent's thread. Spans the parent queued stay with
+        the parent.
+        """
+        self._thread = self._start_thread()
+
+    def _start_thread(self) -> threading.Thread:
+        self._spans: deque[Span] = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.schedule_delay)
+            self._wake.clear()
+            self._drain()
+
+    def _drain(self) -> None:
+        while True:
+            batch: list[Span] = []
+            try:
+                while len(batch) < self.max_batch_size:
+                    batch.append(self._spans.popleft())
+            except IndexError:
+                pass
+            if batch:
+                try:
+                    self.exporter.export(batch)
+                except Exception:
+                    logger.exception(f"Failed to export {len(batch)} spans")
+            if len(batch) < self.max_batch_size:
+                return
+
+
+def load_exporter(spec: str, path: str) -> SpanExporter:
+    """``"file"`` or a ``"module:factory"`` returning a custom exporter."""
+    if spec == "file":
+        return FileSpanExporter(path)
+    module_name, _, attr = spec.partition(":")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory()  # type: ignore[no-any-return]
+
+
+def setup_tracing(exporter: SpanExporter, sample_rate: float) -> None:
+    """Start exporting spans; replaces any previous setup."""
+    global _processor, _sample_rate
+    shutdown_tracing()
+    _processor = BatchSpanProcessor(exporter)
+    _sample_rate = sample_rate
+
+
+def shutdown_tracing() -> None:
+    """Stop recording and flush the spans still queued."""
+    global _processor
+    if _processor is not None:
+        _processor.shutdown()
+        _processor = None
+
+
+def parse_traceparent(header: str | None) -> tuple[str, str, bool] | None:
+    """(trace id, parent span id, sampled) of a valid header, else None."""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None:
+        return None
+    trace_id, parent_id, flags = match.groups()
+    if trace_id == "0" * 32 or parent_id == "0" * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def root_span(
+    name: str, traceparent: str | None = None, **attributes: Any
+) -> AbstractContextManager[Span | None]:
+    """Start (or join) a trace; enters as None when it is not sampled."""
+    if _processor is None:
+        return _NOT_RECORDING
+    parent = parse_traceparent(traceparent)
+    if parent is not None:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = f"{random.getrandbits(128):032x}", None
+        sampled = random.random() < _sample_rate
+    if not sampled:
+        return _NOT_RECORDING
+    return Span(name, trace_id, parent_id, attributes)
+
+
+def span(name: str, **attributes: Any) -> AbstractContextManager[Span | None]:
+    """Child of the current span; a no-op outside a sampled trace."""
+    parent = _current_span.get()
+    if parent is None:
+        return _NOT_RECORDING
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+def traced(name: str, func: Callable[P, R]) -> Callable[P, R]:
+    """``func`` wrapped in a span named ``name``."""
+
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        with span(name):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def bind_to_trace(func: Callable[P, R]) -> Callable[P, R]:
+    """
+    Run ``func`` in the current trace from whichever thread picks it up.
+
+    Context variables do not follow work into ``run_in_executor``. The time
+    between binding and the start of execution is recorded as an
+    ``executor.wait`` span. Returns ``func`` unchanged outside a sampled trace.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return func
+    wait = Span("executor.wait", parent.trace_id, parent.span_id)
+
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        wait.end()
+        token = _current_span.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+
+    return wrapper
+
+
+def _restart_in_child() -> None:
+    if _processor is not None:
+        _processor.restart_after_fork()
+
+
+atexit.register(shutdown_tracing)
+os.register_at_fork(after_in_child=_restart_in_child)
@@ -0,0 +1,48 @@
+// Writes .br and .gz variants next to the compressible files of the build,
+// so the API can serve them by Accept-Encoding without compressing per request.
+// Usage: node scripts/precompress.js [dist]
+import { readdirSync, readFileSync, statSync, writeFileSync } from "node:fs";
+import path from "node:path";
+import { brotliCompressSync, constants, gzipSync } from "node:zlib";
+
+const COMPRESSIBLE = /\.(js|mjs|css|html|svg|json|txt|xml|map|webmanifest|wasm)$/;
+const MIN_BYTES = 1024;
+
+function* files(dir) {
+	for (const entry of readdirSync(dir, { withFileTypes: true })) {
+		const full = path.join(dir, entry.name);
+		if (entry.isDirectory()) {
+			yield* files(full);
+		} else {
+			yield full;
+		}
+	}
+}
+
+const dist = process.argv[2] ?? "dist";
+let original = 0;
+let brotli = 0;
+for (const file of files(dist)) {
+	if (!COMPRESSIBLE.test(file) || statSync(file).size < MIN_BYTES) {
+		continue;
+	}
+	const data = readFileSync(file);
+	const variants = {
+		br: brotliCompressSync(data, {
+			params: {
+				[constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+				[constants.BROTLI_PARAM_SIZE_HINT]: data.length,
+			},
+		}),
+		gz: gzipSync(data, { level: 9 }),
+	};
+	for (const [extension, compressed] of Object.entries(variants)) {
+		// A variant that saves nothing is not worth a lookup
+		if (compressed.length < data.length) {
+			writeFileSync(`${file}.${extension}`, compressed);
+		}
+	}
+	original += data.length;
+	brotli += Math.min(variants.br.length, data.length);
+}
+console.log(`precompressed ${original} bytes to ${brotli} bytes (brotli)`);